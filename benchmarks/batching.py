@@ -0,0 +1,65 @@
+"""
+Measures evaluation throughput and latency against a local stand-in server, without batching and with a BatchingBackend
+at several window sizes. Sessions send their evaluations one after another, pausing for a random think time between turns
+as players of a multi-session server would.
+Run from the repository root:
+    python -m benchmarks.batching --sessions 64 --turns 10 --think 0.5 --windows 0,0.005,0.02,0.05
+"""
+from benchmarks.tail_latency import USER_PROMPT, percentile
+from modules.backends import EvaluationRequest, HTTPBackend, LatencyModel
+from modules.batching import BatchingBackend
+from modules.interface import ACTION_EVAL_FORMAT
+from modules.prompt import CompiledPrompt
+from modules.standin_server import StandinServer
+import argparse
+import asyncio
+import random
+import time
+
+# Runs the sessions, each sending its turns one after another. Returns the throughput and the sorted latencies.
+# Think times are drawn from the same seed for every backend, so that runs are comparable.
+async def run(backend, sessions, turns, think):
+    generator = random.Random(1)
+    system_prompt = CompiledPrompt("Defeat the goblin.", "The goblin is weak.").system_prompt
+    latencies = []
+    async def session():
+        for _ in range(turns):
+            await asyncio.sleep(generator.expovariate(1 / think) if think > 0 else 0)
+            request = EvaluationRequest(system_prompt, USER_PROMPT, ACTION_EVAL_FORMAT, backend.model)
+            start = time.perf_counter()
+            await backend.evaluate(request)
+            latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    await asyncio.gather(*[session() for _ in range(sessions)])
+    seconds = time.perf_counter() - start
+    await backend.close()
+    return len(latencies) / seconds, sorted(latencies)
+
+def report(label, throughput, latencies, extra = ""):
+    print(f"{label:<16} {throughput:8.1f} req/s  p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  {extra}")
+
+async def main(args):
+    server = StandinServer(port = 0, latency = LatencyModel.parse(args.latency, 1), seed = 1, batch_item_latency = args.batch_item_latency)
+    await server.start()
+    try:
+        throughput, latencies = await run(HTTPBackend(server.url(), max_connections = args.connections), args.sessions, args.turns, args.think)
+        report("No batching", throughput, latencies)
+        for window in [float(window) for window in args.windows.split(",")]:
+            backend = BatchingBackend(HTTPBackend(server.url(), max_connections = args.connections), window, args.max_batch)
+            throughput, latencies = await run(backend, args.sessions, args.turns, args.think)
+            waits = sorted(backend.waits)
+            report(f"Window {window * 1000:g} ms", throughput, latencies, f"mean batch {backend.mean_batch_size():.1f}, mean wait {sum(waits) / len(waits) * 1000:.1f} ms")
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compare evaluation throughput and latency with and without micro-batching.")
+    parser.add_argument("--sessions", type = int, default = 64, help = "Concurrent sessions sending evaluations.")
+    parser.add_argument("--turns", type = int, default = 10, help = "Evaluations per session.")
+    parser.add_argument("--think", type = float, default = 0.5, help = "Mean seconds between the turns of a session.")
+    parser.add_argument("--windows", default = "0,0.005,0.02,0.05", help = "Batching windows to measure, in seconds.")
+    parser.add_argument("--max-batch", type = int, default = 32)
+    parser.add_argument("--connections", type = int, default = 8, help = "Connections per backend, as a model endpoint would allow.")
+    parser.add_argument("--latency", default = "fixed:0.2", help = "Latency of a single request or batch.")
+    parser.add_argument("--batch-item-latency", type = float, default = 0.002, help = "Latency added to a batch per request after the first.")
+    asyncio.run(main(parser.parse_args()))
\ No newline at end of file
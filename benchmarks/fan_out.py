@@ -0,0 +1,88 @@
+"""
+Compares the wall-clock turn latency of dynamic scenes evaluated in a single call, and fanned out into concurrent calls
+(see Area.set_fan_out), for scenes with more and more entities.
+The simulated backend takes a fixed time to its first token, then a fixed time per completion token. A single call narrates
+the player's actions and every entity's reaction, so its completion grows with the scene, while fanned-out calls each narrate one part.
+Run from the repository root:
+    python -m benchmarks.fan_out --turns 5 --entities 1,3,6,10
+"""
+from modules.backends import RuleBasedBackend, parse_sections
+from modules.headless import HeadlessInterface
+from modules.player import Player
+from modules.world_map import Area, WorldMap
+import argparse
+import asyncio
+import itertools
+import re
+import time
+
+REACTION_PATTERN = re.compile(r"Only narrate how (.+?) reacts")
+
+class SceneBackend(RuleBasedBackend):
+    """
+    Rule-based backend whose generation time grows with the completion, and whose outputs narrate the entities of a scene.
+    """
+    def __init__(self, entities, first_token, token_seconds, turns):
+        super().__init__(clear_turn = turns + 1, max_turns = turns)
+        self.entities = entities
+        self.first_token = first_token
+        self.token_seconds = token_seconds
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def reaction(self, name):
+        return f"{name} {self.entities[name]} reacts to the player: it sidesteps, raises its guard, shouts to the others, and readies a heavy blow for the next turn."
+
+    def generate(self, request):
+        results = super().generate(request)
+        focus = parse_sections(request.user_prompt).get("Focus")
+        match = REACTION_PATTERN.match(focus) if focus != None else None
+        if match != None:
+            results = dict(results, text_output = self.reaction(match.group(1)), scenario_over = False)
+        elif focus == None:
+            results = dict(results, text_output = " ".join([results["text_output"]] + [self.reaction(name) for name in self.entities]))
+        return results
+
+    async def evaluate(self, request):
+        results = self.answer(request)
+        self.prompt_tokens += request.usage["prompt_tokens"]
+        self.completion_tokens += request.usage["completion_tokens"]
+        await asyncio.sleep(self.first_token + request.usage["completion_tokens"] * self.token_seconds)
+        return results
+
+# Plays a scenario of the given turns. Returns the seconds, prompt tokens and completion tokens per turn.
+def run(count, fan_out, args):
+    entities = {f"Bandit {index + 1}": "is a scarred bandit with a curved blade." for index in range(count)}
+    interface = HeadlessInterface(choices = itertools.repeat(1), free_responses = itertools.cycle(["I attack the bandits with my staff."]), capture_output = False)
+    backend = SceneBackend(entities, args.first_token, args.token_ms / 1000, args.turns)
+    interface.set_backend(backend)
+    world = WorldMap(interface, Player("Player"))
+    area = Area("Camp", "An empty camp.")
+    area.init_DYNAMIC("Ambush", "Bandits surround you.", "The bandits are: " + ", ".join(entities) + ".", "Defeat the bandits.")
+    area.set_streaming(False)
+    area.set_response_cache(False)
+    if fan_out:
+        area.set_fan_out(entities)
+    world.add_area(area)
+    world.current_area = area
+    start = time.perf_counter()
+    world.act()
+    seconds = time.perf_counter() - start
+    interface.close()
+    return seconds / args.turns, backend.prompt_tokens / args.turns, backend.completion_tokens / args.turns
+
+def main(args):
+    print(f"First token {args.first_token * 1000:g} ms, {args.token_ms:g} ms per completion token, {args.turns} turns per scene")
+    for count in [int(count) for count in args.entities.split(",")]:
+        single, single_prompt, single_completion = run(count, False, args)
+        fanned, fanned_prompt, fanned_completion = run(count, True, args)
+        print(f"{count:>3} entities: single call {single * 1000:7.1f} ms/turn, fan-out {fanned * 1000:7.1f} ms/turn ({single / fanned:.2f}x); "
+              f"tokens/turn prompt {single_prompt:.0f} -> {fanned_prompt:.0f}, completion {single_completion:.0f} -> {fanned_completion:.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compare turn latency of single-call and fanned-out scene evaluation.")
+    parser.add_argument("--turns", type = int, default = 5)
+    parser.add_argument("--entities", default = "1,3,6,10", help = "Scene sizes to measure.")
+    parser.add_argument("--first-token", type = float, default = 0.05, help = "Seconds to the first token of every call.")
+    parser.add_argument("--token-ms", type = float, default = 2.0, help = "Milliseconds per completion token.")
+    main(parser.parse_args())
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Measures the import time of the core game modules in fresh interpreters, using python -X importtime,
+and fails if it exceeds a budget or if any module that should only be imported on first use is loaded.
+Run from the repository root:
+    python -m benchmarks.import_time --runs 10 --budget 100
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules that a static world or a unit test imports.
+CORE_MODULES = ["modules.world_map", "modules.world_loader", "modules.headless", "modules.item", "modules.player", "modules.action"]
+# Modules that are only imported once a backend, the event loop, a disk cache or a profiler is used.
+LAZY_MODULES = ["openai", "httpx", "pydantic", "asyncio", "ssl", "sqlite3", "cProfile", "modules.backends", "modules.resilience"]
+
+# Imports the core modules in a fresh interpreter. Returns the total microseconds, and the (self, cumulative, name) entries.
+def measure():
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(CORE_MODULES)], capture_output = True, text = True, check = True)
+    entries = []
+    total = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(own), int(cumulative), name.strip()))
+        # Top-level imports are the ones without indentation.
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total, entries
+
+def main(args):
+    totals = []
+    for _ in range(args.runs):
+        total, entries = measure()
+        totals.append(total)
+    median = statistics.median(totals) / 1000
+    print(f"Core modules: median {median:.1f} ms, min {min(totals) / 1000:.1f} ms over {args.runs} runs (budget {args.budget:g} ms)")
+    print("Slowest by self time: " + ", ".join(f"{name} {own / 1000:.1f} ms" for own, cumulative, name in sorted(entries, reverse = True)[:5]))
+
+    failed = False
+    loaded = [name for own, cumulative, name in entries if name in LAZY_MODULES]
+    if len(loaded) > 0:
+        print(f"FAIL: imported at startup, but should be imported on first use: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: import time regressed past the budget of {args.budget:g} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Check the import time of the core game modules.")
+    parser.add_argument("--runs", type = int, default = 10)
+    parser.add_argument("--budget", type = float, default = 100.0, help = "Milliseconds allowed for the median import time. Measured at about 45 ms.")
+    sys.exit(main(parser.parse_args()))
\ No newline at end of file
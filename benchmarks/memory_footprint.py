@@ -0,0 +1,67 @@
+"""
+Measures the memory used per area and per item when building large worlds.
+Run from the repository root:
+    python -m benchmarks.memory_footprint --areas 10000 --items 10000
+"""
+from modules.interface import Interface
+from modules.item import Item
+from modules.player import Player
+from modules.world_map import WorldMap, Area
+import argparse
+import gc
+import tracemalloc
+
+# Returns the bytes allocated by build() that are still alive afterwards, along with what it built.
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, built
+
+# Builds a chain of connected areas, each with one custom action.
+def build_areas(count):
+    world = WorldMap(Interface(), Player("Player"))
+    previous = None
+    for index in range(count):
+        area = Area(f"Area {index}", "A generated area.", "Nothing notable.")
+        area.add_area_action("Rest")
+        world.add_area(area)
+        if previous != None:
+            previous.create_2way_path(area)
+        previous = area
+    return world
+
+# Builds identical potions with one item action each, as separate objects.
+def build_items(count):
+    items = []
+    for index in range(count):
+        item = Item("Potion", "Heals a little.", "Smells of herbs.")
+        item.add_item_action("Drink")
+        items.append(item)
+    return items
+
+# Builds identical potions as instances of one shared catalog definition, when the world supports it.
+def build_catalog_items(count):
+    world = WorldMap(Interface(), Player("Player"))
+    if not hasattr(world, "catalog"):
+        return None
+    world.catalog.define("Potion", "Heals a little.", "Smells of herbs.").add_item_action("Drink")
+    return [world.catalog.create("Potion") for index in range(count)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure bytes per area and per item.")
+    parser.add_argument("--areas", type = int, default = 10000)
+    parser.add_argument("--items", type = int, default = 10000)
+    args = parser.parse_args()
+
+    size, world = measure(lambda: build_areas(args.areas))
+    print(f"Areas: {size / args.areas:.0f} bytes per area ({args.areas} areas)")
+    size, items = measure(lambda: build_items(args.items))
+    print(f"Items: {size / args.items:.0f} bytes per item ({args.items} standalone items)")
+    size, items = measure(lambda: build_catalog_items(args.items))
+    if items != None:
+        print(f"Items: {size / args.items:.0f} bytes per item ({args.items} catalog instances)")
@@ -0,0 +1,49 @@
+"""
+Measures the completion tokens per turn of the action_eval and action_delta output formats, for players carrying a few or many items.
+Turns are answered by the rule-based backend, so the narration is short and the structured fields make up most of each output.
+Run from the repository root:
+    python -m benchmarks.output_tokens --turns 200 --items 2,10,30
+"""
+from modules.backends import EvaluationRequest, RuleBasedBackend
+from modules.headless import DEFAULT_FREE_RESPONSES
+from modules.item import Item
+from modules.player import Player
+from modules.prompt import CompiledPrompt, estimate_tokens
+from modules.schema import ACTION_DELTA_SCHEMA, ACTION_EVAL_SCHEMA
+from modules.world_map import Area
+import argparse
+
+# Plays turns of a scenario, applying every decoded result to the player. Returns the mean completion and narration tokens per turn.
+def run(schema, items, turns):
+    player = Player("Player")
+    for index in range(items):
+        player.add_item(Item(f"Mystery Potion {index}" if index % 3 == 0 else f"Magical Staff {index}", "An item."))
+    backend = RuleBasedBackend(clear_turn = turns + 1, max_turns = turns + 1, seed = 1)
+    prompt = CompiledPrompt("Defeat the goblin.", "The goblin is weak.")
+    area = Area("Road", "A goblin blocks the road.")
+    scenario = area.desc
+    completion = 0
+    narration = 0
+    for turn in range(1, turns + 1):
+        action = DEFAULT_FREE_RESPONSES[turn % len(DEFAULT_FREE_RESPONSES)]
+        request = EvaluationRequest(prompt.system_prompt, prompt.user_prompt(scenario, action, player, scenario, turn), schema.response_format, backend.model)
+        output = backend.answer(request)
+        result = schema.decode(output, player.inventory.names(), player.player_state)
+        area.apply_player_state(player, result)
+        scenario = result.text_output
+        completion += request.usage["completion_tokens"]
+        narration += estimate_tokens(result.text_output)
+    return completion / turns, narration / turns
+
+def main(args):
+    for items in [int(items) for items in args.items.split(",")]:
+        full, narration = run(ACTION_EVAL_SCHEMA, items, args.turns)
+        delta, _ = run(ACTION_DELTA_SCHEMA, items, args.turns)
+        print(f"{items:>3} items: action_eval {full:6.1f} tokens/turn, action_delta {delta:6.1f} tokens/turn "
+              f"({1 - delta / full:.0%} fewer; structured fields {full - narration:.1f} -> {delta - narration:.1f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compare the completion tokens per turn of the output formats.")
+    parser.add_argument("--turns", type = int, default = 200)
+    parser.add_argument("--items", default = "2,10,30", help = "Inventory sizes to measure.")
+    main(parser.parse_args())
\ No newline at end of file
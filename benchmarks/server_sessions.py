@@ -0,0 +1,81 @@
+"""
+Connects many concurrent clients to a GameServer on localhost, and measures the memory held per session.
+Sessions either share one compiled bundle, or each build the full world from the world file.
+Run from the repository root:
+    python -m benchmarks.server_sessions --sessions 2000 --areas 10000
+"""
+from benchmarks.world_startup import BINDINGS, generate_world
+from modules.game_server import GameServer
+from modules.world_loader import WorldBundle, bundle_world_factory, compile_bundle, load_world
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Plays a client that walks forward along the chain of areas, then waits at the next prompt until released.
+async def client(port, moves, parked, release):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for move in range(moves):
+        await reader.readuntil(b"> ")
+        writer.write(b"1\n") # Navigate to Area
+        await reader.readuntil(b"> ")
+        # The first area only has a path forward. Later areas list the path back first.
+        writer.write(b"2\n" if move == 0 else b"3\n")
+    await reader.readuntil(b"> ")
+    parked.append(writer)
+    await release.wait()
+    writer.write(b"q\n")
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+# Returns the bytes allocated by the game modules.
+def module_memory():
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, "*modules*")])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+# Runs the sessions against a server using the world factory. Returns the module memory per session and the seconds taken.
+async def measure(world_factory, sessions, moves):
+    server = GameServer(world_factory, port = 0)
+    await server.start()
+    before = module_memory()
+    start = time.perf_counter()
+    parked = []
+    release = asyncio.Event()
+    clients = [asyncio.ensure_future(client(server.port, moves, parked, release)) for _ in range(sessions)]
+    while len(parked) < sessions:
+        await asyncio.sleep(0.05)
+    seconds = time.perf_counter() - start
+    per_session = (module_memory() - before) / sessions
+    peak = server.stats["peak"]
+    release.set()
+    await asyncio.gather(*clients)
+    await server.stop()
+    return per_session, seconds, peak
+
+async def main(args):
+    data = generate_world(args.areas)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "world.bundle")
+        compile_bundle(data, path)
+        bundle = WorldBundle(path)
+        tracemalloc.start()
+        per_session, seconds, peak = await measure(bundle_world_factory(bundle, BINDINGS), args.sessions, args.moves)
+        print(f"Shared bundle: {peak} concurrent sessions in {seconds:.2f} s, {per_session / 1024:.1f} KB per session ({args.areas} areas)")
+        if not args.skip_full:
+            sessions = min(args.sessions, args.full_sessions)
+            per_session, seconds, peak = await measure(lambda interface: load_world(data, interface, bindings = BINDINGS), sessions, args.moves)
+            print(f"Full worlds: {peak} concurrent sessions in {seconds:.2f} s, {per_session / 1024:.1f} KB per session")
+        tracemalloc.stop()
+        bundle.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure concurrent sessions and memory per session of the game server.")
+    parser.add_argument("--sessions", type = int, default = 2000)
+    parser.add_argument("--areas", type = int, default = 10000)
+    parser.add_argument("--moves", type = int, default = 4, help = "Areas each client walks through before waiting. Stay below 5 to avoid the first dynamic area.")
+    parser.add_argument("--full-sessions", type = int, default = 20, help = "Sessions to measure with full worlds, which are slow to build.")
+    parser.add_argument("--skip-full", action = "store_true", help = "Only measure the shared bundle.")
+    asyncio.run(main(parser.parse_args()))
\ No newline at end of file
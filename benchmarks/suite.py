@@ -0,0 +1,169 @@
+"""
+Benchmark suite of the engine's hot paths, on synthetic worlds: world construction, menus, inventory changes,
+prompt assembly, and full dynamic turns against a rule-based evaluator with a fixed latency.
+Each case is run several times, and its best time per operation is kept.
+Results can be saved as a JSON baseline, and later runs compared against it, failing on regressions beyond a threshold.
+Run from the repository root:
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.15
+"""
+from modules.backends import LatencyModel, RuleBasedBackend
+from modules.headless import HeadlessInterface
+from modules.history import TurnHistory
+from modules.item import Item
+from modules.player import Player
+from modules.prompt import CompiledPrompt
+from modules.world_map import Area, WorldMap
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+
+ACTIONS = ["I attack with my staff.", "I charge a powerful spell.", "I release the charged spell at the enemy.", "I dodge to the side."]
+
+# Builds a world of count areas, each with paths to the next area and to paths - 1 random others, and one custom action.
+# The player carries items items, a third of them in stacks of two.
+def generate_world(interface, count, paths, items, seed = 0):
+    generator = random.Random(seed)
+    player = Player("Player")
+    world = WorldMap(interface, player)
+    areas = []
+    for index in range(count):
+        area = Area(f"Area {index}", "A generated area.", "Nothing notable.")
+        area.add_area_action("Rest", None, lambda: None)
+        world.add_area(area)
+        areas.append(area)
+    for index, area in enumerate(areas):
+        if index + 1 < count:
+            area.create_2way_path(areas[index + 1])
+        for _ in range(paths - 1):
+            area.create_path(areas[generator.randrange(count)])
+    for index in range(items):
+        item = Item(f"Item {index}", "A generated item.")
+        for _ in range(2 if index % 3 == 0 else 1):
+            player.add_item(item)
+    return world
+
+# Each case returns the number of operations it ran, and the seconds they took.
+
+def case_build(args):
+    start = time.perf_counter()
+    generate_world(HeadlessInterface(capture_output = False), args.areas, args.paths, 0)
+    return args.areas, time.perf_counter() - start
+
+# Static menus: every act opens the area menu, picks Navigate to Area, then stays, so both menus are built.
+def case_menus(args):
+    interface = HeadlessInterface(choices = itertools.cycle([0, 0]), capture_output = False, max_responses = 10 ** 9)
+    world = generate_world(interface, args.areas, args.paths, 0)
+    world.start()
+    acts = 2000
+    start = time.perf_counter()
+    for index in range(acts):
+        # Moving between areas makes every menu a new one, rather than the same cached one.
+        world.current_area = world.areas[index % len(world.areas)]
+        world.act()
+    return acts, time.perf_counter() - start
+
+def case_inventory(args):
+    player = Player("Player")
+    items = [Item(f"Item {index}", "A generated item.") for index in range(args.items)]
+    rounds = max(1, 20000 // args.items)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            player.add_item(item)
+        for item in items:
+            player.remove_item(item)
+    return rounds * args.items * 2, time.perf_counter() - start
+
+def case_prompt(args):
+    interface = HeadlessInterface(capture_output = False)
+    world = generate_world(interface, 1, 1, args.items)
+    prompt = CompiledPrompt("Defeat the goblin.", "The goblin is weak.", 2000)
+    history = TurnHistory(3)
+    for turn in range(1, 11):
+        history.add(turn, ACTIONS[turn % len(ACTIONS)], f"The fight goes on, turn {turn}.")
+    prompts = 5000
+    start = time.perf_counter()
+    for turn in range(prompts):
+        prompt.user_prompt(f"The goblin circles you, turn {turn}.", ACTIONS[turn % len(ACTIONS)], world.player, history, turn)
+    return prompts, time.perf_counter() - start
+
+# Full dynamic turns, through prompt assembly, evaluation, decoding and applying the result. Only the time beyond the
+# evaluator's fixed latency is counted, so the case measures the engine's own overhead per turn.
+def case_dynamic_turn(args):
+    turns = args.turns
+    interface = HeadlessInterface(choices = itertools.repeat(0), free_responses = itertools.cycle(ACTIONS), capture_output = False, max_responses = 10 ** 9)
+    interface.set_backend(RuleBasedBackend(clear_turn = turns + 1, max_turns = turns, latency = LatencyModel("fixed", args.latency)))
+    world = generate_world(interface, 2, 1, args.items)
+    area = world.areas[1]
+    area.init_DYNAMIC("Ambush", "Bandits leap out.", "Bandits are weak.", "Defeat the bandits.")
+    area.set_response_cache(False)
+    area.set_streaming(False)
+    world.current_area = area
+    start = time.perf_counter()
+    world.act()
+    seconds = time.perf_counter() - start
+    interface.close()
+    return turns, seconds - turns * args.latency
+
+CASES = {"build_world": case_build, "menus": case_menus, "inventory": case_inventory, "prompt_assembly": case_prompt, "dynamic_turn_overhead": case_dynamic_turn}
+
+def run(args):
+    results = {}
+    for name, case in CASES.items():
+        if args.cases and name not in args.cases.split(","):
+            continue
+        best = None
+        for _ in range(args.repeat):
+            operations, seconds = case(args)
+            per_op = seconds / operations * 1e6
+            best = per_op if best == None else min(best, per_op)
+        results[name] = {"us_per_op": round(best, 3)}
+        print(f"{name:<24} {best:10.2f} us/op")
+    return results
+
+# Compares results with a baseline. Returns the names of the cases that are slower by more than the threshold.
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["us_per_op"]
+        change = result["us_per_op"] / before - 1 if before > 0 else 0.0
+        status = "REGRESSION" if change > threshold else ("improved" if change < -threshold else "ok")
+        if change > threshold:
+            regressions.append(name)
+        print(f"{name:<24} {before:10.2f} -> {result['us_per_op']:10.2f} us/op  {change:+7.1%}  {status}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run the engine benchmark suite, and save or compare baselines.")
+    parser.add_argument("--areas", type = int, default = 5000)
+    parser.add_argument("--paths", type = int, default = 3, help = "Paths created from each area.")
+    parser.add_argument("--items", type = int, default = 20, help = "Items in the player's inventory.")
+    parser.add_argument("--turns", type = int, default = 200, help = "Dynamic turns per run.")
+    parser.add_argument("--latency", type = float, default = 0.001, help = "Fixed evaluator latency, in seconds.")
+    parser.add_argument("--repeat", type = int, default = 5, help = "Runs per case. The best is kept.")
+    parser.add_argument("--cases", help = "Comma-separated cases to run. Defaults to all of: " + ", ".join(CASES))
+    parser.add_argument("--save", metavar = "PATH", help = "Save the results as a JSON baseline.")
+    parser.add_argument("--compare", metavar = "PATH", help = "Compare the results with a saved baseline.")
+    parser.add_argument("--threshold", type = float, default = 0.15, help = "Slowdown, as a fraction, reported as a regression.")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        parameters = {key: getattr(args, key) for key in ("areas", "paths", "items", "turns", "latency")}
+        with open(args.save, "w", encoding = "utf-8") as file:
+            json.dump({"python": platform.python_version(), "parameters": parameters, "results": results}, file, indent = 2)
+    if args.compare:
+        with open(args.compare, encoding = "utf-8") as file:
+            baseline = json.load(file)
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print(f"FAIL: {', '.join(regressions)} regressed")
+            sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Measures the tail latency of action evaluations against a local stand-in server with injected slowness and errors,
+with a plain HTTPBackend and with the same backend wrapped in a ResilientBackend.
+Run from the repository root:
+    python -m benchmarks.tail_latency --requests 400 --latency pareto:0.05,1.5 --error-rate 0.05
+"""
+from modules.backends import EvaluationRequest, HTTPBackend, LatencyModel
+from modules.interface import ACTION_EVAL_FORMAT
+from modules.resilience import ResilientBackend
+from modules.standin_server import StandinServer
+import argparse
+import asyncio
+import time
+
+USER_PROMPT = "Current Scenario:\nA goblin blocks the road.\n\nPlayer's Actions:\nI swing my sword at the goblin.\n\nPlayer's State:\n{\"physical_state\": \"healthy\", \"mental_state\": \"calm\"}\n\nPlayer's Inventory:\n[\"Potion\"]\n\nTurn Number:\n1"
+
+# Returns the value below which the given percentage of the sorted samples fall.
+def percentile(ordered, percent):
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+# Runs the requests from a number of concurrent sessions, each waiting for its previous answer.
+# Returns the sorted latencies, and the number of requests that raised.
+async def run(backend, requests, sessions):
+    latencies = []
+    errors = 0
+    remaining = [requests]
+    async def session():
+        nonlocal errors
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            request = EvaluationRequest("You evaluate actions.", USER_PROMPT, ACTION_EVAL_FORMAT, backend.model)
+            start = time.perf_counter()
+            try:
+                await backend.evaluate(request)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    await asyncio.gather(*[session() for _ in range(sessions)])
+    await backend.close()
+    return sorted(latencies), errors
+
+def report(label, latencies, errors):
+    print(f"{label:<10} p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  max {latencies[-1] * 1000:7.1f} ms  errors {errors}")
+
+async def main(args):
+    server = StandinServer(port = 0, latency = LatencyModel.parse(args.latency, args.seed), error_rate = args.error_rate, seed = args.seed)
+    await server.start()
+    try:
+        latencies, errors = await run(HTTPBackend(server.url()), args.requests, args.sessions)
+        report("Plain", latencies, errors)
+        resilient = ResilientBackend(HTTPBackend(server.url()), deadline = args.deadline, hedge_percentile = args.hedge_percentile, base_delay = 0.02, seed = args.seed)
+        latencies, errors = await run(resilient, args.requests, args.sessions)
+        report("Resilient", latencies, errors)
+        print(f"Resilient stats: {resilient.stats}")
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compare evaluation tail latency with and without deadlines, retries and hedging.")
+    parser.add_argument("--requests", type = int, default = 400)
+    parser.add_argument("--sessions", type = int, default = 8, help = "Concurrent sessions sending requests.")
+    parser.add_argument("--latency", default = "pareto:0.05,1.5", help = "Latency distribution of the stand-in server.")
+    parser.add_argument("--error-rate", type = float, default = 0.05, help = "Share of requests answered with a server error.")
+    parser.add_argument("--deadline", type = float, default = 1.0, help = "Deadline of each resilient evaluation, in seconds.")
+    parser.add_argument("--hedge-percentile", type = float, default = 90)
+    parser.add_argument("--seed", type = int, default = 1)
+    asyncio.run(main(parser.parse_args()))
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Measures the startup time of large worlds, loaded eagerly from a world file or lazily from a compiled bundle.
+Run from the repository root:
+    python -m benchmarks.world_startup --areas 100000
+"""
+from modules.headless import HeadlessInterface
+from modules.world_loader import compile_bundle, load_bundle, load_world
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+# Generates a world file with a two-way chain of areas, one action each, and a dynamic scenario every tenth area.
+def generate_world(count):
+    areas = []
+    for index in range(count):
+        area = {"name": f"Area {index}", "desc": "A generated area.", "details": "Nothing notable.", "actions": [{"name": "Rest", "action": "rest"}], "paths": []}
+        if index > 0:
+            area["paths"].append(f"Area {index - 1}")
+        if index < count - 1:
+            area["paths"].append(f"Area {index + 1}")
+        if index % 10 == 5:
+            area["dynamic"] = {"name": f"Ambush {index}", "desc": "Bandits leap out.", "details": "Bandits are weak.", "exit_mission": "Defeat the bandits."}
+        areas.append(area)
+    return {"items": [{"name": "Potion", "desc": "Heals a little."}], "inventory": ["Potion"], "areas": areas}
+
+BINDINGS = {"rest": lambda: None}
+
+# Returns the seconds taken by a call, along with its result.
+def timed(call):
+    gc.collect()
+    start = time.perf_counter()
+    result = call()
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure world startup time, eager and from a bundle.")
+    parser.add_argument("--areas", type = int, default = 100000)
+    parser.add_argument("--walk", type = int, default = 1000, help = "Areas to hydrate after startup.")
+    parser.add_argument("--skip-eager", action = "store_true", help = "Only measure the bundle.")
+    args = parser.parse_args()
+
+    data = generate_world(args.areas)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "world.bundle")
+        seconds, _ = timed(lambda: compile_bundle(data, path))
+        print(f"Compile: {seconds * 1000:.0f} ms, {os.path.getsize(path) / 1e6:.1f} MB bundle ({args.areas} areas)")
+
+        if not args.skip_eager:
+            seconds, world = timed(lambda: load_world(data, HeadlessInterface(), bindings = BINDINGS))
+            print(f"Eager startup: {seconds * 1000:.1f} ms")
+            del world
+
+        def start_bundle():
+            world = load_bundle(path, HeadlessInterface(), bindings = BINDINGS)
+            world.start()
+            return world
+        seconds, world = timed(start_bundle)
+        print(f"Bundle startup: {seconds * 1000:.2f} ms, including entering the starting area ({'within' if seconds < 0.1 else 'over'} the 100 ms target)")
+
+        walk = min(args.walk, args.areas)
+        def hydrate():
+            for area_id in range(walk):
+                world.get_area(area_id).ensure_hydrated()
+        seconds, _ = timed(hydrate)
+        print(f"Hydration: {seconds / walk * 1e6:.1f} us per area ({walk} areas)")
+        seconds, _ = timed(lambda: world.get_area(f"Area {args.areas - 1}"))
+        print(f"First lookup by name: {seconds * 1000:.1f} ms")
+        world.close()
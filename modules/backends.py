@@ -0,0 +1,520 @@
+from .cache import evaluation_key
+from .prompt import estimate_tokens
+from .schema import OutputError, compact_output, decode_json
+import asyncio
+import json
+import random
+import re
+import ssl
+import time
+import urllib.parse
+
+# Share of the simulated latency spent before the first chunk of a streamed output. The rest is spread across the chunks.
+FIRST_CHUNK_SHARE = 0.1
+
+class BackendError(Exception):
+    """
+    Raised by an evaluator backend when a request fails. Status is the HTTP status code, or 0 for connection failures.
+    """
+    def __init__(self, message, status = 0):
+        super().__init__(message)
+        self.status = status
+
+class EvaluationRequest:
+    """
+    A single action evaluation request, as sent to an evaluator backend.
+    Backends fill in the usage and latency of the request once it has been answered.
+    """
+    def __init__(self, system_prompt, user_prompt, response_format, model):
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.response_format = response_format
+        self.model = model
+        self.usage = None # Token usage reported by the backend, as a dictionary.
+        self.latency = None # Seconds taken by the backend to answer.
+        self.decode_time = None # Seconds spent decoding the structured output, if measured by the backend.
+        self.degraded = False # Whether the answer is a fallback rather than an evaluation, such as a canned response. Never cached.
+
+    def messages(self):
+        return [
+            {"role": "system", "content": self.system_prompt}, # Hidden to User
+            {"role": "user", "content": self.user_prompt} # Known to User
+        ]
+
+    # Chat completions request body for this request.
+    def payload(self):
+        return {"model": self.model, "messages": self.messages(), "response_format": self.response_format}
+
+    # Canonical hash of the request, used as the response cache key.
+    def key(self):
+        return evaluation_key(self.system_prompt, self.user_prompt, self.response_format, self.model)
+
+class EvaluatorBackend:
+    """
+    The EvaluatorBackend class is the interface between Interface.evaluate_actions and whatever produces evaluations.
+    Subclasses implement evaluate, which answers an EvaluationRequest with the decoded structured output.
+    """
+    def __init__(self, model = "gpt-4o-mini"):
+        self.model = model
+
+    # Returns the structured output of the request as a dictionary.
+    async def evaluate(self, request: EvaluationRequest):
+        raise NotImplementedError
+
+    # Yields the raw JSON text of the structured output in chunks, as it is generated.
+    # Backends that cannot stream yield the whole output as a single chunk.
+    async def evaluate_stream(self, request: EvaluationRequest):
+        yield json.dumps(await self.evaluate(request))
+
+    # Answers several requests, and returns a list holding the structured output or the raised exception of each, in order.
+    # Backends without a batch endpoint evaluate the requests concurrently.
+    async def evaluate_batch(self, requests):
+        return await asyncio.gather(*[self.evaluate(request) for request in requests], return_exceptions = True)
+
+    # Opens connections ahead of the first request, such as while the player approaches a dynamic area. Does nothing by default.
+    async def warm(self):
+        pass
+
+    # Releases any connections held by the backend.
+    async def close(self):
+        pass
+
+# Converts an error of the OpenAI client to a BackendError, keeping its HTTP status so that it can be retried.
+def api_error(error):
+    return BackendError(str(error), getattr(error, "status_code", None) or 0)
+
+class OpenAIBackend(EvaluatorBackend):
+    """
+    Evaluates requests with the OpenAI API, or any OpenAI-compatible endpoint given by base_url.
+    The openai package is only imported once a backend is created, as it is slow to import and not needed by static worlds.
+    """
+    def __init__(self, api_key = None, model = "gpt-4o-mini", base_url = None):
+        super().__init__(model)
+        import openai
+        self.api_error_type = openai.APIError
+        self.client = openai.AsyncOpenAI(api_key = api_key, base_url = base_url)
+
+    async def evaluate(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**request.payload())
+        except self.api_error_type as e:
+            raise api_error(e) from e
+        request.latency = time.perf_counter() - start
+        if response.usage != None:
+            request.usage = {"prompt_tokens": response.usage.prompt_tokens, "completion_tokens": response.usage.completion_tokens}
+        # Note that the response content originally appears in string format.
+        start = time.perf_counter()
+        results = decode_json(response.choices[0].message.content)
+        request.decode_time = time.perf_counter() - start
+        return results
+
+    async def evaluate_stream(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        try:
+            stream = await self.client.chat.completions.create(**request.payload(), stream = True, stream_options = {"include_usage": True})
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) != None:
+                    request.usage = {"prompt_tokens": chunk.usage.prompt_tokens, "completion_tokens": chunk.usage.completion_tokens}
+                if len(chunk.choices) > 0 and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except self.api_error_type as e:
+            raise api_error(e) from e
+        request.latency = time.perf_counter() - start
+
+    # The client connects on its first request, so a cheap request is made to open the connection early.
+    async def warm(self):
+        try:
+            await self.client.models.list()
+        except self.api_error_type as e:
+            raise api_error(e) from e
+
+    async def close(self):
+        await self.client.close()
+
+# Returns the message content and usage of a chat completion body. Raises BackendError if the body is not a chat completion.
+def completion_content(response, status = 200):
+    try:
+        return response["choices"][0]["message"]["content"], response.get("usage")
+    except (AttributeError, IndexError, KeyError, TypeError) as e:
+        raise BackendError(f"Malformed response: {str(response)[:200]}", status) from e
+
+class HTTPBackend(EvaluatorBackend):
+    """
+    Evaluates requests against an OpenAI-compatible chat completions endpoint, using only the standard library.
+    Connections are kept alive and reused, up to max_connections in flight at once.
+    The connection and request counters can be used to measure connection reuse.
+    """
+    def __init__(self, base_url = "http://127.0.0.1:8199/v1", api_key = "", model = "gpt-4o-mini", max_connections = 16, timeout = 60):
+        super().__init__(model)
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname
+        self.use_ssl = url.scheme == "https"
+        self.port = url.port or (443 if self.use_ssl else 80)
+        self.path_prefix = url.path.rstrip("/")
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.idle = [] # Idle keep-alive connections, as (reader, writer) pairs.
+        self.loop = None # Connections and the semaphore belong to a single event loop.
+        self.semaphore = None
+        self.connections_opened = 0
+        self.requests = 0
+
+    # Resets the connection pool if it was created on a different event loop.
+    def bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.idle = []
+            self.semaphore = asyncio.Semaphore(self.max_connections)
+
+    async def open_connection(self):
+        self.connections_opened += 1
+        context = ssl.create_default_context() if self.use_ssl else None
+        return await asyncio.open_connection(self.host, self.port, ssl = context)
+
+    # Sends a request over a connection, and returns the status, headers, and reader of the response.
+    async def send(self, connection, method, path, body):
+        reader, writer = connection
+        head = f"{method} {self.path_prefix}{path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: keep-alive\r\n"
+        if self.api_key != "":
+            head += f"Authorization: Bearer {self.api_key}\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if status_line == b"":
+            raise ConnectionResetError("Connection closed by the server.")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError) as e:
+            raise BackendError(f"Invalid status line: {status_line[:200].decode('latin-1')}") from e
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    # Reads a complete response body.
+    async def read_body(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    return body
+                body += chunk[:-2]
+        return await reader.readexactly(int(headers.get("content-length", "0")))
+
+    # Yields a response body in pieces, as they arrive.
+    async def iter_body(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await asyncio.wait_for(reader.readline(), self.timeout)).split(b";")[0], 16)
+                chunk = await asyncio.wait_for(reader.readexactly(size + 2), self.timeout)
+                if size == 0:
+                    return
+                yield chunk[:-2]
+        else:
+            yield await asyncio.wait_for(reader.readexactly(int(headers.get("content-length", "0"))), self.timeout)
+
+    # Sends a request on a pooled connection, and returns the connection along with the status and headers of the response.
+    # A reused connection that was closed by the server is replaced once with a new connection.
+    async def start_request(self, path, body):
+        for attempt in range(2):
+            reused = len(self.idle) > 0
+            connection = self.idle.pop() if reused else await self.open_connection()
+            try:
+                status, headers = await asyncio.wait_for(self.send(connection, "POST", path, body), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                connection[1].close()
+                if reused and attempt == 0:
+                    continue
+                raise BackendError(f"Connection failed: {e}") from e
+            except asyncio.TimeoutError as e:
+                connection[1].close()
+                raise BackendError(f"No response within {self.timeout} seconds.") from e
+            except BaseException:
+                connection[1].close()
+                raise
+            return connection, status, headers
+
+    # Returns a connection whose response has been read in full to the pool, unless the server closes it.
+    def release(self, connection, headers):
+        self.requests += 1
+        if headers.get("connection", "").lower() == "close":
+            connection[1].close()
+        else:
+            self.idle.append(connection)
+
+    # Posts a JSON payload, and returns the status and decoded JSON body.
+    async def post_json(self, path, payload):
+        self.bind_loop()
+        body = json.dumps(payload, separators = (",", ":")).encode("utf-8")
+        async with self.semaphore:
+            connection, status, headers = await self.start_request(path, body)
+            try:
+                data = await asyncio.wait_for(self.read_body(connection[0], headers), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                connection[1].close()
+                raise BackendError(f"Connection failed: {e}") from e
+            except asyncio.TimeoutError as e:
+                connection[1].close()
+                raise BackendError(f"No response within {self.timeout} seconds.") from e
+            except ValueError as e:
+                # Such as an invalid chunk size.
+                connection[1].close()
+                raise BackendError(f"Invalid response body: {e}", status) from e
+            except BaseException:
+                connection[1].close()
+                raise
+            self.release(connection, headers)
+            try:
+                return status, json.loads(data) if data else None
+            except ValueError as e:
+                # Such as an HTML error page from a proxy.
+                raise BackendError(f"Invalid response with status {status}: {data[:200].decode('utf-8', 'replace')}", status) from e
+
+    # Posts a JSON payload, and yields the decoded data of each server-sent event in the response.
+    # Raises BackendError if the response is not successful. A stream that is abandoned early closes its connection.
+    async def post_stream(self, path, payload):
+        self.bind_loop()
+        body = json.dumps(payload, separators = (",", ":")).encode("utf-8")
+        async with self.semaphore:
+            connection, status, headers = await self.start_request(path, body)
+            complete = False
+            try:
+                if status != 200:
+                    data = await asyncio.wait_for(self.read_body(connection[0], headers), self.timeout)
+                    complete = True
+                    raise BackendError(f"Evaluation failed with status {status}: {data.decode('utf-8', 'replace')}", status)
+                pending = b""
+                async for piece in self.iter_body(connection[0], headers):
+                    pending += piece
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        line = line.strip()
+                        if line.startswith(b"data:") and line[5:].strip() != b"[DONE]":
+                            try:
+                                event = json.loads(line[5:])
+                            except ValueError as e:
+                                raise BackendError(f"Invalid stream event: {line[:200].decode('utf-8', 'replace')}", status) from e
+                            yield event
+                complete = True
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                raise BackendError(f"Connection failed: {e}") from e
+            except asyncio.TimeoutError as e:
+                raise BackendError(f"No response within {self.timeout} seconds.") from e
+            except ValueError as e:
+                raise BackendError(f"Invalid response body: {e}", status) from e
+            finally:
+                if complete:
+                    self.release(connection, headers)
+                else:
+                    connection[1].close()
+
+    async def evaluate(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        status, response = await self.post_json("/chat/completions", request.payload())
+        request.latency = time.perf_counter() - start
+        if status != 200:
+            raise BackendError(f"Evaluation failed with status {status}: {response}", status)
+        content, request.usage = completion_content(response, status)
+        start = time.perf_counter()
+        results = decode_json(content)
+        request.decode_time = time.perf_counter() - start
+        return results
+
+    async def evaluate_stream(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        payload = request.payload()
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        async for event in self.post_stream("/chat/completions", payload):
+            try:
+                if event.get("usage") != None:
+                    request.usage = event["usage"]
+                choices = event.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if len(choices) > 0 else None
+            except (AttributeError, TypeError) as e:
+                raise BackendError(f"Invalid stream event: {str(event)[:200]}", 200) from e
+            if content:
+                yield content
+        request.latency = time.perf_counter() - start
+
+    # Answers several requests with one call to the batch endpoint of a stand-in server.
+    # The requests must share a model and response format. Each distinct system prompt is sent once.
+    async def evaluate_batch(self, requests):
+        start = time.perf_counter()
+        system_prompts = {}
+        items = []
+        for request in requests:
+            index = system_prompts.setdefault(request.system_prompt, len(system_prompts))
+            items.append({"system": index, "user": request.user_prompt})
+        payload = {"model": requests[0].model, "response_format": requests[0].response_format, "system_prompts": list(system_prompts), "requests": items}
+        status, response = await self.post_json("/batch/chat/completions", payload)
+        if status != 200:
+            raise BackendError(f"Batch evaluation failed with status {status}: {response}", status)
+        latency = time.perf_counter() - start
+        if not isinstance(response, dict) or not isinstance(response.get("responses"), list):
+            raise BackendError(f"Malformed batch response: {str(response)[:200]}", status)
+        results = []
+        for request, answer in zip(requests, response["responses"]):
+            try:
+                answer_status, body = answer["status"], answer["body"]
+            except (KeyError, TypeError):
+                results.append(BackendError(f"Malformed batch answer: {str(answer)[:200]}", status))
+                continue
+            if answer_status != 200:
+                results.append(BackendError(f"Evaluation failed with status {answer_status}: {body}", answer_status))
+                continue
+            request.latency = latency
+            start = time.perf_counter()
+            try:
+                content, request.usage = completion_content(body, answer_status)
+                results.append(decode_json(content))
+            except (BackendError, OutputError) as e:
+                results.append(e)
+            request.decode_time = time.perf_counter() - start
+        return results
+
+    # Opens a keep-alive connection, unless an idle one is already available.
+    async def warm(self):
+        self.bind_loop()
+        if len(self.idle) == 0:
+            self.idle.append(await self.open_connection())
+
+    async def close(self):
+        for reader, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+class LatencyModel:
+    """
+    Random latency distribution for simulated backends, in seconds.
+    Kinds are "fixed" (value), "uniform" (low, high), "lognormal" (median, sigma) and "pareto" (minimum, alpha).
+    """
+    def __init__(self, kind = "fixed", *params, seed = None):
+        self.kind = kind
+        self.params = [float(p) for p in params] or [0.0]
+        self.random = random.Random(seed)
+
+    # Parses a "kind:param,param" specification, such as "lognormal:0.4,0.5".
+    def parse(spec, seed = None):
+        kind, _, params = spec.partition(":")
+        return LatencyModel(kind, *[p for p in params.split(",") if p != ""], seed = seed)
+
+    def sample(self):
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.random.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            return self.params[0] * self.random.lognormvariate(0, self.params[1])
+        if self.kind == "pareto":
+            return self.params[0] * self.random.paretovariate(self.params[1])
+        raise ValueError(f"Unknown latency distribution \"{self.kind}\".")
+
+# Splits a prompt rendered from titled sections back into a dictionary of sections.
+def parse_sections(prompt):
+    sections = {}
+    for block in prompt.split("\n\n"):
+        title, _, text = block.partition(":\n")
+        sections[title] = text
+    return sections
+
+CONSUMABLE_WORDS = ("potion", "scroll", "grenade", "bomb", "elixir", "herb", "ration")
+FINISHING_WORDS = re.compile(r"\b(kill|slay|finish|execute|behead|release)\b", re.IGNORECASE)
+
+class RuleBasedBackend(EvaluatorBackend):
+    """
+    Generates action_eval outputs locally with deterministic rules, or from a list of canned action_eval outputs.
+    Requests for the action_delta format are answered with the same outputs, converted to that format.
+    Items named in the player's action are consumed if they look consumable. The scenario ends when the action
+    tries to finish the enemy after clear_turn turns, or at max_turns. The player dies with probability death_rate per turn.
+    An optional latency model adds simulated generation time. Streamed outputs are split into chunks of chunk_size characters.
+    """
+    def __init__(self, model = "gpt-4o-mini", canned_outputs = None, clear_turn = 3, max_turns = 20, death_rate = 0.0, latency = None, seed = None, chunk_size = 16):
+        super().__init__(model)
+        self.canned_outputs = canned_outputs
+        self.clear_turn = clear_turn
+        self.max_turns = max_turns
+        self.death_rate = death_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.requests = 0
+
+    # Generates the structured output for a request, without any simulated latency.
+    def generate(self, request: EvaluationRequest):
+        sections = parse_sections(request.user_prompt)
+        action = sections.get("Player's Actions", "")
+        try:
+            inventory = json.loads(sections.get("Player's Inventory", "[]"))
+            state = json.loads(sections.get("Player's State", "{}"))
+            turn = int(sections.get("Turn Number", "1"))
+        except ValueError:
+            inventory, state, turn = [], {}, 1
+        if request.response_format["json_schema"]["name"] == "action_delta":
+            return compact_output(self.generate_full(action, inventory, state, turn), inventory, state)
+        return self.generate_full(action, inventory, state, turn)
+
+    # Generates an output in the action_eval format.
+    def generate_full(self, action, inventory, state, turn):
+        if self.canned_outputs != None:
+            return self.canned_outputs[self.requests % len(self.canned_outputs)]
+        lowered = action.lower()
+        consumed = [name for name in inventory if name.lower() in lowered and any(word in name.lower() for word in CONSUMABLE_WORDS)]
+        scenario_over = (turn >= self.clear_turn and FINISHING_WORDS.search(action) != None) or turn >= self.max_turns
+        game_over = not scenario_over and self.random.random() < self.death_rate
+        if scenario_over:
+            text = f"Your action lands: {action.strip()} The enemy falls, and the scenario is over."
+        elif game_over:
+            text = f"You try to act: {action.strip()} The enemy strikes first, and you fall."
+        else:
+            text = f"You act: {action.strip()} The enemy recovers and prepares another attack."
+        return {
+            "text_output": text,
+            "new_player_state": {
+                "physical_state": "dead" if game_over else state.get("physical_state", "healthy"),
+                "mental_state": state.get("mental_state", "calm"),
+                "inventory": [name for name in inventory if name not in consumed]
+            },
+            "scenario_over": scenario_over,
+            "game_over": game_over
+        }
+
+    # Generates the output of a request, and fills in its usage.
+    def answer(self, request: EvaluationRequest):
+        results = self.generate(request)
+        self.requests += 1
+        request.usage = {
+            "prompt_tokens": estimate_tokens(request.system_prompt) + estimate_tokens(request.user_prompt),
+            "completion_tokens": estimate_tokens(json.dumps(results))
+        }
+        return results
+
+    async def evaluate(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        if self.latency != None:
+            await asyncio.sleep(self.latency.sample())
+        results = self.answer(request)
+        request.latency = time.perf_counter() - start
+        return results
+
+    async def evaluate_stream(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        delay = self.latency.sample() if self.latency != None else 0
+        content = json.dumps(self.answer(request))
+        chunks = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)]
+        for index, chunk in enumerate(chunks):
+            if delay > 0:
+                await asyncio.sleep(delay * FIRST_CHUNK_SHARE if index == 0 else delay * (1 - FIRST_CHUNK_SHARE) / (len(chunks) - 1))
+            yield chunk
+        request.latency = time.perf_counter() - start
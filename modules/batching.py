@@ -0,0 +1,100 @@
+from .backends import BackendError, EvaluationRequest, EvaluatorBackend
+from collections import deque
+import asyncio
+import time
+
+class BatchingBackend(EvaluatorBackend):
+    """
+    Collects the evaluation requests of concurrent turns into batches, and sends each batch with one call to the wrapped backend's evaluate_batch.
+    A batch is sent once it holds max_batch requests, or window seconds after its first request arrived. A window of 0 batches the requests
+    made in the same pass of the event loop. Results are handed back to each waiting turn as if it had been evaluated alone.
+    Requests are only batched with requests for the same model and response format. Streams are passed through without batching,
+    as they are narrated while they are generated.
+    The stats count the requests, the batches, and the requests sent in batches. Waits holds the recent seconds each request spent waiting for its batch to be sent.
+    """
+    def __init__(self, backend: EvaluatorBackend, window = 0.01, max_batch = 32):
+        super().__init__(backend.model)
+        self.backend = backend
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = {} # Requests waiting for their batch to be sent, as lists of [request, future, queued time], keyed by model and response format.
+        self.timers = {} # Timers that send the pending batches once their window ends.
+        self.dispatches = set() # Batches in flight.
+        self.waits = deque(maxlen = 1024)
+        self.stats = {"requests": 0, "batches": 0, "batched": 0, "largest": 0}
+
+    async def evaluate(self, request: EvaluationRequest):
+        loop = asyncio.get_running_loop()
+        key = (request.model, id(request.response_format))
+        batch = self.pending.setdefault(key, [])
+        entry = [request, loop.create_future(), time.perf_counter()]
+        batch.append(entry)
+        self.stats["requests"] += 1
+        if len(batch) >= self.max_batch:
+            self.flush(key)
+        elif len(batch) == 1:
+            self.timers[key] = loop.call_later(self.window, self.flush, key)
+        try:
+            return await entry[1]
+        except asyncio.CancelledError:
+            # A request cancelled before its batch was sent, such as by a deadline, is left out of the batch.
+            if entry in self.pending.get(key, []):
+                batch.remove(entry)
+                # Once nothing is left to send, the batch and its timer are dropped, so that the next request starts a new window.
+                if len(batch) == 0:
+                    self.flush(key)
+            raise
+
+    # Sends the pending batch for a key.
+    def flush(self, key):
+        timer = self.timers.pop(key, None)
+        if timer != None:
+            timer.cancel()
+        batch = self.pending.pop(key, None)
+        if batch:
+            dispatch = asyncio.ensure_future(self.dispatch(batch))
+            self.dispatches.add(dispatch)
+            dispatch.add_done_callback(self.dispatches.discard)
+
+    async def dispatch(self, batch):
+        sent = time.perf_counter()
+        for request, future, queued in batch:
+            self.waits.append(sent - queued)
+        self.stats["batches"] += 1
+        self.stats["batched"] += len(batch)
+        self.stats["largest"] = max(self.stats["largest"], len(batch))
+        try:
+            results = await self.backend.evaluate_batch([request for request, future, queued in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        if len(results) < len(batch):
+            # The requests left without a result would otherwise wait forever.
+            missing = BackendError(f"Batch of {len(batch)} requests answered with {len(results)} results.")
+            results = list(results) + [missing] * (len(batch) - len(results))
+        for (request, future, queued), result in zip(batch, results):
+            # The caller may have given up on the request while it was in flight.
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    # Average number of requests per batch sent.
+    def mean_batch_size(self):
+        return self.stats["batched"] / self.stats["batches"] if self.stats["batches"] > 0 else 0.0
+
+    async def evaluate_stream(self, request: EvaluationRequest):
+        async for chunk in self.backend.evaluate_stream(request):
+            yield chunk
+
+    async def warm(self):
+        await self.backend.warm()
+
+    # Sends any pending batches and waits for them, then closes the wrapped backend.
+    async def close(self):
+        for key in list(self.pending):
+            self.flush(key)
+        if len(self.dispatches) > 0:
+            await asyncio.gather(*self.dispatches, return_exceptions = True)
+        await self.backend.close()
\ No newline at end of file
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+
+# Returns a canonical hash for an action evaluation request.
+# Key order and whitespace do not affect the hash, so equal requests always share a key.
+def evaluation_key(system_prompt, user_prompt, schema, model):
+    payload = json.dumps([system_prompt, user_prompt, schema, model], sort_keys = True, separators = (",", ":"), ensure_ascii = False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    Persistent tier of the response cache, backed by an SQLite file.
+    The file can be shared by several processes; SQLite handles locking between them.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout = 30, check_same_thread = False)
+        # WAL mode allows readers in other processes while one process writes.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, results TEXT NOT NULL)")
+        self.connection.commit()
+
+    # Returns the stored results, or None if the key is not stored.
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT results FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, results):
+        data = json.dumps(results, separators = (",", ":"), ensure_ascii = False)
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, results) VALUES (?, ?)", (key, data))
+            self.connection.commit()
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class ResponseCache:
+    """
+    The ResponseCache class stores action evaluation results, keyed with evaluation_key.
+    Recently used results are kept in a bounded in-memory LRU. An optional DiskCache tier persists results across runs.
+    Any object with the same get/put methods can be given to Interface.set_cache instead.
+    Cached results are shared between callers, and should be treated as read-only.
+    """
+    def __init__(self, max_entries = 1024, disk_path = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk = DiskCache(disk_path) if disk_path != None else None
+
+        # Counters for reporting the effectiveness of the cache.
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # Returns the cached results, or None on a miss.
+    # Disk hits are promoted into memory.
+    def get(self, key):
+        with self.lock:
+            results = self.entries.get(key)
+            if results is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return results
+        if self.disk != None:
+            results = self.disk.get(key)
+            if results is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self.store(key, results)
+                return results
+        with self.lock:
+            self.misses += 1
+        return None
+
+    # Stores results in memory, and on disk if a disk tier exists.
+    def put(self, key, results):
+        self.store(key, results)
+        if self.disk != None:
+            self.disk.put(key, results)
+
+    # Inserts into the in-memory LRU, evicting the least recently used entries when full.
+    def store(self, key, results):
+        with self.lock:
+            self.entries[key] = results
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk != None:
+            self.disk.clear()
+
+    # Returns the hit/miss counters, along with the hit rate over all lookups.
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups > 0 else 0.0
+            }
@@ -1,35 +1,51 @@
-import json
-class Character:
-  def __init__(self,name, physical_state = "healthy", mental_state = "happy"):
-    self.name = name
-    self.inventory = []
-    self.player_state = {
-      "physical_state": physical_state, # healthy, sick, injured, etc.
-      "mental_state": mental_state, # calm, stressed, happy, scared, etc.
-      "inventory": []
-    }
-
-  def display_player_state(self):
-    for state in self.player_state:
-      print(f"{state}: {self.player_state[state]}")
-
-  def update_player_state(self, state, updated_state):
-    self.player_state[state] = updated_state
-
-  def player_state_json(self):
-    return json.dumps(self.player_state)
-
-  def display_inventory(self):
-    print("Character's inventory:")
-    for item in self.inventory:
-      print(item, self.inventory[item])
-
-  def add_item(self, item):
-      self.inventory.append(item)
-      self.player_state["inventory"].append(item)
-
-  def remove_item(self, item):
-    if item in self.inventory:
-      self.inventory.remove(item)
-    if item in self.player_state["inventory"]:
-      self.player_state["inventory"].remove(item)
\ No newline at end of file
+from .inventory import Inventory
+import json
+class Character:
+  __slots__ = ("name", "inventory", "player_state")
+
+  def __init__(self,name, physical_state = "healthy", mental_state = "happy"):
+    self.name = name
+    self.inventory = Inventory()
+    self.player_state = {
+      "physical_state": physical_state, # healthy, sick, injured, etc.
+      "mental_state": mental_state, # calm, stressed, happy, scared, etc.
+      "inventory": self.inventory # Same container as self.inventory, not a copy.
+    }
+
+  def display_player_state(self):
+    for state in self.player_state:
+      print(f"{state}: {self.player_state[state]}")
+
+  def update_player_state(self, state, updated_state):
+    self.player_state[state] = updated_state
+
+  # Names of the items in the inventory, in order, repeated per item in a stack.
+  def inventory_names(self):
+    return self.inventory.names()
+
+  # Canonical compact JSON of the inventory, listing item names.
+  def inventory_json(self):
+    return self.inventory.to_json()
+
+  # Canonical compact JSON of the player state.
+  # Keys are sorted and items are represented by their names, so equal states always serialize identically.
+  def player_state_json(self, include_inventory = True):
+    state = {}
+    for key in self.player_state:
+      if key != "inventory":
+        state[key] = self.player_state[key]
+    if include_inventory:
+      state["inventory"] = self.inventory_names()
+    return json.dumps(state, sort_keys=True, separators=(",", ":"))
+
+  def display_inventory(self):
+    print("Character's inventory:")
+    for item, count in self.inventory.items():
+      print(item.get_name(), count)
+
+  def add_item(self, item):
+    self.inventory.add(item)
+
+  # Removes one of the item, given as an item or an item name.
+  def remove_item(self, item):
+    return self.inventory.remove(item)
\ No newline at end of file
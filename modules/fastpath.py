@@ -0,0 +1,113 @@
+import re
+
+# Responses that only ask for the current scenario again.
+LOOK_PATTERN = re.compile(r"^(?:i\s+)?(?:look|look around|look about|glance around|observe(?: the surroundings)?|survey the (?:area|scene)|where am i)[.!?]*$", re.IGNORECASE)
+# Words that mean an item is being used, rather than picked up or looked for.
+USE_PATTERN = re.compile(r"\b(?:use|using|drink|quaff|throw|toss|cast|read|wield|swing|equip|eat|wear|with)\b", re.IGNORECASE)
+TAKE_PATTERN = re.compile(r"\b(?:pick|take|grab|loot|steal|find|search|buy|look for)\b", re.IGNORECASE)
+
+# Returns a result in the shape of an action_eval evaluation, leaving the player's state as it is.
+def local_result(player, text_output, scenario_over = False, game_over = False):
+    return {
+        "text_output": text_output,
+        "new_player_state": {
+            "physical_state": player.player_state["physical_state"],
+            "mental_state": player.player_state["mental_state"],
+            "inventory": player.inventory.names()
+        },
+        "scenario_over": scenario_over,
+        "game_over": game_over
+    }
+
+# Empty responses are not an action.
+def empty_rule(area, player, response):
+    if response.strip() == "":
+        return local_result(player, "You hesitate, and nothing happens.")
+
+# Looking around restates the current scenario.
+def look_rule(area, player, response):
+    if LOOK_PATTERN.match(response.strip()):
+        return local_result(player, area.scenario_progress.current_scenario)
+
+# Returns the spans of the whole-word mentions of a lowercase name in a lowercase text. Hyphenated words are whole words.
+def mentions(name, text):
+    if name not in text:
+        return []
+    return [match.span() for match in re.finditer(r"(?<![\w-])" + re.escape(name) + r"(?![\w-])", text)]
+
+# Using an item of the world's catalog that the player does not hold cannot succeed.
+# Only whole item names are matched, longest first, so that a mention of "Potion of Healing" is not also read as "Potion".
+# Names that are part of the name of a held item are left to the model, as are responses that pick up or look for an item.
+def missing_item_rule(area, player, response):
+    if area.world == None or not USE_PATTERN.search(response) or TAKE_PATTERN.search(response):
+        return None
+    text = response.lower()
+    held = {name.lower() for name in player.inventory.names()}
+    matched = []
+    for name in sorted(area.world.catalog.definitions, key = len, reverse = True):
+        lowered = name.lower()
+        for start, end in mentions(lowered, text):
+            if any(start >= other_start and end <= other_end for other_start, other_end in matched):
+                continue
+            matched.append((start, end))
+            if name in player.inventory or any(len(mentions(lowered, held_name)) > 0 for held_name in held):
+                continue
+            return local_result(player, f"You reach for the {name}, but you do not have it.")
+
+class FastPathResolver:
+    """
+    The FastPathResolver class decides trivial or invalid dynamic turns locally, so that they never reach the evaluation model.
+    Rules are called as rule(area, player, response), and return a result in the shape of an action_eval evaluation, or None to pass.
+    The rules of the area are tried first, then the resolver's own rules, then the optional classifier.
+    A response repeating the previous turn of an area, when that turn was decided locally, gets the same result again.
+    The classifier is called as classifier(response), and returns a (label, confidence) pair. Labels "empty" and "look"
+    are decided by the matching rule's result when the confidence reaches the threshold; any other label is escalated.
+    Turns decided locally narrate their result without advancing the scenario, unless the result ends it.
+    Stats count the dynamic turns seen, and the turns decided locally.
+    """
+    def __init__(self, rules = None):
+        self.enabled = True
+        self.rules = rules if rules != None else [empty_rule, look_rule, missing_item_rule]
+        self.classifier = None
+        self.threshold = 0.9
+        self.last = {} # Last locally decided response of each area, mapped to its result.
+        self.stats = {"turns": 0, "local": 0}
+
+    # Sets a small local classifier, consulted after every rule has passed. Use None to disable it.
+    def set_classifier(self, classifier, threshold = 0.9):
+        self.classifier = classifier
+        self.threshold = threshold
+
+    # Returns the result of a turn decided locally, or None if the turn should be evaluated by the model.
+    def resolve(self, area, player, response):
+        self.stats["turns"] += 1
+        results = None
+        last = self.last.pop(area, None)
+        normalized = " ".join(response.lower().split())
+        if last != None and last[0] == normalized:
+            results = last[1]
+        if results == None:
+            for rule in area.fast_path_rules + self.rules if area.fast_path_rules != None else self.rules:
+                results = rule(area, player, response)
+                if results != None:
+                    break
+        if results == None and self.classifier != None:
+            label, confidence = self.classifier(response)
+            if confidence >= self.threshold:
+                if label == "empty":
+                    results = local_result(player, "You hesitate, and nothing happens.")
+                elif label == "look":
+                    results = local_result(player, area.scenario_progress.current_scenario)
+
+        tracer = area.interface.tracer
+        if results == None:
+            tracer.count("fastpath_escalated")
+            return None
+        self.last[area] = (normalized, results)
+        self.stats["local"] += 1
+        tracer.count("fastpath_local")
+        return results
+
+    # Share of the dynamic turns that were decided without the model.
+    def local_rate(self):
+        return self.stats["local"] / self.stats["turns"] if self.stats["turns"] > 0 else 0.0
\ No newline at end of file
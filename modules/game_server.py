@@ -0,0 +1,192 @@
+from .backends import HTTPBackend, OpenAIBackend
+from .cache import ResponseCache
+from .headless import SessionEnded
+from .interface import Interface
+from .resilience import ResilientBackend
+from .simulation import load_factory
+from .world_loader import WorldBundle, bundle_world_factory
+import argparse
+import asyncio
+
+class SessionInterface(Interface):
+    """
+    The SessionInterface class plays one game session over a network connection, using a plain text line protocol.
+    Narration is written to the connection, and prompts are awaited without blocking the event loop,
+    so that a single process can serve many sessions at once.
+    Output is bounded: a client that stops reading for long enough to fill max_output bytes is disconnected.
+    The end of the game is reported through the ending attribute, and a SessionEnded exception unwinds the session.
+    """
+    def __init__(self, reader, writer, idle_timeout = 600.0, max_output = 1 << 20):
+        super().__init__()
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout # Seconds to wait for a response before ending the session.
+        self.max_output = max_output # Bytes of unsent output allowed before the client is disconnected.
+        self.blocking_input = False
+        self.ending = None
+        self.responses = 0
+
+    def write(self, text):
+        if self.writer.transport.get_write_buffer_size() > self.max_output:
+            self.end_game("slow_client")
+        self.writer.write(text.encode("utf-8"))
+
+    def narrate(self, text):
+        self.write(text + "\n")
+
+    def narrate_partial(self, text):
+        self.write(text)
+
+    # Records the ending and unwinds the session.
+    def end_game(self, ending = ""):
+        self.ending = ending
+        raise SessionEnded(ending)
+
+    # Writes a prompt, and returns the next line sent by the player.
+    async def read_response(self, prompt):
+        self.write(prompt)
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            self.end_game("timeout")
+        except ValueError:
+            # The line is longer than the stream's limit.
+            self.end_game("disconnected")
+        if line == b"":
+            self.end_game("disconnected")
+        self.responses += 1
+        response = line.decode("utf-8", "replace").strip()
+        if response.lower() == "quit" or response.lower() == "q":
+            self.end_game("quit")
+        return response
+
+    async def get_multiple_choice_response_async(self, options):
+        if len(options) > 0:
+            self.write("".join(f"{number}: {option}\n" for number, option in enumerate(options, 1)))
+            while True:
+                response = await self.read_response("Select an Option:\n> ")
+                try:
+                    option = int(response)
+                except ValueError:
+                    self.narrate("Invalid Input! Please enter a valid option number.")
+                    continue
+                if option < 1 or len(options) < option:
+                    self.narrate("Invalid Option! Please enter a valid option number.")
+                    continue
+                return option - 1
+
+    async def get_free_response_async(self, text):
+        self.narrate(text)
+        return await self.read_response("Player's Response:\n> ")
+
+    # Custom actions are plain functions, so their prompts cannot wait for the player without stalling every other session.
+    # The prompt is still shown, and is answered with the first option or an empty response.
+    def get_multiple_choice_response(self, options):
+        if len(options) > 0:
+            self.write("".join(f"{number}: {option}\n" for number, option in enumerate(options, 1)))
+            return 0
+
+    def get_free_response(self, text):
+        self.narrate(text)
+        return ""
+
+class GameServer:
+    """
+    The GameServer class serves game sessions over TCP, one per connection, all on a single event loop.
+    Every session gets its own world from world_factory(interface), and shares the server's evaluator backend, response cache and tracer.
+    With a factory from bundle_world_factory, the worlds share one immutable bundle, and each world only holds the areas
+    its session has used, its player and its flags.
+    Connections beyond max_sessions are turned away. The stats count sessions and how they ended.
+    """
+    def __init__(self, world_factory, host = "127.0.0.1", port = 8200, backend = None, cache = None, tracer = None, max_sessions = 10000, idle_timeout = 600.0, max_acts = 100000, backlog = 1024):
+        self.world_factory = world_factory
+        self.host = host
+        self.port = port
+        self.backend = backend
+        self.cache = cache
+        self.tracer = tracer
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_acts = max_acts
+        self.backlog = backlog # Pending connections queued by the kernel. Bursts of clients beyond it wait for their connections to be retried.
+
+        self.server = None
+        self.sessions = {} # Tasks serving open sessions, keyed by their stream writers.
+        self.stats = {"sessions": 0, "active": 0, "peak": 0, "rejected": 0, "endings": {}}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog = self.backlog)
+        # Port 0 picks a free port; report the one actually bound.
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    # Stops accepting connections, and ends the open sessions.
+    async def stop(self):
+        self.server.close()
+        for task in list(self.sessions.values()):
+            task.cancel()
+        await asyncio.gather(*self.sessions.values(), return_exceptions = True)
+        await self.server.wait_closed()
+
+    # Plays a session on a connection, until the game ends or the player leaves.
+    async def handle_connection(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            self.stats["rejected"] += 1
+            writer.write(b"The server is full. Try again later.\n")
+            writer.close()
+            return
+        self.sessions[writer] = asyncio.current_task()
+        self.stats["sessions"] += 1
+        self.stats["active"] = len(self.sessions)
+        self.stats["peak"] = max(self.stats["peak"], self.stats["active"])
+
+        interface = SessionInterface(reader, writer, self.idle_timeout)
+        interface.set_backend(self.backend)
+        interface.set_cache(self.cache)
+        interface.set_tracer(self.tracer)
+        ending = "act_limit"
+        try:
+            interface.narrate("Connected. Respond with q or quit to leave the game.")
+            world = self.world_factory(interface)
+            world.start()
+            for _ in range(self.max_acts):
+                await world.act_async()
+        except SessionEnded as e:
+            ending = e.ending
+        except ConnectionError:
+            ending = "disconnected"
+        except asyncio.CancelledError:
+            ending = "shutdown"
+            raise
+        finally:
+            self.stats["endings"][ending] = self.stats["endings"].get(ending, 0) + 1
+            self.sessions.pop(writer, None)
+            self.stats["active"] = len(self.sessions)
+            writer.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve game sessions over TCP. Connect with a line-based client, such as nc.")
+    parser.add_argument("world", nargs = "?", help = "World factory, as module:function, built once per session. For example, demo_world:build_world")
+    parser.add_argument("--bundle", help = "Compiled world bundle shared by every session, instead of a world factory.")
+    parser.add_argument("--bindings", help = "Bindings of the bundle, as module:attribute.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8200)
+    parser.add_argument("--backend-url", help = "OpenAI-compatible endpoint, such as a stand-in server. Defaults to the OpenAI API, using OPENAI_API_KEY.")
+    parser.add_argument("--max-sessions", type = int, default = 10000)
+    parser.add_argument("--idle-timeout", type = float, default = 600.0)
+    args = parser.parse_args()
+    if (args.world == None) == (args.bundle == None):
+        parser.error("Give either a world factory or --bundle.")
+
+    if args.bundle:
+        world_factory = bundle_world_factory(WorldBundle(args.bundle), load_factory(args.bindings) if args.bindings else None)
+    else:
+        world_factory = load_factory(args.world)
+    backend = HTTPBackend(args.backend_url) if args.backend_url else OpenAIBackend()
+    server = GameServer(world_factory, args.host, args.port, ResilientBackend(backend), ResponseCache(), max_sessions = args.max_sessions, idle_timeout = args.idle_timeout)
+
+    async def serve():
+        await server.start()
+        print(f"Serving game sessions at {server.host}:{server.port}")
+        await server.server.serve_forever()
+    asyncio.run(serve())
\ No newline at end of file
@@ -0,0 +1,168 @@
+from .interface import Interface
+import json
+import random
+import re
+import time
+
+# Free responses used when no scripted stream is given.
+DEFAULT_FREE_RESPONSES = [
+    "I attack with my staff.",
+    "I charge a powerful spell.",
+    "I release the charged spell at the enemy.",
+    "I dodge to the side.",
+    "I look around.",
+    "I drink the mystery potion."
+]
+
+INVENTORY_PATTERN = re.compile(r"Player's Inventory:\n(\[.*?\])\n")
+
+class SessionEnded(Exception):
+    """
+    Raised by a HeadlessInterface when the game ends, to unwind the session instead of exiting the process.
+    The ending is the same value that was given to Interface.end_game.
+    """
+    def __init__(self, ending):
+        super().__init__(ending)
+        self.ending = ending
+
+class HeadlessInterface(Interface):
+    """
+    The HeadlessInterface class plays a world without a terminal.
+    Multiple-choice responses are taken from a scripted stream of option indices, or chosen at random when no stream is given.
+    Free responses are taken from a scripted stream of strings, or chosen at random from a pool.
+    Narration is captured into the output buffer instead of being printed.
+    The end of the game is reported through the ending attribute, and a SessionEnded exception unwinds the session.
+    Evaluations use the given evaluator callable, or the backend set with set_backend. If neither is given, the first evaluation
+    creates a backend for the OpenAI API, with the key read from the OPENAI_API_KEY environment variable.
+    """
+    def __init__(self, choices = None, free_responses = None, seed = None, evaluator = None, max_responses = 1000, capture_output = True):
+        super().__init__()
+        self.random = random.Random(seed)
+        self.choices = iter(choices) if choices != None else None # Zero-based option indices.
+        self.free_responses = iter(free_responses) if free_responses != None else None
+        self.evaluator = evaluator # Called as evaluator(user_prompt, system_prompt), returns the action_eval dictionary.
+        self.max_responses = max_responses # Ends the game once this many responses have been given.
+        self.capture_output = capture_output
+
+        self.output = [] # Captured narration and prompts.
+        self.partial = "" # Narration of the current line, captured once the line ends.
+        self.ending = None
+        self.responses = 0 # Number of responses given to the game, used as the turn count.
+        self.evaluations = 0
+        # Seconds spent in each part of the interface, used to report where the time of a playthrough goes.
+        self.timings = {"input": 0.0, "narrate": 0.0, "evaluate": 0.0}
+        self.blocking_input = False
+
+    # Records the ending and unwinds the session.
+    def end_game(self, ending = ""):
+        self.ending = ending
+        raise SessionEnded(ending)
+
+    # Counts a response, and ends the game once the response limit is reached.
+    def next_response(self):
+        if self.responses >= self.max_responses:
+            self.end_game("response_limit")
+        self.responses += 1
+
+    def get_multiple_choice_response(self, options):
+        start = time.perf_counter()
+        if len(options) > 0:
+            self.next_response()
+            if self.capture_output:
+                self.output.append(options)
+            if self.choices == None:
+                option = self.random.randrange(len(options))
+            else:
+                option = next(self.choices, None)
+                if option == None:
+                    self.end_game("script_exhausted")
+                # Out of range options are clamped, as a player would be re-prompted until a valid option is entered.
+                option = min(max(option, 0), len(options) - 1)
+            self.timings["input"] += time.perf_counter() - start
+            return option
+
+    def get_free_response(self, text):
+        start = time.perf_counter()
+        self.next_response()
+        if self.capture_output:
+            self.output.append(text)
+        if self.free_responses == None:
+            response = self.random.choice(DEFAULT_FREE_RESPONSES)
+        else:
+            response = next(self.free_responses, None)
+            if response == None:
+                self.end_game("script_exhausted")
+        if response.lower() == "quit" or response.lower() == "q":
+            self.end_game("quit")
+        self.timings["input"] += time.perf_counter() - start
+        return response
+
+    def narrate(self, text):
+        start = time.perf_counter()
+        if self.capture_output:
+            self.output.append(self.partial + text)
+            self.partial = ""
+        self.timings["narrate"] += time.perf_counter() - start
+
+    def narrate_partial(self, text):
+        start = time.perf_counter()
+        if self.capture_output:
+            self.partial += text
+        self.timings["narrate"] += time.perf_counter() - start
+
+    # Prompts never block, so they are answered directly on the event loop.
+    async def get_multiple_choice_response_async(self, options):
+        return self.get_multiple_choice_response(options)
+
+    async def get_free_response_async(self, text):
+        return self.get_free_response(text)
+
+    # Sets the OpenAI backend if no backend was set. It is only created on the first evaluation, as static worlds never need it.
+    def ensure_backend(self):
+        if self.backend == None:
+            from .backends import OpenAIBackend
+            from .resilience import ResilientBackend
+            self.set_backend(ResilientBackend(OpenAIBackend()))
+
+    async def evaluate_actions_async(self, user_prompt = "", system_prompt = "", use_cache = True):
+        start = time.perf_counter()
+        self.evaluations += 1
+        try:
+            if self.evaluator == None:
+                self.ensure_backend()
+                return await super().evaluate_actions_async(user_prompt, system_prompt, use_cache)
+            return self.evaluator(user_prompt, system_prompt)
+        finally:
+            self.timings["evaluate"] += time.perf_counter() - start
+
+    # Evaluator callables are not streamed, so their text output is passed to on_text at once.
+    async def evaluate_actions_stream_async(self, user_prompt = "", system_prompt = "", on_text = None, use_cache = True):
+        start = time.perf_counter()
+        self.evaluations += 1
+        try:
+            if self.evaluator == None:
+                self.ensure_backend()
+                return await super().evaluate_actions_stream_async(user_prompt, system_prompt, on_text, use_cache)
+            results = self.evaluator(user_prompt, system_prompt)
+            self.first_narration_latencies.append(time.perf_counter() - start)
+            if on_text != None:
+                on_text(results["text_output"])
+            return results
+        finally:
+            self.timings["evaluate"] += time.perf_counter() - start
+
+# Returns an evaluator which resolves turns at random, without a model.
+# The inventory from the prompt is kept unchanged. The scenario ends with probability clear_chance per turn, and the player dies with probability death_chance.
+def random_evaluator(seed = None, clear_chance = 0.3, death_chance = 0.05):
+    rng = random.Random(seed)
+    def evaluate(user_prompt, system_prompt):
+        match = INVENTORY_PATTERN.search(user_prompt)
+        inventory = json.loads(match.group(1)) if match else []
+        roll = rng.random()
+        return {
+            "text_output": "The fight goes on.",
+            "new_player_state": {"physical_state": "healthy", "mental_state": "focused", "inventory": inventory},
+            "scenario_over": roll < clear_chance,
+            "game_over": clear_chance <= roll < clear_chance + death_chance
+        }
+    return evaluate
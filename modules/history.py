@@ -0,0 +1,104 @@
+from .prompt import estimate_tokens, truncate_tokens
+from collections import deque
+import re
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Sentences about lasting state, such as charged attacks or wounds, are preferred when summarizing a turn.
+STATE_WORDS = re.compile(r"\b(charg\w*|ready|prepar\w*|wound\w*|injur\w*|weak\w*|bleed\w*|shield\w*|barrier|stun\w*|exhaust\w*|heal\w*|summon\w*|dead|die[sd]?|fall(s|en)?|fell|kill\w*|slain|lost|broken)\b", re.IGNORECASE)
+
+class TurnRecord:
+    """
+    One evaluated turn of a dynamic scenario. The summary is the compact line that replaces the turn once it is folded.
+    It is only computed once it is needed, as most turns of a short scenario are never folded.
+    """
+    __slots__ = ("turn", "action", "outcome", "cached_summary")
+
+    def __init__(self, turn, action, outcome, summary = None):
+        self.turn = turn
+        self.action = action
+        self.outcome = outcome
+        self.cached_summary = summary
+
+    def summary(self):
+        if self.cached_summary == None:
+            self.cached_summary = summarize_turn(self.turn, self.action, self.outcome)
+        return self.cached_summary
+
+# Extractive summary of a turn: the action, and the sentences of the outcome about lasting state, or else its first sentence.
+def summarize_turn(turn, action, outcome, action_tokens = 16, outcome_tokens = 40):
+    sentences = [sentence for sentence in SENTENCE_END.split(outcome.strip()) if sentence != ""]
+    kept = [sentence for sentence in sentences if STATE_WORDS.search(sentence)] or sentences[:1]
+    return f"Turn {turn}: {truncate_tokens(action.strip(), action_tokens)} -> {truncate_tokens(' '.join(kept), outcome_tokens)}"
+
+class TurnHistory:
+    """
+    The TurnHistory class keeps the history of a dynamic scenario within a bounded size.
+    The last recent_turns turns are kept verbatim. Older turns are folded into summary lines,
+    and the oldest summary lines are dropped once the summary exceeds summary_tokens.
+    The prompt token counts of the turns still kept, verbatim or summarized, are kept in turn_tokens.
+    """
+    def __init__(self, recent_turns = 3, summary_tokens = 150):
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.recent = deque() # Verbatim turns, oldest first.
+        self.summary_lines = [] # Summaries of folded turns, oldest first.
+        self.omitted = 0 # Number of folded turns dropped from the summary.
+        self.turn_tokens = deque() # Prompt tokens of the kept turns, as (turn, tokens) pairs, oldest first.
+
+    def __len__(self):
+        return len(self.recent) + len(self.summary_lines) + self.omitted
+
+    # Records an evaluated turn, folding the oldest verbatim turn into the summary if needed.
+    def add(self, turn, action, outcome, prompt_tokens = None):
+        self.recent.append(TurnRecord(turn, action, outcome))
+        while len(self.recent) > self.recent_turns:
+            self.fold(self.recent.popleft())
+        if prompt_tokens != None:
+            self.turn_tokens.append((turn, prompt_tokens))
+        self.trim_turn_tokens()
+
+    # Drops the token counts of the turns that were dropped from the summary, so that they stay bounded like the turns they describe.
+    def trim_turn_tokens(self):
+        while len(self.turn_tokens) > len(self.recent) + len(self.summary_lines):
+            self.turn_tokens.popleft()
+
+    def fold(self, record: TurnRecord):
+        self.summary_lines.append(record.summary())
+        while len(self.summary_lines) > 1 and estimate_tokens(" ".join(self.summary_lines)) > self.summary_tokens:
+            self.summary_lines.pop(0)
+            self.omitted += 1
+
+    # Renders the history for a prompt, with at most verbatim turns kept in full. The other turns are rendered as summaries.
+    # The outcome of the last turn is left out, as it is the current scenario.
+    def render(self, verbatim = None, include_summary = True):
+        verbatim = self.recent_turns if verbatim == None else verbatim
+        records = list(self.recent)
+        split = max(len(records) - verbatim, 0)
+        lines = []
+        if include_summary:
+            if self.omitted > 0:
+                lines.append(f"({self.omitted} earlier turns omitted.)")
+            lines += self.summary_lines
+            lines += [record.summary() for record in records[:split]]
+        for index, record in enumerate(records[split:], split):
+            if index == len(records) - 1:
+                lines.append(f"Turn {record.turn}: {record.action}")
+            else:
+                lines.append(f"Turn {record.turn}: {record.action} -> {record.outcome}")
+        return "\n".join(lines) if len(lines) > 0 else "No event has occured previously yet."
+
+    # Returns the history in a compact, JSON-compatible form, for snapshots.
+    def capture_state(self):
+        return {
+            "r": [[record.turn, record.action, record.outcome, record.cached_summary] for record in self.recent],
+            "l": list(self.summary_lines),
+            "o": self.omitted,
+            "k": [list(pair) for pair in self.turn_tokens]
+        }
+
+    def restore_state(self, state):
+        self.recent = deque(TurnRecord(*entry) for entry in state["r"])
+        self.summary_lines = list(state["l"])
+        self.omitted = state["o"]
+        self.turn_tokens = deque(tuple(pair) for pair in state["k"])
+        self.trim_turn_tokens()
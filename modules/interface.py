@@ -1,128 +1,247 @@
-import openai
-import json
-# import os
-import getpass # Used for secure input.
-
-class Interface:
-    """
-    The Interface class is responsible for handling front-end communications with the player.
-    It provides methods for other classes to communicate with the player and receive results.
-    This also serves as a front-end method for interacting with the OpenAI API when needed.
-    """
-    def __init__(self):
-        # Login is handled in a separate function, such that there is an option for exclusive non-AI usage.
-        pass
-
-    # Used to access the OpenAI API.
-    def openai_login(self):
-        print('Enter OpenAI API key (Hidden Input):')
-        # os.environ["OPENAI_API_KEY"] = getpass.getpass()
-        # self.client = openai.OpenAI()
-        self.client = openai.OpenAI(api_key = getpass.getpass())
-    
-    # Takes a list of ordered options, prints them, and returns the index of the option selected.
-    # Guarantees that a valid option is selected by re-prompting the user until a valid option is retrieved.
-    def get_multiple_choice_response(self, options):
-        # Checks if a valid number of options exist.
-        if len(options) > 0:
-            valid_option = False
-            option_count = 0
-            for option in options:
-                option_count += 1
-                print(str(option_count)+": "+str(option))
-            # Loops until a valid option has been retrieved.
-            while (valid_option == False):
-                try:
-                    response = input("Select an Option:\n> ")
-                    if response.lower() == "quit" or response.lower() == "q":
-                        exit()
-                    response = int(response)
-                    # Handles whether the option is out of bounds or not.
-                    if response < 1 or option_count < response:
-                        print("Invalid Option! Please enter a valid option number.")
-                        valid_option = False
-                    else:
-                        valid_option = True
-                except ValueError:
-                    # Handles if the option isn't an integer.
-                    print("Invalid Input! Please enter a valid option number.")
-                    valid_option = False
-
-            # Applies an offset of 1 to compensate for the offset in the option index display.
-            response -= 1
-            return response
-        else:
-            pass
-
-    # Prints the text and returns the response of the player.
-    def get_free_response(self, text):
-        print(text)
-        response = input("Player's Response:\n> ")
-        if response.lower() == "quit" or response.lower() == "q":
-            exit()
-        return response
-
-    # Prints the text exclusively.
-    def narrate(self, text):
-        print(text)
-        pass
-    
-    # Modifies the world/character state in accordance with an AI interpretation of the player's actions.
-    # Given a user and system prompt in string format, returns a structured output in dictionary format.
-    def evaluate_actions(self, user_prompt = "", system_prompt = ""):
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt}, # Hidden to User
-                {"role": "user", "content": user_prompt} # Known to User
-            ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "action_eval",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "new_player_state": {
-                                "type": "object",
-                                "properties": {
-                                    "physical_state": {"type": "string"},
-                                    "mental_state": {"type": "string"},
-                                    "inventory": {
-                                        "type": "array",
-                                        "items": {
-                                            "type": "string"
-                                        },
-                                        "description": "Insert names of items from the inventory. Unused items or reusable items should show up in the new inventory. Do not create items that did not exist in the original inventory provided. Remove items from the original inventory that were consumed during the player's actions."
-                                    }
-                                },
-                                "required": ["physical_state", "mental_state", "inventory"],
-                                "additionalProperties": False
-                            },
-                            "text_output": {
-                                "type": "string",
-                                "description": "Update the player on the new scenario, including how other characters/objects within the scene respond to the player's actions. Maintain the context of the scenario."
-                            },
-                            "scenario_over": {
-                                "type": "boolean",
-                                "description": "Returns true if the specified exit mission has been satisfied, else return false."
-                            },
-                            "game_over":{
-                                "type": "boolean",
-                                "description": "Evaluate if the player has died during the scenario as a result of external factors or enemies. Return true if so, else return false."
-                            }
-                        },
-                        "required": ["new_player_state", "text_output", "scenario_over", "game_over"],
-                        "additionalProperties": False
-                    },
-                    "strict": True
-                }
-            }
-        )
-
-        # Dictionary with contents matching the specified schema.
-        # Note that the response content originally appears in string format.
-        results = json.loads(response.choices[0].message.content)
-
-        # self.narrate(f"[ DEBUG ] Generated Results: {results}")
-        return results
\ No newline at end of file
+from .schema import ACTION_EVAL_FORMAT, ACTION_EVAL_SCHEMA
+from .tracing import NULL_TRACER
+from collections import deque
+import time
+# import os
+
+# The evaluator backends, asyncio and the OpenAI client are imported on first use, not at module load.
+# Every game object imports this module, so static worlds and tools start without paying for them.
+
+class Interface:
+    """
+    The Interface class is responsible for handling front-end communications with the player.
+    It provides methods for other classes to communicate with the player and receive results.
+    This also serves as a front-end method for interacting with the OpenAI API when needed.
+    """
+    def __init__(self):
+        # Login is handled in a separate function, such that there is an option for exclusive non-AI usage.
+        self.backend = None # Evaluator backend used for action evaluations.
+        self.event_loop = None # Private event loop used by the synchronous wrappers.
+        self.cache = None # Optional response cache for action evaluations.
+        self.first_narration_latencies = deque(maxlen = 1024) # Recent seconds from sending a streamed evaluation to narrating its first text.
+        self.tracer = NULL_TRACER # Records spans and metrics of the session. Disabled unless a tracer is set.
+        self.blocking_input = True # Whether the synchronous prompts block, such as on terminal input. See Area.area_actions_async.
+        self.recorder = None # Optional SessionRecorder, logging the session so that it can be replayed.
+        self.output_schema = ACTION_EVAL_SCHEMA # Output format requested from the evaluation model, and its decoder.
+
+    # Used to access the OpenAI API.
+    # Calls are given deadlines, retries and hedging, and degrade to a cached or canned answer if the API keeps failing.
+    def openai_login(self):
+        from .backends import OpenAIBackend
+        from .resilience import ResilientBackend
+        import getpass # Used for secure input.
+        print('Enter OpenAI API key (Hidden Input):')
+        # os.environ["OPENAI_API_KEY"] = getpass.getpass()
+        self.set_backend(ResilientBackend(OpenAIBackend(api_key = getpass.getpass())))
+
+    # Sets the evaluator backend that action evaluations are delegated to.
+    # Any EvaluatorBackend can be used, such as an HTTPBackend pointed at a local stand-in server.
+    def set_backend(self, backend):
+        self.backend = backend
+
+    # Sets the response cache used by evaluate_actions. Use None to disable caching.
+    # Accepts a ResponseCache, or any object providing the same get/put methods.
+    def set_cache(self, cache):
+        self.cache = cache
+
+    # Sets the tracer that records the spans and metrics of this session. Use None to disable tracing.
+    def set_tracer(self, tracer):
+        self.tracer = tracer if tracer != None else NULL_TRACER
+
+    # Sets the output format of action evaluations, such as ACTION_DELTA_SCHEMA to cut the completion tokens of every turn.
+    def set_output_schema(self, schema):
+        self.output_schema = schema
+
+    # Records every prompt response, evaluation and the ending of this session with a SessionRecorder.
+    def set_recorder(self, recorder):
+        recorder.attach(self)
+        self.recorder = recorder
+
+    # Runs a coroutine to completion from synchronous code, and returns its result.
+    # The event loop is kept alive between calls so that the async client can reuse its connections.
+    # Must not be called from within a running event loop; await the coroutine directly instead.
+    def run_sync(self, coroutine):
+        import asyncio
+        if self.event_loop is None or self.event_loop.is_closed():
+            self.event_loop = asyncio.new_event_loop()
+        return self.event_loop.run_until_complete(coroutine)
+
+    # Schedules background work, such as speculatively warming the backend, and returns its task.
+    # Within a running event loop the work starts at once. From synchronous code it is queued on the private event loop,
+    # and runs during the next run_sync call, such as while the player types the first action of a scenario.
+    def schedule(self, coroutine):
+        import asyncio
+        try:
+            return asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            if self.event_loop is None or self.event_loop.is_closed():
+                self.event_loop = asyncio.new_event_loop()
+            return self.event_loop.create_task(coroutine)
+
+    # Releases the private event loop, cancelling any scheduled work that is still pending. The interface can still be used afterwards.
+    def close(self):
+        if self.event_loop != None:
+            import asyncio
+            pending = asyncio.all_tasks(self.event_loop)
+            for task in pending:
+                task.cancel()
+            if len(pending) > 0:
+                self.event_loop.run_until_complete(asyncio.gather(*pending, return_exceptions = True))
+            self.event_loop.close()
+            self.event_loop = None
+    
+    # Takes a list of ordered options, prints them, and returns the index of the option selected.
+    # Guarantees that a valid option is selected by re-prompting the user until a valid option is retrieved.
+    def get_multiple_choice_response(self, options):
+        # Checks if a valid number of options exist.
+        if len(options) > 0:
+            valid_option = False
+            option_count = 0
+            for option in options:
+                option_count += 1
+                print(str(option_count)+": "+str(option))
+            # Loops until a valid option has been retrieved.
+            while (valid_option == False):
+                try:
+                    response = input("Select an Option:\n> ")
+                    if response.lower() == "quit" or response.lower() == "q":
+                        self.end_game("quit")
+                    response = int(response)
+                    # Handles whether the option is out of bounds or not.
+                    if response < 1 or option_count < response:
+                        print("Invalid Option! Please enter a valid option number.")
+                        valid_option = False
+                    else:
+                        valid_option = True
+                except ValueError:
+                    # Handles if the option isn't an integer.
+                    print("Invalid Input! Please enter a valid option number.")
+                    valid_option = False
+
+            # Applies an offset of 1 to compensate for the offset in the option index display.
+            response -= 1
+            return response
+        else:
+            pass
+
+    # Prints the text and returns the response of the player.
+    def get_free_response(self, text):
+        print(text)
+        response = input("Player's Response:\n> ")
+        if response.lower() == "quit" or response.lower() == "q":
+            self.end_game("quit")
+        return response
+
+    # Prints the text exclusively.
+    def narrate(self, text):
+        print(text)
+        pass
+
+    # Prints part of a line, such as narration that is still being streamed. The next call to narrate ends the line.
+    def narrate_partial(self, text):
+        print(text, end = "", flush = True)
+
+    # Ends the game. The ending names how the game ended, such as "quit" or "game_over".
+    # The terminal interface exits the process; other interfaces may report the ending instead.
+    def end_game(self, ending = ""):
+        exit()
+
+    # Async variants of the player prompts, used by the async turn loop.
+    # Terminal input blocks, so it is moved off the event loop to keep other in-flight turns running.
+    async def get_multiple_choice_response_async(self, options):
+        import asyncio
+        return await asyncio.to_thread(self.get_multiple_choice_response, options)
+
+    async def get_free_response_async(self, text):
+        import asyncio
+        return await asyncio.to_thread(self.get_free_response, text)
+    
+    # Builds the request for an action evaluation, using the model of the current backend.
+    def build_evaluation_request(self, user_prompt = "", system_prompt = ""):
+        from .backends import EvaluationRequest
+        return EvaluationRequest(system_prompt, user_prompt, self.output_schema.response_format, self.backend.model)
+
+    # Modifies the world/character state in accordance with an AI interpretation of the player's actions.
+    # Given a user and system prompt in string format, returns a structured output in dictionary format.
+    # Awaiting this does not block the event loop, so many turns can be evaluated concurrently.
+    # Identical requests are answered from the response cache when one is set, unless use_cache is False.
+    async def evaluate_actions_async(self, user_prompt = "", system_prompt = "", use_cache = True):
+        request = self.build_evaluation_request(user_prompt, system_prompt)
+        key = None
+        if use_cache and self.cache != None:
+            key = request.key()
+            results = self.cache.get(key)
+            if results is not None:
+                self.tracer.count("cache_hits")
+                return results
+
+        # Dictionary with contents matching the specified schema.
+        with self.tracer.span("evaluate.request", model = request.model) as span:
+            results = await self.backend.evaluate(request)
+            span.set("usage", request.usage)
+        self.tracer.record("evaluate.decode", request.decode_time)
+        self.tracer.add_usage(request.usage)
+
+        # Degraded answers, such as canned responses while the backend is failing, would otherwise be replayed once it has recovered.
+        if key != None and not request.degraded:
+            self.cache.put(key, results)
+
+        # self.narrate(f"[ DEBUG ] Generated Results: {results}")
+        return results
+
+    # Streaming version of evaluate_actions_async. The text output is passed to on_text piece by piece as it is generated,
+    # while the other fields are only applied by the caller once the returned structured output is complete.
+    # The time until the first piece of text is recorded in first_narration_latencies.
+    async def evaluate_actions_stream_async(self, user_prompt = "", system_prompt = "", on_text = None, use_cache = True):
+        start = time.perf_counter()
+        request = self.build_evaluation_request(user_prompt, system_prompt)
+        key = None
+        if use_cache and self.cache != None:
+            key = request.key()
+            results = self.cache.get(key)
+            if results is not None:
+                self.tracer.count("cache_hits")
+                self.first_narration_latencies.append(time.perf_counter() - start)
+                if on_text != None:
+                    on_text(results["text_output"])
+                return results
+
+        from .streaming import StreamingParser
+        parser = StreamingParser("text_output")
+        narrated = False
+        decode_time = 0.0
+        with self.tracer.span("evaluate.request", model = request.model, streaming = True) as span:
+            async for chunk in self.backend.evaluate_stream(request):
+                decode_start = time.perf_counter()
+                text = parser.feed(chunk)
+                decode_time += time.perf_counter() - decode_start
+                if text != "":
+                    if not narrated:
+                        self.first_narration_latencies.append(time.perf_counter() - start)
+                        self.tracer.record("evaluate.first_text", time.perf_counter() - start)
+                        narrated = True
+                    if on_text != None:
+                        on_text(text)
+            span.set("usage", request.usage)
+        decode_start = time.perf_counter()
+        results = parser.result()
+        self.tracer.record("evaluate.decode", decode_time + time.perf_counter() - decode_start)
+        self.tracer.add_usage(request.usage)
+
+        if key != None and not request.degraded:
+            self.cache.put(key, results)
+        return results
+
+    # Synchronous wrapper of evaluate_actions_async.
+    def evaluate_actions(self, user_prompt = "", system_prompt = "", use_cache = True):
+        return self.run_sync(self.evaluate_actions_async(user_prompt, system_prompt, use_cache))
+
+# Interface shared by every game object that has not been given one by its world.
+# Game objects used to create their own interface each, which cost memory for every area, item and action.
+default_interface = None
+
+def get_default_interface():
+    global default_interface
+    if default_interface == None:
+        default_interface = Interface()
+    return default_interface
@@ -0,0 +1,88 @@
+import json
+
+class Inventory:
+    """
+    The Inventory class stores items as stacks, keyed by item name.
+    Duplicate items share a stack with a count, so lookups, additions and removals are O(1).
+    Iterating over the inventory yields one item per stack, in the order the stacks were created.
+    The serialized views used in prompts are cached until the inventory changes.
+    """
+    __slots__ = ("stacks", "version", "cached_names", "cached_json")
+
+    def __init__(self):
+        self.stacks = {} # Maps item names to [item, count] pairs.
+        self.version = 0 # Incremented on every change.
+        self.cached_names = None
+        self.cached_json = None
+
+    # Accepts an item or an item name.
+    def key(item):
+        return item if isinstance(item, str) else item.get_name()
+
+    def __len__(self):
+        return len(self.stacks)
+
+    def __iter__(self):
+        return iter([stack[0] for stack in self.stacks.values()])
+
+    def __contains__(self, item):
+        return Inventory.key(item) in self.stacks
+
+    def __repr__(self):
+        return repr(self.names())
+
+    # Returns the item stored under a name, or None if the inventory does not hold it.
+    def get(self, name):
+        stack = self.stacks.get(name)
+        return stack[0] if stack != None else None
+
+    # Returns how many of an item the inventory holds.
+    def count(self, item):
+        stack = self.stacks.get(Inventory.key(item))
+        return stack[1] if stack != None else 0
+
+    # Returns (item, count) pairs, one per stack.
+    def items(self):
+        return [(stack[0], stack[1]) for stack in self.stacks.values()]
+
+    def changed(self):
+        self.version += 1
+        self.cached_names = None
+        self.cached_json = None
+
+    def add(self, item, count = 1):
+        stack = self.stacks.get(item.get_name())
+        if stack == None:
+            self.stacks[item.get_name()] = [item, count]
+        else:
+            stack[1] += count
+        self.changed()
+
+    # Removes up to count of an item, given as an item or a name.
+    # Returns True if anything was removed, else returns False.
+    def remove(self, item, count = 1):
+        name = Inventory.key(item)
+        stack = self.stacks.get(name)
+        if stack == None:
+            return False
+        stack[1] -= count
+        if stack[1] <= 0:
+            del self.stacks[name]
+        self.changed()
+        return True
+
+    # Names of all items, repeated per item in a stack. Cached until the inventory changes.
+    def names(self):
+        if self.cached_names == None:
+            self.cached_names = []
+            for name, stack in self.stacks.items():
+                self.cached_names += [name] * stack[1]
+        return list(self.cached_names)
+
+    # Canonical compact JSON of the item names. Cached until the inventory changes.
+    def to_json(self):
+        if self.cached_json == None:
+            if self.cached_names == None:
+                self.names()
+            self.cached_json = json.dumps(self.cached_names, separators=(",", ":"))
+        return self.cached_json
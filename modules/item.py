@@ -1,56 +1,162 @@
-from .interface import Interface
-from .action import Action
-
-import string
-
-class Item:
-    def __init__(self, name: string, desc: string, details = ""):
-      self.custom_actions = []
-      self.name = name
-      self.desc = desc
-      self.details = details
-      self.interface = Interface()
-
-    def get_name(self):
-       return self.name
-    
-    # Use None to use the default preconditions function.
-    # Actions only apply to static scenarios or dynamic scenario aftermaths.
-    def add_item_action(self, action_name = "Mysterious Action", precond_func = Action.default_precond_func, action_func = Action.default_action_func):
-        if precond_func == None:
-            self.custom_actions.append(Action(action_name, Action.default_precond_func, action_func))
-        else:
-            self.custom_actions.append(Action(action_name, precond_func, action_func))
-
-    # action_name is the search term for removing these actions.
-    # Returns true upon a successful removal, else returns false.
-    def remove_item_action(self, action_name = ""):
-        if action_name == "":
-            return False
-        for action in self.custom_actions:
-            if action.get_name() == action_name:
-                self.custom_actions.remove(action)
-                return True
-        return False       
-
-    # Helper method for the item's actions.
-    def inspect(self):
-        if self.details != "":
-            self.interface.narrate(f"\n[ Inspect ] {self.details}")
-        else:
-            self.interface.narrate("\n[ Inspect ] There isn't anything notable to inspect.")
-
-    # Used to trigger an interface to interact with the item.
-    def item_actions(self):
-      self.interface.narrate(f"\n{self.name} - {self.desc}")
-      options_list = ["Cancel", "Inspect Item"]
-      for action in self.custom_actions:
-        options_list.append(action.get_name())
-      option = self.interface.get_multiple_choice_response(options_list)
-      if option == 0:
-        return
-      elif option == 1:
-        self.inspect()
-      else:
-        # Calls a custom action.
-        self.custom_actions[option - 2].run_action()
+from .interface import Interface, get_default_interface
+from .action import Action
+from .state import ActionMenu
+
+import string
+
+class ItemDefinition:
+    """
+    The shared part of an item: its name, descriptions and actions.
+    Every instance of the same definition refers to it, so identical items only store these once.
+    """
+    __slots__ = ("name", "desc", "details", "custom_actions", "action_menu")
+
+    def __init__(self, name: string, desc: string, details = ""):
+      self.custom_actions = []
+      self.action_menu = None # Cached menu of the custom actions, created on first use.
+      self.name = name
+      self.desc = desc
+      self.details = details
+
+    # Use None to use the default preconditions function.
+    # Actions only apply to static scenarios or dynamic scenario aftermaths.
+    def add_item_action(self, action_name = "Mysterious Action", precond_func = Action.default_precond_func, action_func = Action.default_action_func):
+        if precond_func == None:
+            self.custom_actions.append(Action(action_name, Action.default_precond_func, action_func))
+        else:
+            self.custom_actions.append(Action(action_name, precond_func, action_func))
+        if self.action_menu != None:
+            self.action_menu.reset()
+
+    # action_name is the search term for removing these actions.
+    # Returns true upon a successful removal, else returns false.
+    def remove_item_action(self, action_name = ""):
+        if action_name == "":
+            return False
+        for action in self.custom_actions:
+            if action.get_name() == action_name:
+                self.custom_actions.remove(action)
+                if self.action_menu != None:
+                    self.action_menu.reset()
+                return True
+        return False
+
+class Item:
+    """
+    An instance of an item. Only the definition and the interface are stored per instance.
+    Items constructed with a name and descriptions get their own definition.
+    Use an ItemCatalog to create many instances of a shared definition.
+    Actions belong to the definition, so adding an action to one instance adds it to all instances of that definition.
+    """
+    __slots__ = ("definition", "interface")
+
+    def __init__(self, name: string = "", desc: string = "", details = "", definition: ItemDefinition = None):
+      self.definition = definition if definition != None else ItemDefinition(name, desc, details)
+      self.interface = get_default_interface()
+
+    @property
+    def name(self):
+       return self.definition.name
+
+    @property
+    def desc(self):
+       return self.definition.desc
+
+    @property
+    def details(self):
+       return self.definition.details
+
+    @property
+    def custom_actions(self):
+       return self.definition.custom_actions
+
+    def get_name(self):
+       return self.definition.name
+
+    # Overrides the instance of the interface with the provided one.
+    def set_interface(self, interface: Interface):
+       self.interface = interface
+
+    # Use None to use the default preconditions function.
+    # Actions only apply to static scenarios or dynamic scenario aftermaths.
+    def add_item_action(self, action_name = "Mysterious Action", precond_func = Action.default_precond_func, action_func = Action.default_action_func):
+        self.definition.add_item_action(action_name, precond_func, action_func)
+
+    # action_name is the search term for removing these actions.
+    # Returns true upon a successful removal, else returns false.
+    def remove_item_action(self, action_name = ""):
+        return self.definition.remove_item_action(action_name)
+
+    # Helper method for the item's actions.
+    def inspect(self):
+        if self.details != "":
+            self.interface.narrate(f"\n[ Inspect ] {self.details}")
+        else:
+            self.interface.narrate("\n[ Inspect ] There isn't anything notable to inspect.")
+
+    # Returns the custom actions offered in the item's menu, and the options of the menu. See ActionMenu.
+    def menu_options(self):
+      definition = self.definition
+      if definition.action_menu == None:
+        definition.action_menu = ActionMenu(["Cancel", "Inspect Item"])
+      return definition.action_menu.build(definition.custom_actions)
+
+    # Used to trigger an interface to interact with the item.
+    # Actions whose precondition is a StatePrecondition are only offered while it holds.
+    def item_actions(self):
+      self.interface.narrate(f"\n{self.name} - {self.desc}")
+      actions, options_list = self.menu_options()
+      option = self.interface.get_multiple_choice_response(options_list)
+      if option == 0:
+        return
+      elif option == 1:
+        self.inspect()
+      else:
+        # Calls a custom action.
+        action = actions[option - 2]
+        with self.interface.tracer.span("item_action", action = action.get_name(), item = self.name):
+          action.run_action()
+
+    # Async version of item_actions, for interfaces whose prompts do not block.
+    async def item_actions_async(self):
+      self.interface.narrate(f"\n{self.name} - {self.desc}")
+      actions, options_list = self.menu_options()
+      option = await self.interface.get_multiple_choice_response_async(options_list)
+      if option == 0:
+        return
+      elif option == 1:
+        self.inspect()
+      else:
+        action = actions[option - 2]
+        with self.interface.tracer.span("item_action", action = action.get_name(), item = self.name):
+          action.run_action()
+
+class ItemCatalog:
+    """
+    The ItemCatalog class stores the item definitions of a world, keyed by item name.
+    Items created from the catalog are lightweight instances sharing the catalog's definitions.
+    """
+    def __init__(self):
+        self.definitions = {}
+
+    def __contains__(self, name):
+        return name in self.definitions
+
+    def __len__(self):
+        return len(self.definitions)
+
+    # Defines a new item, and returns an instance of it. Redefining a name replaces the previous definition.
+    def define(self, name: string, desc: string, details = ""):
+        self.definitions[name] = ItemDefinition(name, desc, details)
+        return Item(definition = self.definitions[name])
+
+    # Returns the definition stored under a name, or None if it is not defined.
+    def get_definition(self, name):
+        return self.definitions.get(name)
+
+    # Returns a new instance of a defined item, or None if it is not defined.
+    def create(self, name):
+        definition = self.definitions.get(name)
+        if definition == None:
+            return None
+        return Item(definition = definition)
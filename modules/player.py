@@ -1,20 +1,49 @@
-from .character import Character
-from .interface import Interface
-
-class Player(Character):
-    def __init__(self, name, physical_state = "healthy", mental_state = "happy"):
-        super().__init__(name, physical_state, mental_state)
-        self.interface = Interface()
-    
-    def inventory_actions(self):
-        if len(self.inventory) > 0:
-            options_list = ["Exit Inventory"]
-            for item in self.inventory:
-                options_list.append(item.get_name())
-            option = self.interface.get_multiple_choice_response(options_list)
-            # Checks that the "exit" action wasn't triggered.
-            if option != 0:
-                # Triggers actions for that specific item.
-                self.inventory[option - 1].item_actions()
-        else:
-            self.interface.narrate("Your inventory is empty.")
+from .character import Character
+from .interface import Interface, get_default_interface
+
+class Player(Character):
+    __slots__ = ("interface",)
+
+    def __init__(self, name, physical_state = "healthy", mental_state = "happy"):
+        super().__init__(name, physical_state, mental_state)
+        self.interface = get_default_interface()
+
+    # Overrides the instance of the interface, including the interface of every held item.
+    def set_interface(self, interface: Interface):
+        self.interface = interface
+        for item in self.inventory:
+            item.set_interface(interface)
+
+    # Items picked up by the player use the player's interface.
+    def add_item(self, item):
+        item.set_interface(self.interface)
+        super().add_item(item)
+    
+    def inventory_actions(self):
+        if len(self.inventory) > 0:
+            options_list = ["Exit Inventory"]
+            items = []
+            for item, count in self.inventory.items():
+                items.append(item)
+                options_list.append(item.get_name() if count == 1 else f"{item.get_name()} (x{count})")
+            option = self.interface.get_multiple_choice_response(options_list)
+            # Checks that the "exit" action wasn't triggered.
+            if option != 0:
+                # Triggers actions for that specific item.
+                items[option - 1].item_actions()
+        else:
+            self.interface.narrate("Your inventory is empty.")
+
+    # Async version of inventory_actions, for interfaces whose prompts do not block.
+    async def inventory_actions_async(self):
+        if len(self.inventory) > 0:
+            options_list = ["Exit Inventory"]
+            items = []
+            for item, count in self.inventory.items():
+                items.append(item)
+                options_list.append(item.get_name() if count == 1 else f"{item.get_name()} (x{count})")
+            option = await self.interface.get_multiple_choice_response_async(options_list)
+            if option != 0:
+                await items[option - 1].item_actions_async()
+        else:
+            self.interface.narrate("Your inventory is empty.")
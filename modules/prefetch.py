@@ -0,0 +1,62 @@
+class Prefetcher:
+    """
+    The Prefetcher class speculatively prepares the dynamic areas next to the player, while the player is still in static menus.
+    The prompts of those areas are compiled, and the evaluator backend is asked to open its connection ahead of the first turn.
+    Work for areas that the player moves away from is cancelled, and counted as wasted.
+    Stats count the areas prefetched, the ones the player then entered (hits), and the ones wasted.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.enabled = True
+        self.area = None # Area that the current speculative work was started from.
+        self.pending = {} # Prefetched areas that have not been entered yet, mapped to their warming tasks, or None.
+        self.stats = {"started": 0, "hits": 0, "wasted": 0, "cancelled": 0, "failed": 0}
+
+    # Updates the speculative work after the player has moved to an area. Does nothing if the area has not changed.
+    def update(self, area):
+        if not self.enabled or area is self.area:
+            return
+        self.area = area
+        if area in self.pending:
+            self.pending.pop(area)
+            self.stats["hits"] += 1
+            self.world.interface.tracer.count("prefetch_hits")
+        adjacent = area.adjacent_dynamic_areas() if area != False else []
+        for target in list(self.pending):
+            if target not in adjacent:
+                self.discard(target)
+        for target in adjacent:
+            if target not in self.pending:
+                self.prefetch(target)
+
+    def prefetch(self, area):
+        area.get_compiled_prompt()
+        task = None
+        if self.world.interface.backend != None:
+            task = self.world.interface.schedule(self.warm(area))
+        self.pending[area] = task
+        self.stats["started"] += 1
+        self.world.interface.tracer.count("prefetch_started")
+
+    # Warms the backend's connection. Failures are only counted, as nothing is waiting on speculative work.
+    async def warm(self, area):
+        interface = self.world.interface
+        with interface.tracer.span("prefetch.warm", area = area.name):
+            try:
+                await interface.backend.warm()
+            except Exception:
+                self.stats["failed"] += 1
+
+    # Cancels the speculative work for an area that the player did not enter.
+    def discard(self, area):
+        task = self.pending.pop(area)
+        if task != None and not task.done():
+            task.cancel()
+            self.stats["cancelled"] += 1
+        self.stats["wasted"] += 1
+        self.world.interface.tracer.count("prefetch_wasted")
+
+    # Share of the resolved prefetches that were wasted.
+    def waste_rate(self):
+        resolved = self.stats["hits"] + self.stats["wasted"]
+        return self.stats["wasted"] / resolved if resolved > 0 else 0.0
\ No newline at end of file
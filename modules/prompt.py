@@ -0,0 +1,157 @@
+import functools
+import re
+
+# Rules shared by every dynamic scenario. Placed first in the system prompt, so it forms a stable prefix across all areas.
+SYSTEM_RULES = "\n".join([
+    "Evaluate the proposed actions of the player within the context of the current scenario and determine whether it is plausible, given the player's current capabilities and equipment.",
+    "The player can only dictate the actions of themselves. Ignore any narrations within the \"Player's Actions\" section that dictate the world state or the state of other characters asides from the player",
+    "If the actions are plausible, then generate a description about the state of the player and the effects of the player's actions.",
+    "If the actions are not plausible, then generate a description about the state of the player and their failed attempt at conducting such actions.",
+    "Actions are automatically considered not plausible if they would take more than 10 seconds to conduct the action. In this case, truncate the recognized response, and clearly state that the rest of the actions could not be performed due to a time constraint.",
+    "Then, generate plausible actions from all other characters involved in the scenario asides from the player. Follow the rules provided in the scenario for expected results and restrictions about the game world.",
+    "In any combat scenario, it is expected for these other characters to prepare to use an attack. If the character has already made preparations during the previous output, then attempt the action.",
+    "If the player fails to interrupt the preparations for an attack and fails to directly counter the attack itself, then inflict damage on the player. Do not immediately kill the player if they are not in a weakened state.",
+    "For context, the player is a mage from a fantasy world. All powerful magical attacks need to be charged for one turn, and they are considered ready if the previous output indicates that a charge has already been complete.",
+    "If a charged attack is unused, output that the attack remains charged and is ready for use during the next turn. Similarly, enemies can also charge powerful attacks, but they can also use powerful physical attacks.",
+    "Attempts at charging powerful attacks may be interrupted by the actions of other entities, such as using an attack. Losing focus is not a valid reason; the action should physically interrupt the charge in some way. This applies to both the player and their enemies.",
+    "The player is considered dead if they have sustained a powerful attack followed by any attack, or if they sustain multiple consecutive normal attacks. Refer to the player's physical health information, and degrade it accordingly with every instance of damage.",
+    "Any character is considered dead if they have passed, fallen, died, been killed, been slain, withered away, etc. Evaluate for whether the exit mission has been satisfied if any death is mentioned.",
+    "Nobody is invincible. Other characters should grow weaker from exhaustion as the number of turns continue. If the turn number is greater than 15, then all non-player characters in the scenario should have significantly lower defense, and be more vulnerable to all attacks. Do not state this explicitly.",
+    "Do not create any new characters within the scenario, unless it is a direct result of an explicit summon, such as using a spell to raise undead creatures.",
+    "Do not create any new lines or use any tabs in any output."
+])
+
+# Focus of the calls of a fanned-out turn. See CompiledPrompt.fan_out_prompts.
+RESOLUTION_FOCUS = "Only resolve the player's actions and their direct effects. The reactions of other characters are evaluated separately, so do not narrate them."
+REACTION_FOCUS = ("Only narrate how {name} reacts to the player's actions during this turn, in at most two sentences. {name}: {description} "
+                  "The player's actions are resolved separately, so do not narrate them, and leave the player's state and inventory unchanged. "
+                  "Only set game_over if this reaction kills the player.")
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Local estimate of the number of model tokens in a text, without loading a tokenizer.
+# Words count as one token per 6 characters, and every punctuation mark counts as one token.
+def estimate_tokens(text):
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        tokens += 1 + (len(piece) - 1) // 6
+    return tokens
+
+# Token estimate of a text that is counted repeatedly, such as a system prompt shared by every build of a world.
+@functools.lru_cache(maxsize = 256)
+def estimate_tokens_cached(text):
+    return estimate_tokens(text)
+
+TRUNCATION_MARKER = " [...]"
+
+# Returns the text cut down to at most max_tokens estimated tokens, keeping its beginning.
+# The cut falls on a token boundary and is marked, so that the same text and limit always give the same result.
+def truncate_tokens(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens - estimate_tokens(TRUNCATION_MARKER)
+    tokens = 0
+    end = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        tokens += 1 + (len(piece) - 1) // 6
+        if tokens > limit:
+            break
+        end = match.end()
+    return text[:end] + TRUNCATION_MARKER if end > 0 else TRUNCATION_MARKER.strip()
+
+# Returns the byte and token size of a text.
+def measure(text):
+    return {"bytes": len(text.encode("utf-8")), "tokens": estimate_tokens(text)}
+
+# Joins titled sections into a prompt.
+def render_sections(sections):
+    return "\n\n".join(f"{title}:\n{text}" for title, text in sections)
+
+class CompiledPrompt:
+    """
+    The CompiledPrompt class holds the prompts of a dynamic area.
+    The system prompt is the static prefix: the shared rules, then the exit mission and hidden details of the area.
+    It is built once, so that identical bytes are sent every turn and provider-side prefix caching can hit.
+    The user prompt only holds the per-turn variable part, and is rendered every turn.
+
+    With a token budget, the system and user prompts together are kept within token_budget estimated tokens.
+    The details are truncated once when compiled, so that the system prompt takes at most half of the budget and stays identical every turn.
+    Each turn, the history is shortened first: verbatim turns are summarized, then the summary is left out.
+    If the prompt is still over budget, the scenario text is truncated.
+    The shared rules, the action, and the player's state are never shortened, so a budget below their size cannot be met.
+    """
+    def __init__(self, exit_mission = "", details = "", token_budget = None):
+        self.exit_mission = exit_mission
+        self.details = details
+        self.token_budget = token_budget
+        self.system_sections = [("Rules", SYSTEM_RULES)]
+        self.system_sections.append(("Exit Mission", f"\"{exit_mission}\". Consider the scenario to be over when the exit mission has been satisfied, and scenario_over should be updated accordingly."))
+        if details != "":
+            self.system_sections.append(("Scenario Rules", details))
+            if token_budget != None:
+                excess = estimate_tokens_cached(render_sections(self.system_sections)) - token_budget // 2
+                if excess > 0:
+                    self.system_sections[-1] = ("Scenario Rules", truncate_tokens(details, max(estimate_tokens(details) - excess, 0)))
+        self.system_prompt = render_sections(self.system_sections)
+        self.system_tokens = estimate_tokens_cached(self.system_prompt)
+        self.user_sections = [] # Sections of the last rendered user prompt, kept for size reports.
+        self.prompt_tokens = None # Estimated tokens of the last rendered prompt, as system, user and total counts.
+
+    # Returns whether the prompt was compiled from the given area properties.
+    def matches(self, exit_mission, details, token_budget = None):
+        return self.exit_mission == exit_mission and self.details == details and self.token_budget == token_budget
+
+    # Renders the per-turn user prompt.
+    # Player state and inventory use the canonical compact serialization, so equal states produce equal prompts.
+    # The previous output is either the text of the previous turn, or a TurnHistory of the scenario.
+    def user_prompt(self, scenario, action, player, previous_output, turn):
+        history = None if isinstance(previous_output, str) else previous_output
+        verbatim = history.recent_turns if history != None else 0
+        include_summary = True
+        while True:
+            self.user_sections = [
+                ("Scenario", scenario),
+                ("Player's Actions", action),
+                ("Player's Inventory", player.inventory_json()),
+                ("Player's State", player.player_state_json(include_inventory = False)),
+                ("Previous Turns", history.render(verbatim, include_summary)) if history != None else ("Previous Output", previous_output),
+                ("Turn Number", str(turn))
+            ]
+            prompt = render_sections(self.user_sections)
+            user_tokens = estimate_tokens(prompt)
+            if self.token_budget == None or self.system_tokens + user_tokens <= self.token_budget:
+                break
+            if history != None and verbatim > 0:
+                verbatim -= 1
+            elif history != None and include_summary:
+                include_summary = False
+            else:
+                # Only the scenario is left to shorten.
+                excess = self.system_tokens + user_tokens - self.token_budget
+                limit = max(estimate_tokens(scenario) - excess, 0)
+                if scenario == truncate_tokens(scenario, limit):
+                    break
+                scenario = truncate_tokens(scenario, limit)
+        self.prompt_tokens = {"system": self.system_tokens, "user": user_tokens, "total": self.system_tokens + user_tokens}
+        return prompt
+
+    # Renders the user prompts of a turn split into concurrent calls: first the call resolving the player's actions,
+    # then one call per entity for its reaction, given entities mapping names to descriptions.
+    # Every prompt is the regular user prompt followed by a focus section, so they share their prefix.
+    # The short focus sections are added after the prompt has been fitted to the token budget.
+    def fan_out_prompts(self, scenario, action, player, previous_output, turn, entities):
+        prompt = self.user_prompt(scenario, action, player, previous_output, turn)
+        focuses = [RESOLUTION_FOCUS] + [REACTION_FOCUS.format(name = name, description = description) for name, description in entities.items()]
+        return [prompt + "\n\n" + render_sections([("Focus", focus)]) for focus in focuses]
+
+    # Returns the byte and token size of each section, along with totals of the system and user prompts.
+    def section_sizes(self):
+        sizes = {}
+        for title, text in self.system_sections:
+            sizes["system." + title] = measure(text)
+        for title, text in self.user_sections:
+            sizes["user." + title] = measure(text)
+        sizes["system"] = measure(self.system_prompt)
+        sizes["user"] = measure(render_sections(self.user_sections))
+        return sizes
@@ -0,0 +1,247 @@
+from .headless import SessionEnded
+from .interface import Interface
+from .simulation import load_factory
+from .snapshot import encode
+import argparse
+import json
+import time
+
+class SessionRecorder:
+    """
+    The SessionRecorder class logs everything a session received from outside the engine, so that it can be replayed.
+    Menu selections, free responses, evaluation prompts with their results, and the ending are appended to a file of JSON lines.
+    Every line is an array led by its kind: ["c", option], ["f", text], ["p", system_prompt], ["e", system_id, user_prompt, results], or ["x", ending].
+    System prompts are written once, and evaluations refer to them by the order they were written in.
+    Attach it with Interface.set_recorder. It works with any interface, as it wraps the prompt and evaluation methods of the instance.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding = "utf-8")
+        self.system_prompts = {} # Ids of the system prompts written so far.
+        self.prompting = False # Whether an async prompt is under way, so that the sync prompt it delegates to is not recorded twice.
+
+    def write(self, entry):
+        self.file.write(encode(entry) + "\n")
+        self.file.flush()
+
+    def record_evaluation(self, user_prompt, system_prompt, results):
+        system_id = self.system_prompts.get(system_prompt)
+        if system_id == None:
+            system_id = len(self.system_prompts)
+            self.system_prompts[system_prompt] = system_id
+            self.write(["p", system_prompt])
+        self.write(["e", system_id, user_prompt, results])
+
+    # Wraps the prompt, evaluation and ending methods of an interface, so that their results are recorded.
+    def attach(self, interface: Interface):
+        recorder = self
+        get_multiple_choice_response = interface.get_multiple_choice_response
+        get_free_response = interface.get_free_response
+        get_multiple_choice_response_async = interface.get_multiple_choice_response_async
+        get_free_response_async = interface.get_free_response_async
+        evaluate_actions_async = interface.evaluate_actions_async
+        evaluate_actions_stream_async = interface.evaluate_actions_stream_async
+        end_game = interface.end_game
+
+        def record_choice(options):
+            option = get_multiple_choice_response(options)
+            if not recorder.prompting:
+                recorder.write(["c", option])
+            return option
+
+        def record_free(text):
+            response = get_free_response(text)
+            if not recorder.prompting:
+                recorder.write(["f", response])
+            return response
+
+        async def record_choice_async(options):
+            recorder.prompting = True
+            try:
+                option = await get_multiple_choice_response_async(options)
+            finally:
+                recorder.prompting = False
+            recorder.write(["c", option])
+            return option
+
+        async def record_free_async(text):
+            recorder.prompting = True
+            try:
+                response = await get_free_response_async(text)
+            finally:
+                recorder.prompting = False
+            recorder.write(["f", response])
+            return response
+
+        async def record_evaluation_async(user_prompt = "", system_prompt = "", use_cache = True):
+            results = await evaluate_actions_async(user_prompt, system_prompt, use_cache)
+            recorder.record_evaluation(user_prompt, system_prompt, results)
+            return results
+
+        async def record_stream_async(user_prompt = "", system_prompt = "", on_text = None, use_cache = True):
+            results = await evaluate_actions_stream_async(user_prompt, system_prompt, on_text, use_cache)
+            recorder.record_evaluation(user_prompt, system_prompt, results)
+            return results
+
+        def record_end(ending = ""):
+            recorder.write(["x", ending])
+            return end_game(ending)
+
+        interface.get_multiple_choice_response = record_choice
+        interface.get_free_response = record_free
+        interface.get_multiple_choice_response_async = record_choice_async
+        interface.get_free_response_async = record_free_async
+        interface.evaluate_actions_async = record_evaluation_async
+        interface.evaluate_actions_stream_async = record_stream_async
+        interface.end_game = record_end
+
+    def close(self):
+        self.file.close()
+
+# Reads the entries of a recorded session.
+def load_recording(path):
+    with open(path, encoding = "utf-8") as file:
+        return [json.loads(line) for line in file if line.strip() != ""]
+
+class ReplayDivergence(Exception):
+    """
+    Raised when a replayed session asks for something other than what was recorded at the same point,
+    such as a different evaluation prompt after a world change.
+    """
+    def __init__(self, position, expected, actual):
+        super().__init__(f"Replay diverged at entry {position}: expected {expected}, got {actual}")
+        self.position = position
+        self.expected = expected
+        self.actual = actual
+
+class ReplayInterface(Interface):
+    """
+    The ReplayInterface class plays back a recorded session, without a terminal or network.
+    Prompts are answered and evaluations are returned from the recording, in order, and narration is discarded.
+    Every evaluation prompt is compared with the recorded one, and a ReplayDivergence is raised at the first difference.
+    Concurrent evaluations, such as the calls of a fanned-out turn, are recorded in the order they completed, so they are matched in any order.
+    The session ends where the recording ended, with the recorded ending, or with "replay_complete" if the recording runs out first.
+    """
+    def __init__(self, entries):
+        super().__init__()
+        self.entries = list(entries) # Copied, as concurrent evaluations are reordered as they are matched.
+        self.position = 0
+        self.system_prompts = [] # Recorded system prompts, by id.
+        self.ending = None
+        self.evaluations = 0
+        self.blocking_input = False
+
+    # Reads the system prompts recorded before the next entry.
+    def read_system_prompts(self):
+        while self.position < len(self.entries) and self.entries[self.position][0] == "p":
+            self.system_prompts.append(self.entries[self.position][1])
+            self.position += 1
+
+    # Returns the next recorded entry, which must be of the given kind.
+    def next_entry(self, kind, actual):
+        self.read_system_prompts()
+        if self.position >= len(self.entries):
+            self.finish("replay_complete")
+        entry = self.entries[self.position]
+        # The recorded session ended during this prompt, such as by the player quitting.
+        if entry[0] == "x":
+            self.position += 1
+            self.finish(entry[1])
+        if entry[0] != kind:
+            raise ReplayDivergence(self.position, entry[0], actual)
+        self.position += 1
+        return entry
+
+    def finish(self, ending):
+        self.ending = ending
+        raise SessionEnded(ending)
+
+    # Ends the game as the engine decided, which must match the recorded ending.
+    def end_game(self, ending = ""):
+        if self.position < len(self.entries):
+            entry = self.entries[self.position]
+            if entry != ["x", ending]:
+                raise ReplayDivergence(self.position, entry, ["x", ending])
+            self.position += 1
+        self.finish(ending)
+
+    def get_multiple_choice_response(self, options):
+        return self.next_entry("c", options)[1]
+
+    def get_free_response(self, text):
+        return self.next_entry("f", text)[1]
+
+    def narrate(self, text):
+        pass
+
+    def narrate_partial(self, text):
+        pass
+
+    async def get_multiple_choice_response_async(self, options):
+        return self.get_multiple_choice_response(options)
+
+    async def get_free_response_async(self, text):
+        return self.get_free_response(text)
+
+    # Moves the recorded evaluation of a prompt to the next position, if it is among the evaluations recorded consecutively from there.
+    def match_evaluation(self, user_prompt):
+        self.read_system_prompts()
+        position = self.position
+        while position < len(self.entries) and self.entries[position][0] == "e":
+            if self.entries[position][2] == user_prompt:
+                self.entries[self.position], self.entries[position] = self.entries[position], self.entries[self.position]
+                return
+            position += 1
+
+    async def evaluate_actions_async(self, user_prompt = "", system_prompt = "", use_cache = True):
+        self.match_evaluation(user_prompt)
+        entry = self.next_entry("e", user_prompt)
+        self.evaluations += 1
+        if self.system_prompts[entry[1]] != system_prompt:
+            raise ReplayDivergence(self.position - 1, self.system_prompts[entry[1]], system_prompt)
+        if entry[2] != user_prompt:
+            raise ReplayDivergence(self.position - 1, entry[2], user_prompt)
+        return entry[3]
+
+    async def evaluate_actions_stream_async(self, user_prompt = "", system_prompt = "", on_text = None, use_cache = True):
+        results = await self.evaluate_actions_async(user_prompt, system_prompt, use_cache)
+        if on_text != None:
+            on_text(results["text_output"])
+        return results
+
+# Replays a recorded session on a new world from world_factory(interface), as fast as the engine allows.
+# Returns the ending, the number of acts, and the seconds taken. Raises ReplayDivergence if the world no longer plays the same,
+# including if it ends differently.
+def replay(world_factory, entries, max_acts = 100000):
+    interface = ReplayInterface(entries)
+    start = time.perf_counter()
+    acts = 0
+    try:
+        world = world_factory(interface)
+        world.start()
+        for acts in range(1, max_acts + 1):
+            world.act()
+    except SessionEnded:
+        pass
+    finally:
+        interface.close()
+    seconds = time.perf_counter() - start
+    return interface.ending, acts, seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replay a recorded session against a world, and report engine speed.")
+    parser.add_argument("world", help = "World factory, as module:function. For example, demo_world:build_world")
+    parser.add_argument("recording", help = "Recording written by a SessionRecorder.")
+    parser.add_argument("-n", "--repeat", type = int, default = 1, help = "Replays to run, to measure engine overhead.")
+    args = parser.parse_args()
+
+    world_factory = load_factory(args.world)
+    entries = load_recording(args.recording)
+    total_acts = 0
+    total_seconds = 0.0
+    for _ in range(args.repeat):
+        ending, acts, seconds = replay(world_factory, entries)
+        total_acts += acts
+        total_seconds += seconds
+    print(f"Replayed {args.repeat} times with no divergence, ending {ending!r}, {len(entries)} entries")
+    print(f"{total_acts / total_seconds:.1f} acts/sec, {total_seconds / args.repeat * 1000:.2f} ms per replay")
\ No newline at end of file
@@ -0,0 +1,316 @@
+from .backends import BackendError, EvaluationRequest, EvaluatorBackend, parse_sections
+from .schema import OutputError, compact_output
+from collections import deque
+import asyncio
+import json
+import random
+import time
+
+# Statuses worth retrying: connection failures, timeouts, rate limits and server errors.
+RETRYABLE_STATUSES = (0, 408, 429, 500, 502, 503, 504)
+
+class DeadlineExceeded(BackendError):
+    """
+    Raised when an evaluation, including all of its retries and hedges, does not finish before its deadline.
+    """
+    def __init__(self, message):
+        super().__init__(message, 0)
+
+# Returns whether a failed attempt may be retried.
+def retryable(error):
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, BackendError):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError))
+
+# Answer used when no evaluation can be obtained: nothing happens, and the player keeps their state and inventory.
+def canned_response(request: EvaluationRequest):
+    sections = parse_sections(request.user_prompt)
+    try:
+        inventory = json.loads(sections.get("Player's Inventory", "[]"))
+        state = json.loads(sections.get("Player's State", "{}"))
+    except ValueError:
+        inventory, state = [], {}
+    results = {
+        "text_output": "The moment stretches, as if the world itself hesitates. Nothing seems to change.",
+        "new_player_state": {
+            "physical_state": state.get("physical_state", "healthy"),
+            "mental_state": state.get("mental_state", "calm"),
+            "inventory": inventory
+        },
+        "scenario_over": False,
+        "game_over": False
+    }
+    if request.response_format["json_schema"]["name"] == "action_delta":
+        return compact_output(results, inventory, state)
+    return results
+
+class LatencyTracker:
+    """
+    Recent latencies of successful attempts, used to pick the hedging delay.
+    """
+    def __init__(self, window = 200):
+        self.samples = deque(maxlen = window)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    # Returns the latency below which the given percentage of recent attempts finished.
+    def percentile(self, percent):
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+class RetryBudget:
+    """
+    Limits retries and hedges to a share of the requests, so that they cannot multiply the load on a struggling backend.
+    Every request deposits ratio tokens, up to max_tokens, and every retry or hedge spends one token.
+    """
+    def __init__(self, ratio = 0.2, max_tokens = 10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    # Spends a token. Returns False if the budget is exhausted.
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend. After failure_threshold consecutive failures the circuit opens, and calls are refused
+    for reset_timeout seconds. Then a single probe call is let through: success closes the circuit, failure opens it again.
+    """
+    def __init__(self, failure_threshold = 5, reset_timeout = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.opened = 0 # Number of times the circuit has opened.
+
+    def state(self):
+        if self.opened_at == None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    # Returns whether a call may be made.
+    def allow(self):
+        state = self.state()
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            if self.opened_at == None or self.probing:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+class ResilientBackend(EvaluatorBackend):
+    """
+    Wraps another backend with tail-latency controls.
+    - Every evaluation has a deadline, and every attempt an optional timeout.
+    - Failed attempts are retried with exponential backoff and full jitter, within a retry budget.
+    - Once enough latencies are known, an attempt that takes longer than hedge_percentile of recent attempts
+      is hedged with a second identical request, and whichever answers first is used.
+    - A circuit breaker stops calling a failing backend. While it is open, or when an evaluation fails for good,
+      the answer is degraded to a cached response, or else to the canned response given by fallback.
+    Set fallback to None to raise instead of degrading. The stats count retries, hedges, degraded answers and deadline misses.
+    """
+    def __init__(self, backend: EvaluatorBackend, deadline = 30.0, attempt_timeout = None, max_retries = 2, base_delay = 0.1, max_delay = 2.0,
+                 hedge_percentile = 95, hedge_min_samples = 20, budget = None, breaker = None, cache = None, fallback = canned_response, seed = None):
+        super().__init__(backend.model)
+        self.backend = backend
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile # None disables hedging.
+        self.hedge_min_samples = hedge_min_samples
+        self.budget = budget if budget != None else RetryBudget()
+        self.breaker = breaker if breaker != None else CircuitBreaker()
+        self.cache = cache # Optional ResponseCache used for degraded answers.
+        self.fallback = fallback
+        self.latencies = LatencyTracker()
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "degraded": 0, "failures": 0}
+
+    # Returns the cached or canned answer to a request, or raises the error if there is none.
+    # The request is marked as degraded, so that the answer is not cached as if it were an evaluation.
+    def degrade(self, request: EvaluationRequest, error):
+        results = self.cache.get(request.key()) if self.cache != None else None
+        if results is None and self.fallback != None:
+            results = self.fallback(request)
+        if results is None:
+            raise error
+        self.stats["degraded"] += 1
+        request.degraded = True
+        return results
+
+    # Delay before a retry: exponential backoff with full jitter.
+    def backoff(self, retry):
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    # Copies a request, so that concurrent attempts do not overwrite each other's usage and latency.
+    def copy_request(self, request: EvaluationRequest):
+        return EvaluationRequest(request.system_prompt, request.user_prompt, request.response_format, request.model)
+
+    async def attempt(self, request: EvaluationRequest):
+        start = time.perf_counter()
+        if self.attempt_timeout != None:
+            results = await asyncio.wait_for(self.backend.evaluate(request), self.attempt_timeout)
+        else:
+            results = await self.backend.evaluate(request)
+        self.latencies.add(time.perf_counter() - start)
+        return results
+
+    # Runs an attempt, and hedges it with a second one if it is slower than the hedging percentile.
+    # Returns the first successful answer, along with the request that produced it.
+    async def hedged(self, request: EvaluationRequest):
+        first_request = self.copy_request(request)
+        if self.hedge_percentile == None or len(self.latencies) < self.hedge_min_samples:
+            return await self.attempt(first_request), first_request
+        delay = self.latencies.percentile(self.hedge_percentile)
+        first = asyncio.ensure_future(self.attempt(first_request))
+        attempts = {first: first_request}
+        try:
+            done, pending = await asyncio.wait({first}, timeout = delay)
+            if first in done or not self.budget.withdraw():
+                return await first, first_request
+
+            self.stats["hedges"] += 1
+            second_request = self.copy_request(request)
+            second = asyncio.ensure_future(self.attempt(second_request))
+            attempts[second] = second_request
+            pending = set(attempts)
+            error = None
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() == None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result(), attempts[task]
+                    error = task.exception()
+            raise error
+        finally:
+            # The slower attempt is abandoned, as is every attempt if the evaluation is cancelled by its deadline.
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    # Runs attempts until one succeeds, retrying failures within the retry budget.
+    async def attempts(self, request: EvaluationRequest):
+        retry = 0
+        while True:
+            try:
+                return await self.hedged(request)
+            except Exception as e:
+                if not retryable(e) or retry >= self.max_retries or not self.budget.withdraw():
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff(retry))
+                retry += 1
+
+    async def evaluate(self, request: EvaluationRequest):
+        self.stats["requests"] += 1
+        self.budget.deposit()
+        if not self.breaker.allow():
+            return self.degrade(request, BackendError("The circuit breaker is open."))
+        start = time.perf_counter()
+        try:
+            results, answered = await asyncio.wait_for(self.attempts(request), self.deadline)
+        except asyncio.TimeoutError:
+            self.stats["deadline_exceeded"] += 1
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            return self.degrade(request, DeadlineExceeded(f"No evaluation within {self.deadline} seconds."))
+        except Exception as e:
+            # Invalid outputs are not retried, but degraded like any other failed evaluation.
+            if not retryable(e) and not isinstance(e, (BackendError, OutputError)):
+                raise
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            return self.degrade(request, e if isinstance(e, BackendError) else BackendError(str(e)))
+        self.breaker.record_success()
+        request.usage = answered.usage
+        request.decode_time = answered.decode_time
+        request.latency = time.perf_counter() - start
+        return results
+
+    # Streams are retried until their first chunk arrives. They are not hedged, as two streams cannot be narrated at once.
+    # A stream that fails after its first chunk raises BackendError, since the narrated text cannot be taken back.
+    async def evaluate_stream(self, request: EvaluationRequest):
+        self.stats["requests"] += 1
+        self.budget.deposit()
+        if not self.breaker.allow():
+            yield json.dumps(self.degrade(request, BackendError("The circuit breaker is open.")))
+            return
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+        retry = 0
+        while True:
+            stream = self.backend.evaluate_stream(request)
+            started = False
+            try:
+                while True:
+                    remaining = deadline_at - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    timeout = min(remaining, self.attempt_timeout) if self.attempt_timeout != None and not started else remaining
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+                self.breaker.record_success()
+                return
+            except Exception as e:
+                await stream.aclose()
+                deadline_missed = isinstance(e, asyncio.TimeoutError) and deadline_at - loop.time() <= 0
+                if started or deadline_missed or not retryable(e) or retry >= self.max_retries or not self.budget.withdraw():
+                    if not retryable(e) and not isinstance(e, (BackendError, OutputError)):
+                        raise
+                    self.stats["failures"] += 1
+                    self.breaker.record_failure()
+                    if deadline_missed:
+                        self.stats["deadline_exceeded"] += 1
+                        error = DeadlineExceeded(f"No evaluation within {self.deadline} seconds.")
+                    else:
+                        error = e if isinstance(e, BackendError) else BackendError(str(e))
+                    if started:
+                        raise error from e
+                    yield json.dumps(self.degrade(request, error))
+                    return
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff(retry))
+                retry += 1
+
+    async def warm(self):
+        await self.backend.warm()
+
+    async def close(self):
+        await self.backend.close()
@@ -0,0 +1,206 @@
+import json
+
+# Structured output format for the action evaluation model.
+# Built once, as it is identical for every request.
+# The text output comes first, as models generate fields in schema order, so that streamed narration starts as early as possible.
+ACTION_EVAL_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "action_eval",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "text_output": {
+                    "type": "string",
+                    "description": "Update the player on the new scenario, including how other characters/objects within the scene respond to the player's actions. Maintain the context of the scenario."
+                },
+                "new_player_state": {
+                    "type": "object",
+                    "properties": {
+                        "physical_state": {"type": "string"},
+                        "mental_state": {"type": "string"},
+                        "inventory": {
+                            "type": "array",
+                            "items": {
+                                "type": "string"
+                            },
+                            "description": "Insert names of items from the inventory. Unused items or reusable items should show up in the new inventory. Do not create items that did not exist in the original inventory provided. Remove items from the original inventory that were consumed during the player's actions."
+                        }
+                    },
+                    "required": ["physical_state", "mental_state", "inventory"],
+                    "additionalProperties": False
+                },
+                "scenario_over": {
+                    "type": "boolean",
+                    "description": "Returns true if the specified exit mission has been satisfied, else return false."
+                },
+                "game_over":{
+                    "type": "boolean",
+                    "description": "Evaluate if the player has died during the scenario as a result of external factors or enemies. Return true if so, else return false."
+                }
+            },
+            "required": ["text_output", "new_player_state", "scenario_over", "game_over"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+# Compact alternative to the action_eval format. Only the items used and the states that changed are returned,
+# and common states are given as one-letter codes, so that turns where little changes cost few completion tokens.
+PHYSICAL_STATE_CODES = {"h": "healthy", "i": "injured", "w": "badly wounded", "x": "exhausted", "s": "strong", "d": "dead"}
+MENTAL_STATE_CODES = {"c": "calm", "h": "happy", "f": "focused", "a": "afraid", "n": "angry", "d": "desperate"}
+
+def state_field(codes):
+    listed = ", ".join(f"{code} ({state})" for code, state in codes.items())
+    return {
+        "type": ["string", "null"],
+        "description": f"null if unchanged. Otherwise one of the codes {listed}, or a short description if none fits."
+    }
+
+ACTION_DELTA_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "action_delta",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "text_output": ACTION_EVAL_FORMAT["json_schema"]["schema"]["properties"]["text_output"],
+                "used": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Names of inventory items consumed or lost during the player's actions, once per item. Empty if none. Reusable items are not listed."
+                },
+                "physical": state_field(PHYSICAL_STATE_CODES),
+                "mental": state_field(MENTAL_STATE_CODES),
+                "scenario_over": ACTION_EVAL_FORMAT["json_schema"]["schema"]["properties"]["scenario_over"],
+                "game_over": ACTION_EVAL_FORMAT["json_schema"]["schema"]["properties"]["game_over"]
+            },
+            "required": ["text_output", "used", "physical", "mental", "scenario_over", "game_over"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+class OutputError(ValueError):
+    """
+    Raised when an evaluation output does not have the shape of its schema, such as a missing field or invalid JSON.
+    """
+
+# Decodes the JSON text of an evaluation output. Raises OutputError if the model answered with invalid or truncated JSON.
+def decode_json(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise OutputError(f"Invalid evaluation output: {e}") from e
+
+class ActionResult:
+    """
+    The decoded outcome of an evaluated turn, in either output format.
+    Consumed holds the names of the inventory items used up, once per item. States are None when unchanged.
+    Item names that do not match the inventory are repaired to the closest inventory name; repaired lists them as (given, repaired) pairs,
+    and dropped lists the names that matched nothing.
+    """
+    __slots__ = ("text_output", "consumed", "physical_state", "mental_state", "scenario_over", "game_over", "repaired", "dropped")
+
+    def __init__(self, text_output, consumed, physical_state, mental_state, scenario_over, game_over):
+        self.text_output = text_output
+        self.consumed = consumed
+        self.physical_state = physical_state
+        self.mental_state = mental_state
+        self.scenario_over = scenario_over
+        self.game_over = game_over
+        self.repaired = []
+        self.dropped = []
+
+class OutputSchema:
+    """
+    The OutputSchema class holds a response format, built once, and decodes outputs into ActionResult objects.
+    Outputs of both the action_eval and action_delta formats are decoded, so cached, recorded or locally decided outputs
+    keep working when the format changes.
+    """
+    __slots__ = ("name", "response_format")
+
+    def __init__(self, response_format):
+        self.name = response_format["json_schema"]["name"]
+        self.response_format = response_format
+
+    # Decodes and validates an output against the inventory names and player state it was evaluated with.
+    def decode(self, output, inventory, player_state):
+        try:
+            if "new_player_state" in output:
+                new_state = output["new_player_state"]
+                result = ActionResult(str(output["text_output"]), [], new_state["physical_state"], new_state["mental_state"], bool(output["scenario_over"]), bool(output["game_over"]))
+                # Whatever the remaining inventory no longer holds was consumed.
+                consumed = list(inventory)
+                for name in repair_names(result, name_list(new_state["inventory"]), inventory):
+                    consumed.remove(name)
+                result.consumed = consumed
+            else:
+                result = ActionResult(str(output["text_output"]), [], output["physical"], output["mental"], bool(output["scenario_over"]), bool(output["game_over"]))
+                result.physical_state = PHYSICAL_STATE_CODES.get(result.physical_state, result.physical_state)
+                result.mental_state = MENTAL_STATE_CODES.get(result.mental_state, result.mental_state)
+                result.consumed = repair_names(result, name_list(output["used"]), inventory)
+        except (KeyError, TypeError) as e:
+            raise OutputError(f"Output does not match the {self.name} format: {e!r}") from e
+        if result.physical_state == player_state.get("physical_state"):
+            result.physical_state = None
+        if result.mental_state == player_state.get("mental_state"):
+            result.mental_state = None
+        return result
+
+# Returns a copy of a list of item names given by the model. Raises TypeError if it is not a list of strings.
+def name_list(names):
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise TypeError(f"Expected a list of item names, got {names!r}")
+    return list(names)
+
+# Matches item names given by the model to the inventory, each inventory item at most once.
+# Exact matches are taken first. Other names are repaired to the closest unmatched name, ignoring case, or dropped if none is close.
+def repair_names(result: ActionResult, names, inventory):
+    unmatched = list(inventory)
+    matched = []
+    guesses = []
+    for name in names:
+        if name in unmatched:
+            unmatched.remove(name)
+            matched.append(name)
+        else:
+            guesses.append(name)
+    if len(guesses) > 0:
+        import difflib
+        for name in guesses:
+            lowered = {item.lower(): item for item in unmatched}
+            close = difflib.get_close_matches(name.lower(), list(lowered), n = 1, cutoff = 0.6)
+            if len(close) == 0:
+                result.dropped.append(name)
+                continue
+            item = lowered[close[0]]
+            unmatched.remove(item)
+            matched.append(item)
+            result.repaired.append((name, item))
+    return matched
+
+# Converts an action_eval output into the action_delta format, given the inventory and state it was evaluated with.
+# Used by local backends to answer in either format.
+def compact_output(output, inventory, player_state):
+    new_state = output["new_player_state"]
+    remaining = list(new_state["inventory"])
+    used = []
+    for name in inventory:
+        if name in remaining:
+            remaining.remove(name)
+        else:
+            used.append(name)
+    codes = []
+    for key, table in (("physical_state", PHYSICAL_STATE_CODES), ("mental_state", MENTAL_STATE_CODES)):
+        value = new_state[key]
+        if value == player_state.get(key):
+            codes.append(None)
+        else:
+            codes.append(next((code for code, state in table.items() if state == value), value))
+    return {"text_output": output["text_output"], "used": used, "physical": codes[0], "mental": codes[1], "scenario_over": output["scenario_over"], "game_over": output["game_over"]}
+
+ACTION_EVAL_SCHEMA = OutputSchema(ACTION_EVAL_FORMAT)
+ACTION_DELTA_SCHEMA = OutputSchema(ACTION_DELTA_FORMAT)
\ No newline at end of file
@@ -0,0 +1,175 @@
+from .headless import HeadlessInterface, SessionEnded, random_evaluator
+from .tracing import Tracer
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import importlib
+import time
+
+class PlaythroughResult:
+    """
+    The outcome of a single headless playthrough.
+    Timings hold the seconds spent building the world, in the engine, and in each part of the interface.
+    Prefetch and fast_path hold the stats of the world's prefetcher and fast path resolver.
+    """
+    def __init__(self, ending, turns, evaluations, seconds, timings, prefetch = None, fast_path = None):
+        self.ending = ending
+        self.turns = turns
+        self.evaluations = evaluations
+        self.seconds = seconds
+        self.timings = timings
+        self.prefetch = prefetch if prefetch != None else {}
+        self.fast_path = fast_path if fast_path != None else {}
+
+class SimulationReport:
+    """
+    Aggregated results of many playthroughs, including throughput and where the time went.
+    """
+    def __init__(self):
+        self.playthroughs = 0
+        self.turns = 0
+        self.evaluations = 0
+        self.endings = {}
+        self.timings = {"build": 0.0, "engine": 0.0, "input": 0.0, "narrate": 0.0, "evaluate": 0.0}
+        self.prefetch = {} # Summed prefetcher stats.
+        self.fast_path = {} # Summed fast path resolver stats.
+        self.cpu_seconds = 0.0 # Summed playthrough time, across all workers.
+        self.wall_seconds = 0.0
+
+    def add_result(self, result: PlaythroughResult):
+        self.playthroughs += 1
+        self.turns += result.turns
+        self.evaluations += result.evaluations
+        self.endings[result.ending] = self.endings.get(result.ending, 0) + 1
+        for key in result.timings:
+            self.timings[key] += result.timings[key]
+        for key in result.prefetch:
+            self.prefetch[key] = self.prefetch.get(key, 0) + result.prefetch[key]
+        for key in result.fast_path:
+            self.fast_path[key] = self.fast_path.get(key, 0) + result.fast_path[key]
+        self.cpu_seconds += result.seconds
+
+    # Merges the report of another worker into this one.
+    def merge(self, other):
+        self.playthroughs += other.playthroughs
+        self.turns += other.turns
+        self.evaluations += other.evaluations
+        for ending in other.endings:
+            self.endings[ending] = self.endings.get(ending, 0) + other.endings[ending]
+        for key in other.timings:
+            self.timings[key] += other.timings[key]
+        for key in other.prefetch:
+            self.prefetch[key] = self.prefetch.get(key, 0) + other.prefetch[key]
+        for key in other.fast_path:
+            self.fast_path[key] = self.fast_path.get(key, 0) + other.fast_path[key]
+        self.cpu_seconds += other.cpu_seconds
+
+    def summary(self):
+        wall = self.wall_seconds if self.wall_seconds > 0 else float("nan")
+        breakdown = {}
+        for key in self.timings:
+            breakdown[key] = self.timings[key] / self.cpu_seconds if self.cpu_seconds > 0 else 0.0
+        return {
+            "playthroughs": self.playthroughs,
+            "turns": self.turns,
+            "evaluations": self.evaluations,
+            "wall_seconds": self.wall_seconds,
+            "playthroughs_per_second": self.playthroughs / wall,
+            "turns_per_second": self.turns / wall,
+            "endings": dict(self.endings),
+            "time_share": breakdown,
+            "prefetch": dict(self.prefetch),
+            "fast_path": dict(self.fast_path)
+        }
+
+# Plays one world to its end on the given interface, and returns the result.
+# world_factory is called as world_factory(interface), and must return a WorldMap.
+# Worlds which still call exit() directly are reported with the "exit" ending.
+def play(world_factory, interface: HeadlessInterface, max_acts = 10000):
+    start = time.perf_counter()
+    world = world_factory(interface)
+    built = time.perf_counter()
+    ending = "act_limit"
+    try:
+        world.start()
+        for _ in range(max_acts):
+            world.act()
+    except SessionEnded as e:
+        ending = e.ending
+    except SystemExit:
+        ending = "exit"
+    finally:
+        interface.close()
+    end = time.perf_counter()
+
+    timings = dict(interface.timings)
+    timings["build"] = built - start
+    timings["engine"] = (end - built) - sum(interface.timings.values())
+    return PlaythroughResult(ending, interface.responses, interface.evaluations, end - start, timings, dict(world.prefetcher.stats), dict(world.resolver.stats))
+
+# Plays a range of seeded random playthroughs, and returns their report.
+# Every playthrough uses its own seed, so results are reproducible regardless of how they are split between workers.
+# An optional tracer records the spans of every playthrough.
+def run_batch(world_factory, seeds, max_responses = 1000, evaluator_factory = random_evaluator, tracer = None):
+    report = SimulationReport()
+    for seed in seeds:
+        interface = HeadlessInterface(seed = seed, evaluator = evaluator_factory(seed), max_responses = max_responses, capture_output = False)
+        interface.set_tracer(tracer)
+        report.add_result(play(world_factory, interface))
+    return report
+
+# Plays count random playthroughs of a world, across worker processes if workers is greater than 1.
+# With multiple workers, world_factory and evaluator_factory must be picklable, such as module-level functions.
+# A tracer can only be used with a single worker, as it is not shared between processes.
+def run_playthroughs(world_factory, count, workers = 1, seed = 0, max_responses = 1000, evaluator_factory = random_evaluator, tracer = None):
+    seeds = range(seed, seed + count)
+    start = time.perf_counter()
+    if workers <= 1:
+        report = run_batch(world_factory, seeds, max_responses, evaluator_factory, tracer)
+    else:
+        report = SimulationReport()
+        chunks = [seeds[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            futures = [executor.submit(run_batch, world_factory, chunk, max_responses, evaluator_factory) for chunk in chunks]
+            for future in futures:
+                report.merge(future.result())
+    report.wall_seconds = time.perf_counter() - start
+    return report
+
+# Resolves a "module:function" reference to a world factory.
+def load_factory(reference):
+    module_name, _, attribute = reference.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "build_world")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Play many headless random playthroughs of a world and report throughput.")
+    parser.add_argument("world", help = "World factory, as module:function. For example, demo_world:build_world")
+    parser.add_argument("-n", "--playthroughs", type = int, default = 1000)
+    parser.add_argument("-w", "--workers", type = int, default = 1)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--max-responses", type = int, default = 1000)
+    parser.add_argument("--trace", metavar = "PREFIX", help = "Write spans to PREFIX.jsonl and metrics to PREFIX.prom. Single worker only.")
+    parser.add_argument("--profile", metavar = "PATH", help = "Write a profile of the run. Single worker only.")
+    parser.add_argument("--profile-mode", choices = ["cprofile", "sample"], default = "cprofile", help = "cprofile writes pstats, sample writes folded stacks for flamegraphs.")
+    args = parser.parse_args()
+
+    tracer = Tracer() if args.trace or args.profile else None
+    if args.profile:
+        tracer.start_profile(args.profile_mode)
+    report = run_playthroughs(load_factory(args.world), args.playthroughs, args.workers, args.seed, args.max_responses, tracer = tracer)
+    if args.profile:
+        tracer.stop_profile(args.profile)
+    if args.trace:
+        tracer.export_jsonl(args.trace + ".jsonl")
+        tracer.export_prometheus(args.trace + ".prom")
+    summary = report.summary()
+    print(f"{summary['playthroughs']} playthroughs in {summary['wall_seconds']:.3f}s")
+    print(f"{summary['playthroughs_per_second']:.1f} playthroughs/sec, {summary['turns_per_second']:.1f} turns/sec")
+    print(f"Endings: {summary['endings']}")
+    print("Time share: " + ", ".join(f"{key} {share:.1%}" for key, share in summary["time_share"].items()))
+    prefetch = summary["prefetch"]
+    if prefetch.get("started", 0) > 0:
+        resolved = prefetch["hits"] + prefetch["wasted"]
+        print(f"Prefetch: {prefetch['started']} started, {prefetch['hits']} hits, {prefetch['wasted']} wasted ({prefetch['wasted'] / max(resolved, 1):.1%} of resolved)")
+    fast_path = summary["fast_path"]
+    if fast_path.get("turns", 0) > 0:
+        print(f"Fast path: {fast_path['local']} of {fast_path['turns']} dynamic turns decided locally ({fast_path['local'] / fast_path['turns']:.1%})")
\ No newline at end of file
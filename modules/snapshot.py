@@ -0,0 +1,99 @@
+import json
+import os
+
+# Compact JSON encoding used for every journal line.
+def encode(data):
+    return json.dumps(data, separators = (",", ":"), ensure_ascii = False)
+
+# Returns the changes from one snapshot to the next. Areas are compared individually.
+def snapshot_delta(previous, current):
+    delta = {}
+    for key in ("current", "flags", "player"):
+        if previous[key] != current[key]:
+            delta[key] = current[key]
+    areas = {}
+    for area_id, state in current["areas"].items():
+        if previous["areas"].get(area_id) != state:
+            areas[area_id] = state
+    if len(areas) > 0:
+        delta["areas"] = areas
+    return delta
+
+# Applies a delta returned by snapshot_delta onto a snapshot, in place.
+def apply_delta(snapshot, delta):
+    for key in ("current", "flags", "player"):
+        if key in delta:
+            snapshot[key] = delta[key]
+    snapshot["areas"].update(delta.get("areas", {}))
+    return snapshot
+
+# Returns a deep copy of a snapshot, so that later changes to the world do not alter it.
+def copy_snapshot(snapshot):
+    return json.loads(encode(snapshot))
+
+class SnapshotJournal:
+    """
+    The SnapshotJournal class saves a world session as an append-only log of JSON lines.
+    The first line holds a full snapshot, and every following line holds the delta of one checkpoint.
+    After compact_every deltas, the log is rewritten as a single full snapshot.
+    Attach it to a world with WorldMap.journal, and resume a session with load_snapshot and WorldMap.restore.
+    """
+    def __init__(self, path, compact_every = 200):
+        self.path = path
+        self.compact_every = compact_every
+        self.last = None # Last recorded snapshot.
+        self.deltas = 0 # Deltas written since the last full snapshot.
+        self.file = None
+
+    # Records a snapshot. Nothing is written if nothing changed since the last record.
+    def record(self, snapshot):
+        snapshot = copy_snapshot(snapshot)
+        if self.last == None:
+            self.compact(snapshot)
+            return
+        delta = snapshot_delta(self.last, snapshot)
+        if len(delta) == 0:
+            return
+        self.file.write(encode({"d": delta}) + "\n")
+        self.file.flush()
+        self.last = snapshot
+        self.deltas += 1
+        if self.deltas >= self.compact_every:
+            self.compact(snapshot)
+
+    # Rewrites the log as a single full snapshot. The file is replaced atomically.
+    def compact(self, snapshot = None):
+        if snapshot == None:
+            snapshot = self.last
+        if self.file != None:
+            self.file.close()
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding = "utf-8") as file:
+            file.write(encode({"full": snapshot}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+        self.file = open(self.path, "a", encoding = "utf-8")
+        self.last = snapshot
+        self.deltas = 0
+
+    def close(self):
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+# Reads a journal, and returns the latest snapshot it holds.
+# A partially written last line, such as after a crash, is ignored.
+def load_snapshot(path):
+    snapshot = None
+    with open(path, encoding = "utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if "full" in entry:
+                snapshot = entry["full"]
+            else:
+                apply_delta(snapshot, entry["d"])
+    return snapshot
@@ -0,0 +1,228 @@
+from .backends import FIRST_CHUNK_SHARE, EvaluationRequest, LatencyModel, RuleBasedBackend
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+class StandinServer:
+    """
+    The StandinServer class is a local, network-free stand-in for an OpenAI-compatible chat completions endpoint.
+    It answers POST /v1/chat/completions requests using the action_eval or action_delta json_schema response format,
+    with outputs generated by a RuleBasedBackend (rule-generated or canned).
+    Latency is drawn from a LatencyModel, and requests fail with HTTP 500 or 429 at the configured rates.
+    Requests with "stream" set are answered with server-sent events, with the latency split between the first chunk and the rest.
+    POST /v1/batch/chat/completions answers a batch of requests at once, taking one latency sample plus batch_item_latency per extra request.
+    Connections are kept alive, so clients can be measured for connection reuse. GET /stats returns the counters.
+    """
+    def __init__(self, host = "127.0.0.1", port = 8199, generator = None, latency = None, error_rate = 0.0, rate_limit_rate = 0.0, seed = None, batch_item_latency = 0.0):
+        self.host = host
+        self.port = port
+        self.generator = generator if generator != None else RuleBasedBackend(seed = seed)
+        self.latency = latency if latency != None else LatencyModel("fixed", 0)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.batch_item_latency = batch_item_latency
+        self.random = random.Random(seed)
+
+        self.server = None
+        self.loop = None
+        self.thread = None
+        self.handlers = {} # Tasks serving open connections, keyed by their stream writers.
+        self.stats = {"connections": 0, "requests": 0, "streamed": 0, "batches": 0, "errors": 0, "rate_limited": 0}
+
+    # Base URL for clients, such as HTTPBackend or OpenAIBackend.
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        # Port 0 picks a free port; report the one actually bound.
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    # Stops accepting connections, and closes the open ones.
+    async def stop(self):
+        self.server.close()
+        # Closing the transports ends every handler at its next read.
+        for writer in list(self.handlers):
+            writer.close()
+        await asyncio.gather(*self.handlers.values(), return_exceptions = True)
+        await self.server.wait_closed()
+
+    # Starts the server on its own event loop in a background thread, and returns its base URL.
+    def start_in_thread(self):
+        ready = threading.Event()
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.start())
+            ready.set()
+            self.loop.run_forever()
+        self.thread = threading.Thread(target = run, daemon = True)
+        self.thread.start()
+        ready.wait()
+        return self.url()
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    # Serves keep-alive requests on a connection until the client closes it.
+    async def handle_connection(self, reader, writer):
+        self.stats["connections"] += 1
+        self.handlers[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if request_line == b"":
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                status, payload = await self.route(method, path, body)
+                if hasattr(payload, "__aiter__"):
+                    await self.write_stream(writer, payload)
+                else:
+                    self.write_response(writer, status, payload)
+                    await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.handlers.pop(writer, None)
+            writer.close()
+
+    def write_response(self, writer, status, payload):
+        data = json.dumps(payload, separators = (",", ":")).encode("utf-8")
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n"
+        writer.write(head.encode("latin-1") + data)
+
+    # Writes server-sent events as they are produced, using chunked transfer encoding.
+    async def write_stream(self, writer, events):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+        async for event in events:
+            data = b"data: " + json.dumps(event, separators = (",", ":")).encode("utf-8") + b"\n\n"
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+        data = b"data: [DONE]\n\n"
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n0\r\n\r\n")
+        await writer.drain()
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/stats":
+            return 200, self.stats
+        if method == "POST" and path == "/v1/chat/completions":
+            return await self.chat_completion(json.loads(body))
+        if method == "POST" and path == "/v1/batch/chat/completions":
+            return await self.batch_completion(json.loads(body))
+        return 404, {"error": {"message": f"No route for {method} {path}."}}
+
+    async def chat_completion(self, payload):
+        self.stats["requests"] += 1
+        stream = payload.get("stream") == True
+        latency = self.latency.sample()
+        await asyncio.sleep(latency * FIRST_CHUNK_SHARE if stream else latency)
+        return await self.answer(payload, stream, latency)
+
+    # Answers a batch of chat completions sharing a model and response format. Each system prompt is sent once, and referenced by index.
+    # The batch takes one latency sample, plus batch_item_latency for every request after the first, as a batching model server would.
+    async def batch_completion(self, payload):
+        self.stats["batches"] += 1
+        items = payload.get("requests", [])
+        self.stats["requests"] += len(items)
+        await asyncio.sleep(self.latency.sample() + self.batch_item_latency * max(len(items) - 1, 0))
+        responses = []
+        for item in items:
+            messages = [{"role": "system", "content": payload["system_prompts"][item["system"]]}, {"role": "user", "content": item["user"]}]
+            status, body = await self.answer({"model": payload.get("model", ""), "response_format": payload.get("response_format", {}), "messages": messages})
+            responses.append({"status": status, "body": body})
+        return 200, {"responses": responses}
+
+    # Answers a chat completion once its latency has passed, with an injected error, a stream of events, or a completion.
+    async def answer(self, payload, stream = False, latency = 0.0):
+        roll = self.random.random()
+        if roll < self.error_rate:
+            self.stats["errors"] += 1
+            return 500, {"error": {"message": "Injected server error.", "type": "server_error"}}
+        if roll < self.error_rate + self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return 429, {"error": {"message": "Injected rate limit.", "type": "rate_limit_error"}}
+
+        response_format = payload.get("response_format", {})
+        if response_format.get("type") != "json_schema":
+            return 400, {"error": {"message": "Only the json_schema response format is supported."}}
+        messages = payload.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+        request = EvaluationRequest(system_prompt, user_prompt, response_format, payload.get("model", ""))
+
+        if stream:
+            self.stats["streamed"] += 1
+            include_usage = (payload.get("stream_options") or {}).get("include_usage") == True
+            return 200, self.stream_events(request, latency * (1 - FIRST_CHUNK_SHARE), include_usage)
+        results = await self.generator.evaluate(request)
+        return 200, {
+            "id": f"chatcmpl-standin-{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(results)},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": request.usage["prompt_tokens"],
+                "completion_tokens": request.usage["completion_tokens"],
+                "total_tokens": request.usage["prompt_tokens"] + request.usage["completion_tokens"]
+            }
+        }
+
+    # Yields the chunks of a streamed completion. The remaining latency is spread evenly between the chunks.
+    async def stream_events(self, request, latency, include_usage):
+        chunks = [chunk async for chunk in self.generator.evaluate_stream(request)]
+        base = {"id": f"chatcmpl-standin-{self.stats['requests']}", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.model}
+        for index, chunk in enumerate(chunks):
+            if index > 0:
+                await asyncio.sleep(latency / (len(chunks) - 1))
+            delta = {"role": "assistant", "content": chunk} if index == 0 else {"content": chunk}
+            yield dict(base, choices = [{"index": 0, "delta": delta, "finish_reason": None}])
+        yield dict(base, choices = [{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            usage = dict(request.usage, total_tokens = request.usage["prompt_tokens"] + request.usage["completion_tokens"])
+            yield dict(base, choices = [], usage = usage)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Local stand-in for an OpenAI-compatible chat completions endpoint.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8199)
+    parser.add_argument("--latency", default = "fixed:0", help = "Latency distribution, such as fixed:0.2, uniform:0.1,0.5, lognormal:0.4,0.5 or pareto:0.2,2.5")
+    parser.add_argument("--error-rate", type = float, default = 0.0)
+    parser.add_argument("--rate-limit-rate", type = float, default = 0.0)
+    parser.add_argument("--batch-item-latency", type = float, default = 0.0, help = "Seconds added to a batch for every request after the first.")
+    parser.add_argument("--canned", help = "JSON file holding a list of action_eval outputs to return in turn.")
+    parser.add_argument("--seed", type = int)
+    args = parser.parse_args()
+
+    canned_outputs = None
+    if args.canned:
+        with open(args.canned) as file:
+            canned_outputs = json.load(file)
+    server = StandinServer(args.host, args.port, RuleBasedBackend(canned_outputs = canned_outputs, seed = args.seed), LatencyModel.parse(args.latency, args.seed), args.error_rate, args.rate_limit_rate, args.seed, args.batch_item_latency)
+
+    async def serve():
+        await server.start()
+        print(f"Serving chat completions at {server.url()}")
+        await server.server.serve_forever()
+    asyncio.run(serve())
\ No newline at end of file
@@ -0,0 +1,139 @@
+class GameState:
+    """
+    The GameState class stores the flags of a world by key, such as learned spells, and notifies listeners when they change.
+    Every key has a version that is incremented whenever its value changes, so that results computed from a few keys
+    can be kept until one of those keys changes. Values must be JSON-compatible to be saved with snapshots.
+    Values are replaced rather than modified in place, as changes made to a stored list or dictionary are not seen.
+    Use add and discard for list values.
+    """
+    def __init__(self):
+        self.values = {}
+        self.versions = {} # Number of changes of each key.
+        self.listeners = {} # Callbacks of each key, called as callback(key, value) after it changes.
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def get(self, key, default = None):
+        return self.values.get(key, default)
+
+    # Stores a value. Nothing changes, and no one is notified, if the value is equal to the stored one.
+    def set(self, key, value):
+        if key in self.values and self.values[key] == value:
+            return
+        self.values[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+        for callback in self.listeners.get(key, []):
+            callback(key, value)
+
+    # Adds an item to a list value, unless the list already holds it. Missing keys start as empty lists.
+    def add(self, key, item):
+        values = self.values.get(key, [])
+        if item not in values:
+            self.set(key, values + [item])
+
+    # Removes an item from a list value, if the list holds it.
+    def discard(self, key, item):
+        values = self.values.get(key, [])
+        if item in values:
+            self.set(key, [value for value in values if value != item])
+
+    def subscribe(self, key, callback):
+        self.listeners.setdefault(key, []).append(callback)
+
+    def unsubscribe(self, key, callback):
+        if callback in self.listeners.get(key, []):
+            self.listeners[key].remove(callback)
+
+    # Returns the versions of some keys, which only compare equal while none of them has changed.
+    def stamp(self, keys):
+        return tuple(self.versions.get(key, 0) for key in keys)
+
+    # Decorator declaring the keys that a precondition reads. See StatePrecondition.
+    def requires(self, *keys):
+        return lambda func: StatePrecondition(self, keys, func)
+
+    # Returns a copy of the values, such as for snapshots.
+    def capture_state(self):
+        return dict(self.values)
+
+    # Replaces every value with the values of capture_state. Listeners are notified of the keys that changed.
+    def restore_state(self, values):
+        for key in list(self.values):
+            if key not in values:
+                del self.values[key]
+                self.versions[key] = self.versions.get(key, 0) + 1
+                for callback in self.listeners.get(key, []):
+                    callback(key, None)
+        for key, value in values.items():
+            self.set(key, value)
+
+class StatePrecondition:
+    """
+    A precondition that only reads the given keys of a GameState. Its result is kept until one of those keys changes,
+    so entry checks, action menus and routes built from it are only recomputed when needed.
+    It must not have side effects, such as narration, as it is not called again while its result is kept.
+    It is used wherever a precondition or entry criteria function is accepted, and is created with GameState.requires.
+    """
+    __slots__ = ("state", "keys", "func", "cached_stamp", "cached_result")
+
+    def __init__(self, state: GameState, keys, func):
+        self.state = state
+        self.keys = keys
+        self.func = func
+        self.cached_stamp = None
+        self.cached_result = None
+
+    def __call__(self):
+        stamp = self.state.stamp(self.keys)
+        if stamp != self.cached_stamp:
+            self.cached_result = self.func()
+            self.cached_stamp = stamp
+        return self.cached_result
+
+    # Returns the stamp of the keys the precondition reads.
+    def stamp(self):
+        return self.state.stamp(self.keys)
+
+class ActionMenu:
+    """
+    The ActionMenu class keeps the options of a menu of custom actions, following a fixed list of leading options.
+    Actions whose precondition is a StatePrecondition are only offered while it holds. Other preconditions are opaque,
+    so their actions are always offered, and their preconditions are checked when they are run.
+    The options are only rebuilt when the actions change, or when a state key read by one of the preconditions changes.
+    """
+    __slots__ = ("leading", "source", "count", "gated", "cached_stamp", "actions", "options")
+
+    def __init__(self, leading):
+        self.leading = leading # Options listed before the actions.
+        self.reset()
+
+    # Forgets the options, such as after an action has been added or removed.
+    def reset(self):
+        self.source = None
+        self.count = 0
+        self.gated = []
+        self.cached_stamp = None
+        self.actions = []
+        self.options = []
+
+    # Returns the offered actions, and the options listing the leading options then those actions.
+    # The returned lists are shared, and must not be modified.
+    def build(self, actions):
+        if actions is not self.source or len(actions) != self.count:
+            self.reset()
+            self.source = actions
+            self.count = len(actions)
+            self.gated = [action.precond_func for action in actions if isinstance(action.precond_func, StatePrecondition)]
+        stamp = tuple(precondition.stamp() for precondition in self.gated)
+        if stamp != self.cached_stamp:
+            self.actions = [action for action in actions if not isinstance(action.precond_func, StatePrecondition) or action.precond_func()]
+            self.options = self.leading + [action.get_name() for action in self.actions]
+            self.cached_stamp = stamp
+        return self.actions, self.options
@@ -0,0 +1,168 @@
+from .schema import OutputError, decode_json
+import re
+
+# Next character that ends a run of plain string content.
+STRING_SPECIAL = re.compile(r'["\\]')
+# Next character of interest outside of strings.
+STRUCTURAL = re.compile(r'["{}\[\],:]')
+# Characters allowed at each position of a low surrogate escape, \uDC00 to \uDFFF.
+LOW_SURROGATE = ["\\", "u", "dD", "cdefCDEF", "0123456789abcdefABCDEF", "0123456789abcdefABCDEF"]
+SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class StreamingParser:
+    """
+    Incrementally parses a JSON object that arrives in chunks, such as a streamed action_eval structured output.
+    The top-level string field named by text_field is decoded as it arrives, so that it can be narrated before the document is complete.
+    Every other top-level field is decoded into fields as soon as its value is complete.
+    Once the stream has ended, result() decodes and returns the whole document.
+    Only the part of the document that may still be decoded is kept in raw, so that long streams are not copied again with every chunk.
+    """
+    def __init__(self, text_field = "text_output"):
+        self.text_field = text_field
+        self.chunks = [] # Everything received so far, joined once the stream has ended.
+        self.raw = "" # Received text that is still needed: the current top-level value, and what has not been scanned yet.
+        self.position = 0 # Index in raw of the next character to scan.
+        self.depth = 0 # Nesting depth of objects and arrays. The top-level object is depth 1.
+        self.in_string = False
+        self.string_start = None
+        self.state = "key" # Within the top-level object: "key", "colon" or "value".
+        self.key = None # Current top-level key.
+        self.value_start = None
+        self.colon = None # Index in raw of the colon before the current top-level value.
+        self.streaming = False # Whether the current string is the text field.
+        self.text_value = False # Whether the current top-level value is the text field, decoded as it arrived rather than kept in raw.
+        self.fields = {} # Completed top-level fields.
+        self.text_parts = [] # Decoded parts of the text field so far.
+
+    # Adds a chunk of the document, and returns the newly decoded part of the text field, if any.
+    def feed(self, chunk):
+        self.chunks.append(chunk)
+        self.discard_consumed()
+        self.raw += chunk
+        decoded = self.text_parts
+        start = len(decoded)
+        raw = self.raw
+        while self.position < len(raw):
+            if self.in_string:
+                match = STRING_SPECIAL.search(raw, self.position)
+                end = match.start() if match else len(raw)
+                if self.streaming and end > self.position:
+                    decoded.append(raw[self.position:end])
+                self.position = end
+                if match == None:
+                    break
+                if raw[end] == '"':
+                    self.in_string = False
+                    self.position = end + 1
+                    self.end_string(end)
+                    continue
+                # Escape sequences are only consumed once they are complete.
+                length = self.escape_length(end)
+                if length == None:
+                    break
+                if self.streaming:
+                    decoded.append(self.decode_escape(raw[end:end + length]))
+                self.position = end + length
+                continue
+
+            match = STRUCTURAL.search(raw, self.position)
+            if match == None:
+                self.position = len(raw)
+                break
+            index = match.start()
+            character = raw[index]
+            self.position = index + 1
+            if character == '"':
+                self.in_string = True
+                self.string_start = index
+                if self.depth == 1 and self.state == "value" and self.value_start == None:
+                    self.value_start = index
+                    self.streaming = self.key == self.text_field
+                    self.text_value = self.streaming
+            elif character in "{[":
+                if self.depth == 1 and self.state == "value" and self.value_start == None:
+                    self.value_start = index
+                self.depth += 1
+            elif character in "}]":
+                if self.depth == 1:
+                    self.end_value(index)
+                self.depth -= 1
+            elif character == ":" and self.depth == 1:
+                self.state = "value"
+                self.value_start = None
+                self.colon = index
+            elif character == "," and self.depth == 1:
+                self.end_value(index)
+
+        return "".join(decoded[start:])
+
+    # Drops the start of raw that has been scanned and is no longer needed to decode a value, and moves the indices into raw to match.
+    def discard_consumed(self):
+        keep = self.position
+        if self.in_string and self.depth == 1 and self.state == "key":
+            keep = min(keep, self.string_start)
+        if self.state == "value" and not self.text_value:
+            keep = min(keep, self.value_start if self.value_start != None else self.colon + 1)
+        if keep > 0:
+            self.raw = self.raw[keep:]
+            self.position -= keep
+            if self.string_start != None:
+                self.string_start -= keep
+            if self.value_start != None:
+                self.value_start -= keep
+            if self.colon != None:
+                self.colon -= keep
+
+    # Returns the length of the escape sequence at an index, or None if it has not fully arrived yet.
+    # A high surrogate is combined with the low surrogate escape that follows it. It is only held back while the characters
+    # that have arrived after it could still be the start of one.
+    def escape_length(self, index):
+        raw = self.raw
+        if index + 1 >= len(raw):
+            return None
+        if raw[index + 1] != "u":
+            return 2
+        if index + 6 > len(raw):
+            return None
+        try:
+            code = int(raw[index + 2:index + 6], 16)
+        except ValueError as e:
+            raise OutputError(f"Invalid escape sequence in evaluation output: {raw[index:index + 6]}") from e
+        if 0xD800 <= code <= 0xDBFF:
+            following = raw[index + 6:index + 12]
+            if all(character in allowed for character, allowed in zip(following, LOW_SURROGATE)):
+                return 12 if len(following) == 6 else None
+        return 6
+
+    def decode_escape(self, sequence):
+        if sequence[1] != "u":
+            return SIMPLE_ESCAPES.get(sequence[1], sequence[1])
+        return decode_json(f'"{sequence}"')
+
+    def end_string(self, index):
+        self.streaming = False
+        if self.depth == 1 and self.state == "key":
+            self.key = decode_json(self.raw[self.string_start:index + 1])
+            self.state = "colon"
+
+    # Decodes a top-level value that ended just before the given index.
+    # The text field has already been decoded as it arrived.
+    def end_value(self, index):
+        if self.state == "value" and self.key != None:
+            if self.text_value:
+                self.fields[self.key] = "".join(self.text_parts)
+            else:
+                start = self.value_start if self.value_start != None else self.colon + 1
+                self.fields[self.key] = decode_json(self.raw[start:index])
+        self.state = "key"
+        self.key = None
+        self.value_start = None
+        self.text_value = False
+
+    # Whether a top-level field has been completed.
+    def has_field(self, name):
+        return name in self.fields
+
+    # Decodes the whole document. Raises OutputError if the stream ended early, or the document is not valid JSON.
+    def result(self):
+        return decode_json("".join(self.chunks))
@@ -0,0 +1,99 @@
+class WorldTicker:
+    """
+    The WorldTicker class advances the dynamic scenarios that the player is not in, so that the world evolves while they are elsewhere.
+    After every act, the off-screen dynamic areas with a tick budget left are given a background turn on the interface's event loop,
+    with at most concurrency turns under way at once. Areas fewer paths away from the player are ticked first.
+    While ticking is enabled, synchronous acts also run on that event loop (see WorldMap.act), so ticks keep advancing
+    while the player is in static menus, travelling, or typing, and the backend's connections stay on a single loop.
+    Each outcome is merged into the scenario of its area once complete, and the player's turns never wait on it.
+    Outcomes are discarded if the player entered the area, or its scenario changed, while they were evaluated.
+    Only merged outcomes are taken from the tick budget of their area.
+    Background turns are evaluated as they finish, so sessions with ticking enabled cannot be replayed exactly.
+    Stats count the ticks started, merged, discarded as stale, failed, and cancelled.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.enabled = False
+        self.concurrency = 2 # Maximum background turns under way at once.
+        self.max_distance = 16 # Paths searched from the player when prioritizing. Farther areas are ticked last.
+        self.areas = {} # Areas given a tick budget, used as an ordered set.
+        self.running = {} # Areas with a background turn under way, mapped to its task.
+        self.stats = {"started": 0, "merged": 0, "stale": 0, "failed": 0, "cancelled": 0}
+
+    # Adds an area to those that may be ticked. See Area.set_tick_budget.
+    def watch(self, area):
+        self.areas[area] = None
+
+    # Updates the background turns after the player has acted. The turn of the area that the player is now in is cancelled.
+    def update(self):
+        current = self.world.current_area
+        if current in self.running:
+            self.running.pop(current).cancel()
+            self.stats["cancelled"] += 1
+        self.fill()
+
+    # Starts background turns, closest areas first, until the concurrency limit is reached.
+    def fill(self):
+        if not self.enabled or len(self.running) >= self.concurrency:
+            return
+        from .world_map import Area_Type
+        candidates = []
+        for area in self.areas:
+            if (area.tick_budget > 0 and area not in self.running and area is not self.world.current_area
+                    and area.hydrated and Area_Type(area.area_type) == Area_Type.DYNAMIC):
+                candidates.append(area)
+        if len(candidates) == 0:
+            return
+        distances = self.distances(candidates)
+        # Areas that were not found are ticked last. The sort is stable, so areas at the same distance keep the order they were watched in.
+        candidates.sort(key = lambda area: distances.get(area, self.max_distance + 1))
+        for area in candidates[:self.concurrency - len(self.running)]:
+            self.running[area] = self.world.interface.schedule(self.tick(area))
+            self.stats["started"] += 1
+            self.world.interface.tracer.count("ticks_started")
+
+    # Returns the number of paths from the player to the areas found within max_distance paths, stopping once every target is found.
+    # Areas that have not been hydrated are not searched through, so that prioritizing does not load the areas of a lazy world.
+    def distances(self, targets):
+        current = self.world.current_area
+        if current == False:
+            return {}
+        distances = {current: 0}
+        remaining = set(targets) - {current}
+        frontier = [current]
+        distance = 0
+        while len(frontier) > 0 and len(remaining) > 0 and distance < self.max_distance:
+            distance += 1
+            next_frontier = []
+            for area in frontier:
+                if not area.hydrated:
+                    continue
+                for neighbour in area.paths:
+                    if neighbour not in distances:
+                        distances[neighbour] = distance
+                        remaining.discard(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return distances
+
+    # Runs a background turn of an area. Failures are only counted, as nothing is waiting on the turn.
+    # Once a turn has been merged, the next one is started at once. Otherwise the next act starts it, so that a failing backend is not retried in a loop.
+    async def tick(self, area):
+        import asyncio
+        task = asyncio.current_task()
+        interface = self.world.interface
+        merged = False
+        try:
+            with interface.tracer.span("tick", area = area.name):
+                try:
+                    merged = await area.tick_async(self.world.player)
+                    self.stats["merged" if merged else "stale"] += 1
+                except Exception:
+                    self.stats["failed"] += 1
+            if merged:
+                area.tick_budget -= 1
+        finally:
+            if self.running.get(area) is task:
+                self.running.pop(area)
+        if merged:
+            self.fill()
\ No newline at end of file
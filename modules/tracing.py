@@ -0,0 +1,250 @@
+from collections import deque
+from contextvars import ContextVar
+import json
+import os
+import sys
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span that encloses the code currently running, used as the parent of new spans. Kept per task and per thread.
+current_span = ContextVar("current_span", default = None)
+
+class NullSpan:
+    """
+    Span returned by a disabled tracer. Entering, leaving and annotating it does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, key, value):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    """
+    A timed section of a turn. Spans nest, and are recorded by their tracer when they end.
+    """
+    __slots__ = ("tracer", "name", "span_id", "parent_id", "attributes", "start", "duration", "token")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = None
+        self.parent_id = None
+        self.start = None
+        self.duration = None
+        self.token = None
+
+    def __enter__(self):
+        parent = current_span.get()
+        self.parent_id = parent.span_id if parent != None else None
+        self.span_id = self.tracer.next_id()
+        self.token = current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        current_span.reset(self.token)
+        if exc_type != None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer.finish(self)
+        return False
+
+    # Adds an attribute to the span, such as the token usage of an evaluation.
+    def set(self, key, value):
+        self.attributes[key] = value
+
+class Histogram:
+    """
+    Cumulative histogram of durations, in the Prometheus bucket layout.
+    """
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    # Cumulative counts per bucket bound, ending with +Inf.
+    def cumulative(self):
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((str(bound), running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval, for flamegraphs.
+    Stacks are counted in the folded format read by flamegraph.pl and speedscope: one line per stack, frames separated by semicolons.
+    """
+    def __init__(self, thread_id, interval = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame != None:
+                frames.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename.rsplit('/', 1)[-1]}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+            if len(frames) > 0:
+                stack = ";".join(reversed(frames))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def write_folded(self, path):
+        with open(path, "w", encoding = "utf-8") as file:
+            for stack, count in sorted(self.stacks.items()):
+                file.write(f"{stack} {count}\n")
+
+class Tracer:
+    """
+    The Tracer class records spans and metrics of game sessions.
+    Spans are kept in a bounded buffer until exported to JSON lines. Every span also feeds a duration histogram per span name,
+    and token usage reported by evaluator backends is summed into counters. Both export to the Prometheus text format.
+    A disabled tracer hands out a shared no-op span, so instrumented code costs next to nothing.
+    A profile of the session can be captured with cProfile, or as sampled stacks for flamegraphs.
+    """
+    def __init__(self, enabled = True, max_spans = 100000):
+        self.enabled = enabled
+        self.spans = deque(maxlen = max_spans) # Finished spans, as dictionaries, until exported.
+        self.histograms = {}
+        self.counters = {}
+        self.last_id = 0
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.sampler = None
+
+    def next_id(self):
+        with self.lock:
+            self.last_id += 1
+            return self.last_id
+
+    # Returns a span to use as a context manager. Attributes are recorded with the span.
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def finish(self, span: Span):
+        with self.lock:
+            self.spans.append({"name": span.name, "id": span.span_id, "parent": span.parent_id, "start": span.start, "duration": span.duration, "attributes": span.attributes})
+            self.observe(span.name, span.duration)
+
+    # Records a duration that was measured elsewhere, such as the decode time reported by a backend.
+    def record(self, name, seconds):
+        if self.enabled and seconds != None:
+            with self.lock:
+                self.observe(name, seconds)
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram == None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name, amount = 1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Adds the token usage of an evaluation to the counters.
+    def add_usage(self, usage):
+        if self.enabled and usage != None:
+            self.count("prompt_tokens", usage.get("prompt_tokens", 0))
+            self.count("completion_tokens", usage.get("completion_tokens", 0))
+
+    # Appends the buffered spans to a JSON lines file, and clears the buffer.
+    def export_jsonl(self, path):
+        with self.lock:
+            spans = list(self.spans)
+            self.spans.clear()
+        with open(path, "a", encoding = "utf-8") as file:
+            for span in spans:
+                file.write(json.dumps(span, separators = (",", ":")) + "\n")
+        return len(spans)
+
+    # Returns the histograms and counters in the Prometheus text exposition format.
+    def prometheus_text(self):
+        lines = ["# HELP game_span_seconds Duration of traced game spans.", "# TYPE game_span_seconds histogram"]
+        with self.lock:
+            for name in sorted(self.histograms):
+                histogram = self.histograms[name]
+                for bound, count in histogram.cumulative():
+                    lines.append(f"game_span_seconds_bucket{{span=\"{name}\",le=\"{bound}\"}} {count}")
+                lines.append(f"game_span_seconds_sum{{span=\"{name}\"}} {histogram.total}")
+                lines.append(f"game_span_seconds_count{{span=\"{name}\"}} {histogram.count}")
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE game_{name}_total counter")
+                lines.append(f"game_{name}_total {self.counters[name]}")
+        return "\n".join(lines) + "\n"
+
+    # Writes the metrics to a Prometheus text file, such as one read by the node exporter's textfile collector.
+    # The file is replaced atomically.
+    def export_prometheus(self, path):
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding = "utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temporary_path, path)
+
+    # Starts profiling the current thread. Mode is "cprofile" for deterministic profiling, or "sample" for sampled flamegraph stacks.
+    def start_profile(self, mode = "cprofile", interval = 0.005):
+        if mode == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif mode == "sample":
+            self.sampler = StackSampler(threading.get_ident(), interval)
+            self.sampler.start()
+        else:
+            raise ValueError(f"Unknown profile mode \"{mode}\".")
+
+    # Stops profiling, and writes the profile: a pstats file for cProfile, or folded stacks for sampling.
+    def stop_profile(self, path):
+        if self.profiler != None:
+            self.profiler.disable()
+            self.profiler.dump_stats(path)
+            self.profiler = None
+        if self.sampler != None:
+            self.sampler.stop()
+            self.sampler.write_folded(path)
+            self.sampler = None
+
+# Tracer used by interfaces that have not been given one. It is disabled, so instrumentation is free.
+NULL_TRACER = Tracer(enabled = False, max_spans = 0)
@@ -0,0 +1,330 @@
+"""
+Loads worlds from declarative world files, and compiles them into bundles whose areas are hydrated lazily.
+
+A world file is a JSON object:
+    {
+        "start": "Portal of Azi",
+        "player": "Player",
+        "flags": {"spells": []},
+        "items": [{"name": "Mystery Potion", "desc": "...", "details": "...", "actions": [{"name": "Drink", "precond": null, "action": "drink_potion"}]}],
+        "inventory": ["Mystery Potion"],
+        "areas": [{
+            "name": "Domain of Azi", "desc": "...", "details": "...",
+            "can_enter": "has_staff",
+            "actions": [{"name": "Ring the Bell", "precond": "bell_unrung", "action": "ring_bell"}],
+            "paths": ["Bridge of Azi"],
+            "response_cache": true,
+            "streaming": true,
+            "prompt_budget": 1500,
+            "history_turns": 3,
+            "dynamic": {"name": "Lord Azi's Challenge", "desc": "...", "details": "...", "exit_mission": "..."}
+        }]
+    }
+Paths are one-way, and refer to other areas by their static name. The start defaults to the first area.
+The player name is only used when no player is passed to the loader.
+Preconditions, actions and entry criteria are names of callables registered in the bindings, which are either a dictionary
+or a function that receives the loaded WorldMap and returns a dictionary. A null precondition uses the default precondition.
+"""
+from .action import Action
+from .interface import Interface
+from .player import Player
+from .world_map import Area, Area_Type, WorldMap
+import json
+import mmap
+import struct
+
+BUNDLE_MAGIC = b"MAGWORLD"
+BUNDLE_VERSION = 1
+# Magic, version, area count, and the offsets and lengths of the metadata and name index sections.
+BUNDLE_HEADER = struct.Struct("<8sIIQQQQ")
+# Offset and length of one area record. The table follows the header, in area id order.
+BUNDLE_ENTRY = struct.Struct("<QI")
+
+def encode(data):
+    return json.dumps(data, separators = (",", ":"), ensure_ascii = False)
+
+# Compiles the areas of a world file into records, linked by area id.
+# Returns the metadata, the records in area id order, and the index of area ids by name.
+def compile_world(data):
+    specs = data.get("areas", [])
+    ids = {}
+    for area_id, spec in enumerate(specs):
+        if spec["name"] in ids:
+            raise ValueError(f"Duplicate area name \"{spec['name']}\".")
+        ids[spec["name"]] = area_id
+
+    names = dict(ids)
+    for area_id, spec in enumerate(specs):
+        if "dynamic" in spec:
+            names.setdefault(spec["dynamic"]["name"], area_id)
+
+    records = []
+    for spec in specs:
+        record = {
+            "n": spec["name"],
+            "d": spec.get("desc", ""),
+            "x": spec.get("details", ""),
+            "e": spec.get("can_enter"),
+            "a": [[action["name"], action.get("precond"), action.get("action")] for action in spec.get("actions", [])],
+            "p": [],
+            "q": [] # Names shown for each path before the target area is hydrated.
+        }
+        for target in spec.get("paths", []):
+            if target not in ids:
+                raise ValueError(f"Area \"{spec['name']}\" has a path to unknown area \"{target}\".")
+            target_spec = specs[ids[target]]
+            record["p"].append(ids[target])
+            record["q"].append(target_spec["dynamic"]["name"] if "dynamic" in target_spec else target)
+        if spec.get("response_cache", True) == False:
+            record["r"] = False
+        if spec.get("streaming", True) == False:
+            record["s"] = False
+        if spec.get("prompt_budget") != None or "history_turns" in spec:
+            record["b"] = [spec.get("prompt_budget"), spec.get("history_turns", 3)]
+        if "dynamic" in spec:
+            dynamic = spec["dynamic"]
+            record["y"] = [dynamic["name"], dynamic.get("desc", ""), dynamic.get("details", ""), dynamic.get("exit_mission", "")]
+        records.append(record)
+
+    start = data.get("start")
+    if start != None and start not in ids:
+        raise ValueError(f"Unknown starting area \"{start}\".")
+    meta = {
+        "start": ids[start] if start != None else (0 if len(specs) > 0 else None),
+        "player": data.get("player", "Player"),
+        "flags": data.get("flags", {}),
+        "items": data.get("items", []),
+        "inventory": data.get("inventory", [])
+    }
+    return meta, records, names
+
+# Returns the dictionary of bindings for a world.
+def resolve_bindings(bindings, world):
+    if bindings == None:
+        return {}
+    if callable(bindings):
+        return bindings(world)
+    return bindings
+
+# Returns the callable registered under a name, or the default if the name is None.
+def lookup(bindings, name, default):
+    if name == None:
+        return default
+    if name not in bindings:
+        raise ValueError(f"No callable is registered as \"{name}\".")
+    return bindings[name]
+
+# Defines the items of the world in its catalog, and gives the starting inventory to the player.
+def load_items(world: WorldMap, meta, bindings):
+    for spec in meta["items"]:
+        world.catalog.define(spec["name"], spec.get("desc", ""), spec.get("details", ""))
+        definition = world.catalog.get_definition(spec["name"])
+        for action in spec.get("actions", []):
+            definition.add_item_action(action["name"], lookup(bindings, action.get("precond"), None), lookup(bindings, action.get("action"), Action.default_action_func))
+    for name in meta["inventory"]:
+        item = world.catalog.create(name)
+        if item == None:
+            raise ValueError(f"Unknown inventory item \"{name}\".")
+        world.player.add_item(item)
+
+# Fills in an area from its compiled record. Paths are resolved by area_for, which maps an area id and name to an area.
+# The area is not marked as changed, so that it is only included in snapshots once it is played.
+def apply_record(area: Area, record, bindings, area_for):
+    was_hydrated = area.hydrated
+    previous_name = area.name
+    previous_paths = list(area.paths)
+    area.name = record["n"]
+    area.desc = record["d"]
+    area.details = record["x"]
+    area.can_enter = lookup(bindings, record["e"], Area.default_can_enter)
+    area.custom_actions = []
+    for name, precond, action in record["a"]:
+        area.custom_actions.append(Action(name, lookup(bindings, precond, Action.default_precond_func), lookup(bindings, action, Action.default_action_func)))
+    paths = {}
+    for area_id, name in zip(record["p"], record["q"]):
+        paths[area_for(area_id, name)] = None
+    area.paths = paths
+    area.use_response_cache = record.get("r", True)
+    area.use_streaming = record.get("s", True)
+    area.prompt_budget, area.history_turns = record.get("b", [None, 3])
+    if "y" in record:
+        area.area_type = Area_Type.DYNAMIC
+        area.area_cleared = False
+        area.aftermath_name, area.aftermath_desc, area.aftermath_details = area.name, area.desc, area.details
+        area.name, area.desc, area.details, area.exit_mission = record["y"]
+    area.hydrated = True
+    # Hydrating a stub only fills in what was already implied: its neighbours showed the name of its record, and no route
+    # was built through its empty paths, as routes hydrate every area they pass. So cached routes and menus stay valid.
+    if was_hydrated:
+        if area.name != previous_name:
+            area.renamed()
+        if list(paths) != previous_paths:
+            area.paths_changed()
+
+# Builds every area of a world file into a regular WorldMap.
+def load_world(data, interface: Interface, player: Player = None, bindings = None):
+    meta, records, names = compile_world(data)
+    world = WorldMap(interface, player if player != None else Player(meta["player"]))
+    bindings = resolve_bindings(bindings, world)
+    for record in records:
+        world.add_area(Area(record["n"], record["d"]))
+    for area, record in zip(world.areas, records):
+        apply_record(area, record, bindings, lambda area_id, name: world.areas[area_id])
+    world.reindex()
+    if meta["start"] != None:
+        world.starting_area = world.areas[meta["start"]]
+    world.state.restore_state(meta["flags"])
+    load_items(world, meta, bindings)
+    return world
+
+def load_world_file(path, interface: Interface, player: Player = None, bindings = None):
+    with open(path, encoding = "utf-8") as file:
+        return load_world(json.load(file), interface, player, bindings)
+
+# Compiles a world file into a bundle at the given path.
+# The bundle holds a header, a fixed-width offset table with one entry per area, the area records, the metadata and the name index.
+def compile_bundle(data, path):
+    meta, records, names = compile_world(data)
+    table_size = BUNDLE_ENTRY.size * len(records)
+    offset = BUNDLE_HEADER.size + table_size
+    entries = []
+    blobs = []
+    for record in records:
+        blob = encode(record).encode("utf-8")
+        entries.append(BUNDLE_ENTRY.pack(offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    meta_blob = encode(meta).encode("utf-8")
+    names_blob = encode(names).encode("utf-8")
+    names_offset = offset + len(meta_blob)
+    with open(path, "wb") as file:
+        file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(records), offset, len(meta_blob), names_offset, len(names_blob)))
+        file.write(b"".join(entries))
+        file.write(b"".join(blobs))
+        file.write(meta_blob)
+        file.write(names_blob)
+
+def compile_bundle_file(world_path, bundle_path):
+    with open(world_path, encoding = "utf-8") as file:
+        compile_bundle(json.load(file), bundle_path)
+
+class WorldBundle:
+    """
+    A compiled world bundle, memory-mapped rather than read. Only the header is decoded when it is opened.
+    Bundles are never modified, so one bundle can back many BundleWorldMaps at once, such as every session of a GameServer.
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.count, self.meta_offset, self.meta_length, self.names_offset, self.names_length = BUNDLE_HEADER.unpack_from(self.buffer, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self.close()
+            raise ValueError(f"\"{path}\" is not a version {BUNDLE_VERSION} world bundle.")
+        self.name_index = None # Area ids by name, decoded on the first lookup by name.
+
+    # Decodes the metadata. Every call returns a fresh copy, so that worlds sharing the bundle do not share their flags.
+    def meta(self):
+        return json.loads(self.buffer[self.meta_offset:self.meta_offset + self.meta_length])
+
+    def read_record(self, area_id):
+        offset, length = BUNDLE_ENTRY.unpack_from(self.buffer, BUNDLE_HEADER.size + BUNDLE_ENTRY.size * area_id)
+        return json.loads(self.buffer[offset:offset + length])
+
+    def names(self):
+        if self.name_index == None:
+            self.name_index = json.loads(self.buffer[self.names_offset:self.names_offset + self.names_length])
+        return self.name_index
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+class BundleWorldMap(WorldMap):
+    """
+    A world map backed by a compiled bundle, given as a path or as an open WorldBundle shared with other worlds.
+    Only the metadata is decoded at startup. Areas are created as named stubs when a neighbouring area is hydrated,
+    and are hydrated from their record on first navigate() or enter_area(). The name index is decoded on the first lookup by name.
+    The areas dictionary only holds the areas created so far, keyed by id, so a world only takes memory for the areas it has used.
+    """
+    def __init__(self, bundle, interface: Interface, player: Player = None, bindings = None):
+        self.owns_bundle = not isinstance(bundle, WorldBundle) # Bundles opened from a path are closed with the world.
+        bundle = WorldBundle(bundle) if self.owns_bundle else bundle
+        meta = bundle.meta()
+
+        super().__init__(interface, player if player != None else Player(meta["player"]))
+        self.bundle = bundle
+        self.areas = {}
+        self.added_areas = 0 # Number of areas added with add_area, rather than created from the bundle.
+        self.bindings = resolve_bindings(bindings, self)
+        self.state.restore_state(meta["flags"])
+        load_items(self, meta, self.bindings)
+        if meta["start"] != None:
+            self.starting_area = self.area_for(meta["start"])
+
+    # Returns the area with the given id, creating it if needed.
+    # Areas created with a name are stubs until hydrated. Areas created without one are hydrated immediately.
+    def area_for(self, area_id, name = None):
+        area = self.areas.get(area_id)
+        if area == None:
+            area = Area(name if name != None else "", "")
+            area.area_id = area_id
+            area.world = self
+            area.hydrated = False
+            area.set_interface(self.interface)
+            self.areas[area_id] = area
+            if name == None:
+                self.hydrate_area(area)
+        return area
+
+    # The type of an area that has not been hydrated is read from its record, as it cannot have changed yet.
+    def is_dynamic(self, area: Area):
+        if not area.hydrated:
+            return "y" in self.bundle.read_record(area.area_id)
+        return super().is_dynamic(area)
+
+    # Areas added with add_area take the ids after the bundle's areas, so that they never collide with the areas of the bundle.
+    def store_area(self, area: Area):
+        area.area_id = self.bundle.count + self.added_areas
+        self.added_areas += 1
+        self.areas[area.area_id] = area
+
+    def hydrate_area(self, area: Area):
+        if area.hydrated:
+            return
+        apply_record(area, self.bundle.read_record(area.area_id), self.bindings, self.area_for)
+        self.index_area(area)
+
+    # Only created areas are indexed. Other areas are found through the bundle's name index.
+    def reindex(self):
+        self.area_names = {}
+        for area in self.areas.values():
+            if area.hydrated:
+                self.index_area(area)
+
+    def get_area(self, key):
+        if isinstance(key, int):
+            if key in self.areas:
+                return self.areas[key]
+            return self.area_for(key) if 0 <= key < self.bundle.count else False
+        area = super().get_area(key)
+        if area == False and isinstance(key, str):
+            area_id = self.bundle.names().get(key)
+            if area_id != None:
+                area = self.area_for(area_id)
+                # The area may have been renamed since the bundle was compiled.
+                if area.name != key and getattr(area, "aftermath_name", None) != key:
+                    return False
+        return area
+
+    # Releases the memory map, unless the bundle is shared with other worlds. Areas that are already hydrated remain usable.
+    def close(self):
+        if self.owns_bundle:
+            self.bundle.close()
+
+def load_bundle(path, interface: Interface, player: Player = None, bindings = None):
+    return BundleWorldMap(path, interface, player, bindings)
+
+# Returns a world factory, called as factory(interface) like the factories of the simulation, that loads every world from one shared bundle.
+# Each world only holds the areas it has used, its own player and its own flags.
+def bundle_world_factory(bundle: WorldBundle, bindings = None):
+    return lambda interface: BundleWorldMap(bundle, interface, bindings = bindings)
@@ -1,315 +1,928 @@
-from .interface import Interface
-from .action import Action
-from .player import Player
-from enum import Enum
-import string
-
-class Area_Type(Enum):
-    STATIC = 0 # Fixed Planning
-    DYNAMIC = 1 # AI-Backed Planning
-
-class Area:
-    """
-    The Area class is an abstraction of a node for the world map.
-    It provides area-specific methods for controlling interactions within the area.
-
-    STATIC SCENARIO:
-    Players have access to multiple set options.
-    The description is an initial description of the area.
-    The details are only reviewed upon inspecting the area.
-
-    DYNAMIC SCENARIO:
-    Players can use any option.
-    Success depends on an AI evaluation model.
-    The description is an initial description of the scenario. Be heavily detailed, as it will be fed into the AI.
-    The details are static guidelines for the AI that are not visible to the player. Be heavily detailed, and feel free to break immersion.
-    The exit mission states how to leave the scenario. By heavily detailed/specific, as it will be fed into the AI.
-    The area converts into a static scenario once the dynamic scenario is over.
-    """
-
-    def default_can_enter():
-        return True
-    
-    def __init__(self, name: string, desc: string, details = "", can_enter = default_can_enter):
-        # Should refer directly to area objects.
-        self.paths = [] # List of areas that the player could traverse to.
-        self.area_type = Area_Type.STATIC # Area Type, determines how encounters occur.
-        self.name = name # Name of the area.
-        self.desc = desc # General description of the area.
-        self.details = details # More details upon using inspect.
-        self.can_enter = can_enter # Criteria to check whether the player can enter or not.
-
-        self.force_action = False # Forces the player to trigger a specific action upon entry.
-        self.custom_actions = [] # Used in static areas, or the aftermath of a dynamic scenario.
-    
-        self.area_cleared = True # Stores whether the player can leave or not.
-
-        self.interface = Interface()
-
-    # Previous constructor specifies the aftermath of the dynamic scenario.
-    def init_DYNAMIC(self, name: string, desc: string, details = "", exit_mission = ""):
-        self.area_type = Area_Type.DYNAMIC
-        self.area_cleared = False
-
-        # Uploads a copy of the static scenario properties, will restore later once the dynamic scenario is over.
-        self.aftermath_name = self.name
-        self.aftermath_desc = self.desc
-        self.aftermath_details = self.details
-
-        self.name = name # Name of the area.
-        self.desc = desc # Description of the initial scenario.
-        self.details = details # Hidden details for AI, including output guidelines and world rules.
-        self.exit_mission = exit_mission # Criteria to leave the scenario.
-    
-    def set_interface(self, interface: Interface):
-        # Overrides the instance of the interface with the provided one.
-        # Used to gain access to the OpenAI API via an interface that the player already logged into.
-        self.interface = interface
-
-    def get_name(self):
-        return self.name
-    
-    def get_desc(self):
-        return self.desc
-
-    def set_name(self, new_name: string):
-        self.name = new_name
-
-    def set_desc(self, new_desc: string):
-        self.desc = new_desc
-
-    def set_entry_criteria(self, can_enter = default_can_enter):
-        self.can_enter = can_enter
-
-    # Used exclusively for dynamic areas. Long string to be fed into an AI model for evaluation.
-    def set_exit_mission(self, exit_mission):
-        self.exit_mission = exit_mission
-
-    # Returns all paths.
-    def get_paths(self):
-        return self.paths
-    
-    # Creates a path towards another area.
-    # Returns True upon successful creation, False if the path already exists.
-    def create_path(self, new_area):
-        if not (new_area in self.paths):
-            self.paths.append(new_area)
-            return True
-        return False
-    
-    # Creates a path towards another area, and creates a path from that area back to the current area.
-    # No return values.
-    def create_2way_path(self, new_area):
-        self.create_path(new_area)
-        new_area.create_path(self)
-
-    # Removes a path to another area.
-    # Returns True upon successful removal, False if the specified path was not found.
-    def remove_path(self, target_area):
-        if target_area in self.paths:
-            self.paths.remove(target_area)
-            return True
-        return False
-    
-    # Removes a path towards another area, and removes a path from that area back to the current area.
-    # No return values.
-    def remove_2way_path(self, target_area):
-        self.remove_path(target_area)
-        target_area.remove_path(self)
-
-    # Use None to use the default preconditions function.
-    # Actions only apply to static scenarios or dynamic scenario aftermaths.
-    def add_area_action(self, action_name = "Mysterious Action", precond_func = Action.default_precond_func, action_func = Action.default_action_func):
-        if precond_func == None:
-            self.custom_actions.append(Action(action_name, Action.default_precond_func, action_func))
-        else:
-            self.custom_actions.append(Action(action_name, precond_func, action_func))
-    
-    # action_name is the search term for removing these actions.
-    # Returns true upon a successful removal, else returns false.
-    def remove_area_action(self, action_name: string):
-        for action in self.custom_actions:
-            if action.get_name() == action_name:
-                self.custom_actions.remove(action)
-                return True
-        return False   
-
-    # Prompts the player for a list of possible options, or triggers the dynamic scenario depending on the area type.
-    # Returns the resulting area from the sequence of actions.
-    def area_actions(self, player: Player):
-        if Area_Type(self.area_type) == Area_Type.STATIC:
-            options_list = ["Navigate to Area", "Inspect Current Area", "Open Inventory"]
-            for action in self.custom_actions:
-                options_list.append(action.get_name())
-            option = self.interface.get_multiple_choice_response(options_list)
-            if option == 0:
-                self.interface.narrate("\n[ Navigate ] You look around for areas to explore.")
-                area = self.navigate()
-                # Verifies that leaving the area was successful.
-                if bool(area) != False:
-                    # Verifies that entering the target area was successful.
-                    if area.enter_area() == True:
-                        return area
-            elif option == 1:
-                self.inspect()
-            elif option == 2:
-                player.inventory_actions()
-            else:
-                # Calls a custom action.
-                self.custom_actions[option - 3].run_action()
-            # Ensures that the character stays in the current area.
-            return self
-        elif Area_Type(self.area_type) == Area_Type.DYNAMIC:
-            previous_scenario = "No event has occured previously yet."
-            current_scenario = self.desc
-            scenario_over = False
-            game_over = False
-            system_prompt = "Evaluate the proposed actions of the player within the context of the current scenario and determine whether it is plausible, given the player's current capabilities and equipment."
-            system_prompt += "\nThe player can only dictate the actions of themselves. Ignore any narrations within the \"Player's Actions\" section that dictate the world state or the state of other characters asides from the player"
-            system_prompt += "\nIf the actions are plausible, then generate a description about the state of the player and the effects of the player's actions."
-            system_prompt += "\nIf the actions are not plausible, then generate a description about the state of the player and their failed attempt at conducting such actions."
-            system_prompt += "\nActions are automatically considered not plausible if they would take more than 10 seconds to conduct the action. In this case, truncate the recognized response, and clearly state that the rest of the actions could not be performed due to a time constraint."
-            system_prompt += "\nThen, generate plausible actions from all other characters involved in the scenario asides from the player. Follow the rules provided in the scenario for expected results and restrictions about the game world."
-            system_prompt += "\nIn any combat scenario, it is expected for these other characters to prepare to use an attack. If the character has already made preparations during the previous output, then attempt the action."
-            system_prompt += "\nIf the player fails to interrupt the preparations for an attack and fails to directly counter the attack itself, then inflict damage on the player. Do not immediately kill the player if they are not in a weakened state."
-            system_prompt += "\nExit Mission: \"{self.exit_mission}\". Consider the scenario to be over when the exit mission has been satisfied, and scenario_over should be updated accordingly."
-            system_prompt += "\nFor context, the player is a mage from a fantasy world. All powerful magical attacks need to be charged for one turn, and they are considered ready if the previous output indicates that a charge has already been complete."
-            system_prompt += "\nIf a charged attack is unused, output that the attack remains charged and is ready for use during the next turn. Similarly, enemies can also charge powerful attacks, but they can also use powerful physical attacks."
-            system_prompt += "\nAttempts at charging powerful attacks may be interrupted by the actions of other entities, such as using an attack. Losing focus is not a valid reason; the action should physically interrupt the charge in some way. This applies to both the player and their enemies."
-            system_prompt += "\nThe player is considered dead if they have sustained a powerful attack followed by any attack, or if they sustain multiple consecutive normal attacks. Refer to the player's physical health information, and degrade it accordingly with every instance of damage."
-            system_prompt += "\nAny character is considered dead if they have passed, fallen, died, been killed, been slain, withered away, etc. Evaluate for whether the exit mission has been satisfied if any death is mentioned."
-            system_prompt += "\nNobody is invincible. Other characters should grow weaker from exhaustion as the number of turns continue. If the turn number is greater than 15, then all non-player characters in the scenario should have significantly lower defense, and be more vulnerable to all attacks. Do not state this explicitly."
-            system_prompt += "\nDo not create any new characters within the scenario, unless it is a direct result of an explicit summon, such as using a spell to raise undead creatures."
-            system_prompt += "\nDo not create any new lines or use any tabs in any output."
-            turn = 0 # Tracks the number of turns.
-            # Loops until the scenario ends or the game ends.
-            while scenario_over == False and game_over == False:
-                turn += 1
-                # Constructs a string representation of the inventory
-                inventory_list = []
-                for item in player.inventory:
-                    inventory_list.append(item.get_name())
-
-                # Output current information, prompt model with new information.
-                self.interface.narrate(f"[ Description ] {current_scenario}")
-                response = self.interface.get_free_response("The player is now allowed to make a move. Attempt an action.")
-                user_prompt = f"Scenario:\n{current_scenario}\n{self.details}\n\nPlayer's Actions:\n{response}\n\nPlayer's Inventory:\n{inventory_list}\n\nPlayer's State:\n{player.player_state}\n\nPrevious Output:\n{previous_scenario}\n\nTurn Number:\n{turn}"
-                results = self.interface.evaluate_actions(user_prompt, system_prompt)
-
-                # Process Results
-                previous_scenario = current_scenario
-                current_scenario = results["text_output"]
-                scenario_over = results["scenario_over"]
-                game_over = results["game_over"]
-
-                # Process Player Inventory Changes
-                # Only account for removing items, not adding items.
-                inventory_list = results["new_player_state"]["inventory"]
-                for item in player.inventory:
-                    if not item.get_name() in inventory_list: 
-                        player.remove_item(item)
-
-                # Process Player State Changes
-                player.update_player_state("physical_state", results["new_player_state"]["physical_state"])
-                player.update_player_state("mental_state", results["new_player_state"]["mental_state"])
-
-                self.interface.narrate(f"[ DEBUG ] Player's State: {player.player_state}")
-                self.interface.narrate(f"[ DEBUG ] Player's Inventory: {player.player_state}")
-
-            # Narrate the conclusion of the scenario.
-            self.interface.narrate(f"[ Description ] {current_scenario}")
-
-            # Check for game over state.
-            if game_over == True:
-                self.interface.narrate("[ Game Over ] The player has died.")
-                exit()
-            # Scenario is over. Trigger static options.
-            self.area_type = Area_Type.STATIC
-            
-            # Updates area with aftermath details.
-            self.name = self.aftermath_name
-            self.desc = self.aftermath_desc
-            self.details = self.aftermath_details
-
-            # Prints the aftermath.
-            self.interface.narrate(f"\n[ Pass ] The scenario has been cleared.")
-            self.interface.narrate(f"\nNow Watching {self.name}")
-            self.interface.narrate(f"[ Description ] {self.desc}")
-
-            # Recursive call to trigger the area's static actions.
-            return self.area_actions(player)
-        else:
-            return self
-    
-    # Prompts the player to navigate to an area.
-    # Returns the area that the player traversed to, False if there are no paths to traverse or if traversal is blocked.
-    def navigate(self):
-        if len(self.paths) > 0:
-            if self.area_cleared == True:
-                options_list = ["Stay Here"]
-                for area in self.paths:
-                    options_list.append(area.get_name())
-                option = self.interface.get_multiple_choice_response(options_list)
-                # Triggers the "stay" action.
-                if option == 0:
-                    return False
-                return self.paths[option - 1]
-            else:
-                self.interface.narrate("\n[ Block ] This area has not been cleared. You cannot leave.")
-                return False
-        self.interface.narrate("\n[ Block ] Dead end. You cannot leave.")
-        return False
-    
-    # Shows more details about the area.
-    def inspect(self):
-        if self.details != "":
-            self.interface.narrate(f"\n[ Inspect ] {self.details}")
-        else:
-            self.interface.narrate("\n[ Inspect ] There isn't anything notable to inspect.")
-    
-    # Returns whether entry was successful or not.
-    def enter_area(self):
-        if self.can_enter() == True:
-            self.interface.narrate(f"\nEntering {self.name}")
-            if Area_Type(self.area_type) != Area_Type.DYNAMIC:
-                self.interface.narrate(f"[ Description ] {self.desc}")
-            return True
-        self.interface.narrate(f"\n[ Block ] You are unable to enter \"{self.name}\".")
-        return False
-
-class WorldMap:
-    """
-    The World Map is responsible for storing all areas, and traversing through areas.
-    Contains a reference to the player, as this is the actual interface for playing the game.
-    """
-    def __init__(self, interface: Interface, player: Player):
-        self.areas = [] # Stores a list of all areas within the current world map.
-        self.starting_area = False
-        self.current_area = False
-        self.interface = interface
-        self.player = player
-
-    # Gets the current area. Returns False if no current area exists.
-    def get_current_area(self):
-        return self.current_area
-
-    # Adds an area to the world map.
-    # The first area added becomes the starting area.
-    def add_area(self, new_area: Area):
-        if len(self.areas) == 0:
-            self.starting_area = new_area
-        self.areas.append(new_area)
-        # Adds the imported interface with OpenAI access into the area.
-        new_area.set_interface(self.interface)
-    
-    # Resets the current area to the starting area, and returns the starting area. Returns False if no starting area exists.
-    def start(self):
-        self.current_area = self.starting_area
-        if self.starting_area != False:
-            self.starting_area.enter_area()
-        return self.starting_area
-    
-    # Triggers the actions of the current area. Automatically updates if it results in traversing to a new area.
-    def act(self):
-        if self.current_area != False:
-            self.current_area = self.current_area.area_actions(self.player)
+from .interface import Interface, get_default_interface
+from .action import Action
+from .item import ItemCatalog
+from .player import Player
+from .history import TurnHistory
+from .prompt import CompiledPrompt
+from .prefetch import Prefetcher
+from .fastpath import FastPathResolver
+from .ticker import WorldTicker
+from .schema import ActionResult, OutputError
+from .state import ActionMenu, GameState, StatePrecondition
+from enum import Enum
+import string
+
+class Area_Type(Enum):
+    STATIC = 0 # Fixed Planning
+    DYNAMIC = 1 # AI-Backed Planning
+
+# Action of the background turns of a scenario that the player is not in. See Area.tick_async.
+OFFSCREEN_ACTION = "The player is elsewhere. No one acts on their behalf, and time passes."
+
+class ScenarioProgress:
+    """
+    The progress of a dynamic scenario that is under way, kept on the area so that it can be saved and resumed.
+    """
+    __slots__ = ("turn", "current_scenario", "previous_scenario", "history")
+
+    def __init__(self, turn = 0, current_scenario = "", previous_scenario = "No event has occured previously yet.", history = None):
+        self.turn = turn # Number of turns evaluated so far.
+        self.current_scenario = current_scenario
+        self.previous_scenario = previous_scenario
+        self.history = history if history != None else TurnHistory() # Turns evaluated so far, within a bounded size.
+
+class Area:
+    """
+    The Area class is an abstraction of a node for the world map.
+    It provides area-specific methods for controlling interactions within the area.
+
+    STATIC SCENARIO:
+    Players have access to multiple set options.
+    The description is an initial description of the area.
+    The details are only reviewed upon inspecting the area.
+
+    DYNAMIC SCENARIO:
+    Players can use any option.
+    Success depends on an AI evaluation model.
+    The description is an initial description of the scenario. Be heavily detailed, as it will be fed into the AI.
+    The details are static guidelines for the AI that are not visible to the player. Be heavily detailed, and feel free to break immersion.
+    The exit mission states how to leave the scenario. By heavily detailed/specific, as it will be fed into the AI.
+    The area converts into a static scenario once the dynamic scenario is over.
+    """
+    __slots__ = ("paths", "area_type", "name", "desc", "details", "can_enter", "force_action", "custom_actions", "action_menu", "path_menu", "area_cleared",
+                 "use_response_cache", "use_streaming", "fast_path_rules", "prompt_budget", "history_turns", "compiled_prompt", "scene_entities", "tick_budget", "area_id", "world", "scenario_progress", "hydrated", "interface",
+                 "aftermath_name", "aftermath_desc", "aftermath_details", "exit_mission")
+
+    def default_can_enter():
+        return True
+    
+    def __init__(self, name: string, desc: string, details = "", can_enter = default_can_enter):
+        # Should refer directly to area objects.
+        self.paths = {} # Areas that the player could traverse to. Used as an ordered set, so menus keep the creation order.
+        self.area_type = Area_Type.STATIC # Area Type, determines how encounters occur.
+        self.name = name # Name of the area.
+        self.desc = desc # General description of the area.
+        self.details = details # More details upon using inspect.
+        self.can_enter = can_enter # Criteria to check whether the player can enter or not.
+
+        self.force_action = False # Forces the player to trigger a specific action upon entry.
+        self.custom_actions = [] # Used in static areas, or the aftermath of a dynamic scenario.
+        self.action_menu = None # Cached menu of the custom actions, created on first use.
+        self.path_menu = None # Cached navigation menu, as (epochs, paths, options).
+    
+        self.area_cleared = True # Stores whether the player can leave or not.
+        self.use_response_cache = True # Whether dynamic turns may reuse cached evaluations.
+        self.use_streaming = True # Whether dynamic turns narrate the evaluation while it is still being generated.
+        self.fast_path_rules = None # Rules that decide dynamic turns of this area locally, tried before the world's rules, or None.
+        self.prompt_budget = None # Maximum estimated tokens per dynamic prompt, or None for no limit.
+        self.history_turns = 3 # Number of recent dynamic turns kept verbatim in prompts. Older turns are summarized.
+        self.compiled_prompt = None # Static prompt prefix of the dynamic scenario, built on first use.
+        self.scene_entities = None # Names and descriptions of the entities whose reactions are evaluated in their own calls, or None. See set_fan_out.
+        self.tick_budget = 0 # Number of turns the dynamic scenario may still advance on its own while the player is elsewhere.
+
+        self.area_id = None # Index of the area within its world map, assigned by WorldMap.add_area.
+        self.world = None # World map that the area was added to.
+        self.scenario_progress = None # Progress of the dynamic scenario while it is under way.
+        self.hydrated = True # False for named stubs of a compiled world bundle, until first use.
+
+        self.interface = get_default_interface() # Replaced by the world's interface in WorldMap.add_area.
+
+    # Previous constructor specifies the aftermath of the dynamic scenario.
+    def init_DYNAMIC(self, name: string, desc: string, details = "", exit_mission = ""):
+        self.touched()
+        self.area_type = Area_Type.DYNAMIC
+        self.area_cleared = False
+
+        # Uploads a copy of the static scenario properties, will restore later once the dynamic scenario is over.
+        self.aftermath_name = self.name
+        self.aftermath_desc = self.desc
+        self.aftermath_details = self.details
+
+        self.name = name # Name of the area.
+        self.renamed()
+        self.desc = desc # Description of the initial scenario.
+        self.details = details # Hidden details for AI, including output guidelines and world rules.
+        self.exit_mission = exit_mission # Criteria to leave the scenario.
+    
+    def set_interface(self, interface: Interface):
+        # Overrides the instance of the interface with the provided one.
+        # Used to gain access to the OpenAI API via an interface that the player already logged into.
+        self.interface = interface
+
+    def get_name(self):
+        return self.name
+    
+    def get_desc(self):
+        return self.desc
+
+    def set_name(self, new_name: string):
+        self.touched()
+        self.name = new_name
+        self.renamed()
+
+    def set_desc(self, new_desc: string):
+        self.touched()
+        self.desc = new_desc
+
+    def set_entry_criteria(self, can_enter = default_can_enter):
+        self.can_enter = can_enter
+
+    # Used exclusively for dynamic areas. Long string to be fed into an AI model for evaluation.
+    def set_exit_mission(self, exit_mission):
+        self.touched()
+        self.exit_mission = exit_mission
+
+    # Used exclusively for dynamic areas. Disable for scenarios that need fresh randomness on identical turns.
+    def set_response_cache(self, enabled: bool):
+        self.use_response_cache = enabled
+
+    # Used exclusively for dynamic areas. Disable to narrate each turn only once its evaluation is complete.
+    def set_streaming(self, enabled: bool):
+        self.use_streaming = enabled
+
+    # Used exclusively for dynamic areas. Adds a rule that decides turns locally instead of evaluating them. See FastPathResolver.
+    def add_fast_path_rule(self, rule):
+        if self.fast_path_rules == None:
+            self.fast_path_rules = []
+        self.fast_path_rules.append(rule)
+
+    # Used exclusively for dynamic areas. Limits the estimated tokens of every prompt, and sets how many recent turns are kept verbatim.
+    # Use None for no limit. See CompiledPrompt for how prompts are shortened to fit.
+    def set_prompt_budget(self, token_budget, history_turns = 3):
+        self.prompt_budget = token_budget
+        self.history_turns = history_turns
+
+    # Used exclusively for dynamic areas. Splits every evaluated turn into a call resolving the player's actions, and one call per entity
+    # for its reaction, all issued at once and merged locally, so that large scenes are not narrated in one long completion.
+    # Entities map names to short descriptions. Use None or an empty mapping to evaluate each turn in a single call.
+    def set_fan_out(self, entities):
+        self.scene_entities = dict(entities) if entities else None
+
+    # Used exclusively for dynamic areas. Sets how many turns the scenario may advance on its own while the player is elsewhere.
+    # Background turns only run once the world has enabled them with WorldMap.set_world_ticks. See WorldTicker.
+    def set_tick_budget(self, ticks):
+        self.tick_budget = ticks
+        if self.world != None:
+            self.world.ticker.watch(self)
+
+    # Used exclusively for dynamic areas. Returns the compiled prompts of the scenario.
+    # The static prefix is only rebuilt if the exit mission, details or budget have changed since it was compiled.
+    def get_compiled_prompt(self):
+        if self.compiled_prompt == None or not self.compiled_prompt.matches(self.exit_mission, self.details, self.prompt_budget):
+            self.compiled_prompt = CompiledPrompt(self.exit_mission, self.details, self.prompt_budget)
+        return self.compiled_prompt
+
+    # Areas of a compiled world bundle start as named stubs, and are hydrated by their world on first use.
+    def ensure_hydrated(self):
+        if not self.hydrated:
+            self.world.hydrate_area(self)
+
+    # Returns the dynamic areas that the player could move to from this area, such as for prefetching.
+    # None are returned while this area is itself a dynamic scenario, as it cannot be left until cleared.
+    # Only the dynamic areas are hydrated, as the world can tell the type of the others without hydrating them.
+    def adjacent_dynamic_areas(self):
+        self.ensure_hydrated()
+        if Area_Type(self.area_type) == Area_Type.DYNAMIC:
+            return []
+        adjacent = []
+        for area in self.paths:
+            dynamic = area.world.is_dynamic(area) if area.world != None else Area_Type(area.area_type) == Area_Type.DYNAMIC
+            if dynamic:
+                area.ensure_hydrated()
+                adjacent.append(area)
+        return adjacent
+
+    # Invalidates the cached routes and navigation menus of the area's world, after a path of the area was created or removed.
+    # Other worlds, such as the sessions of a game server, keep their caches.
+    def paths_changed(self):
+        if self.world != None:
+            self.world.path_epoch += 1
+
+    # Invalidates the cached navigation menus of the area's world, after the area was renamed.
+    def renamed(self):
+        if self.world != None:
+            self.world.name_epoch += 1
+
+    # Marks the area as changed, so that snapshots of its world include it.
+    def touched(self):
+        if self.world != None:
+            self.world.dirty_areas.add(self.area_id)
+
+    # Returns the mutable state of the area in a compact, JSON-compatible form.
+    # Custom actions are saved by name, and paths by area id.
+    def capture_state(self):
+        state = {
+            "t": self.area_type.value,
+            "n": self.name,
+            "d": self.desc,
+            "x": self.details,
+            "c": self.area_cleared,
+            "a": [action.get_name() for action in self.custom_actions],
+            "p": [area.area_id for area in self.paths if area.area_id != None]
+        }
+        if Area_Type(self.area_type) == Area_Type.DYNAMIC:
+            state["m"] = self.exit_mission
+            state["f"] = [self.aftermath_name, self.aftermath_desc, self.aftermath_details]
+            state["k"] = self.tick_budget
+        if self.scenario_progress != None:
+            progress = self.scenario_progress
+            state["s"] = [progress.turn, progress.current_scenario, progress.previous_scenario, progress.history.capture_state()]
+        return state
+
+    # Applies a state returned by capture_state.
+    # Custom actions can only be restored if the area still has them, as their functions are not saved.
+    def restore_state(self, state, world):
+        self.area_type = Area_Type(state["t"])
+        if self.name != state["n"]:
+            self.name = state["n"]
+            self.renamed()
+        self.desc = state["d"]
+        self.details = state["x"]
+        self.area_cleared = state["c"]
+        actions = {}
+        for action in self.custom_actions:
+            actions[action.get_name()] = action
+        self.custom_actions = [actions[name] for name in state["a"] if name in actions]
+        paths = {}
+        for area_id in state["p"]:
+            paths[world.get_area(area_id)] = None
+        if list(paths) != list(self.paths):
+            self.paths = paths
+            self.paths_changed()
+        if "m" in state:
+            self.exit_mission = state["m"]
+            self.aftermath_name, self.aftermath_desc, self.aftermath_details = state["f"]
+            self.tick_budget = state.get("k", self.tick_budget)
+        self.scenario_progress = None
+        if "s" in state:
+            self.scenario_progress = ScenarioProgress(*state["s"][:3], history = TurnHistory(self.history_turns))
+            if len(state["s"]) > 3:
+                self.scenario_progress.history.restore_state(state["s"][3])
+
+    # Returns all paths, in creation order.
+    def get_paths(self):
+        return list(self.paths)
+
+    # Returns whether a path towards the area exists.
+    def has_path(self, area):
+        return area in self.paths
+    
+    # Creates a path towards another area.
+    # Returns True upon successful creation, False if the path already exists.
+    def create_path(self, new_area):
+        if not (new_area in self.paths):
+            self.paths[new_area] = None
+            self.paths_changed()
+            self.touched()
+            return True
+        return False
+    
+    # Creates a path towards another area, and creates a path from that area back to the current area.
+    # No return values.
+    def create_2way_path(self, new_area):
+        self.create_path(new_area)
+        new_area.create_path(self)
+
+    # Removes a path to another area.
+    # Returns True upon successful removal, False if the specified path was not found.
+    def remove_path(self, target_area):
+        if target_area in self.paths:
+            del self.paths[target_area]
+            self.paths_changed()
+            self.touched()
+            return True
+        return False
+    
+    # Removes a path towards another area, and removes a path from that area back to the current area.
+    # No return values.
+    def remove_2way_path(self, target_area):
+        self.remove_path(target_area)
+        target_area.remove_path(self)
+
+    # Use None to use the default preconditions function.
+    # Actions only apply to static scenarios or dynamic scenario aftermaths.
+    def add_area_action(self, action_name = "Mysterious Action", precond_func = Action.default_precond_func, action_func = Action.default_action_func):
+        self.touched()
+        if precond_func == None:
+            self.custom_actions.append(Action(action_name, Action.default_precond_func, action_func))
+        else:
+            self.custom_actions.append(Action(action_name, precond_func, action_func))
+        if self.action_menu != None:
+            self.action_menu.reset()
+    
+    # action_name is the search term for removing these actions.
+    # Returns true upon a successful removal, else returns false.
+    def remove_area_action(self, action_name: string):
+        for action in self.custom_actions:
+            if action.get_name() == action_name:
+                self.custom_actions.remove(action)
+                self.touched()
+                if self.action_menu != None:
+                    self.action_menu.reset()
+                return True
+        return False   
+
+    # Returns the custom actions offered in the static menu, and the options of the menu. See ActionMenu.
+    def menu_options(self):
+        if self.action_menu == None:
+            self.action_menu = ActionMenu(["Navigate to Area", "Inspect Current Area", "Open Inventory"])
+        return self.action_menu.build(self.custom_actions)
+
+    # Returns the paths in creation order, and the options of the navigation menu.
+    # Both are kept until any path of the world is created or removed, or any of its areas is renamed.
+    # Areas that have not been added to a world rebuild them every time.
+    def path_options(self):
+        epochs = (self.world.path_epoch, self.world.name_epoch) if self.world != None else None
+        if epochs == None or self.path_menu == None or self.path_menu[0] != epochs:
+            paths = list(self.paths)
+            self.path_menu = (epochs, paths, ["Stay Here"] + [area.get_name() for area in paths])
+        return self.path_menu[1], self.path_menu[2]
+
+    # Prompts the player for a list of possible options, or triggers the dynamic scenario depending on the area type.
+    # Returns the resulting area from the sequence of actions.
+    # Actions whose precondition is a StatePrecondition are only offered while it holds.
+    def area_actions(self, player: Player):
+        if Area_Type(self.area_type) == Area_Type.STATIC:
+            actions, options_list = self.menu_options()
+            with self.interface.tracer.span("input.choice"):
+                option = self.interface.get_multiple_choice_response(options_list)
+            if option == 0:
+                self.interface.narrate("\n[ Navigate ] You look around for areas to explore.")
+                with self.interface.tracer.span("navigate", area = self.name):
+                    area = self.navigate()
+                # Verifies that leaving the area was successful.
+                if bool(area) != False:
+                    # Verifies that entering the target area was successful.
+                    if area.enter_area() == True:
+                        return area
+            elif option == 1:
+                self.inspect()
+            elif option == 2:
+                player.inventory_actions()
+            else:
+                # Calls a custom action.
+                action = actions[option - 3]
+                with self.interface.tracer.span("action", action = action.get_name(), area = self.name):
+                    action.run_action()
+            # Ensures that the character stays in the current area.
+            return self
+        elif Area_Type(self.area_type) == Area_Type.DYNAMIC:
+            self.interface.run_sync(self.dynamic_actions_async(player))
+
+            # Recursive call to trigger the area's static actions.
+            return self.area_actions(player)
+        else:
+            return self
+    
+    # Async version of area_actions.
+    # The dynamic scenario is evaluated on the event loop. Static menus also run on it if the interface's prompts are awaited,
+    # such as for network sessions, and otherwise block on player input and run off of it.
+    async def area_actions_async(self, player: Player):
+        if Area_Type(self.area_type) == Area_Type.DYNAMIC:
+            await self.dynamic_actions_async(player)
+        if self.interface.blocking_input:
+            import asyncio
+            return await asyncio.to_thread(self.area_actions, player)
+        return await self.static_actions_async(player)
+
+    # Async version of the static menu of area_actions, for interfaces whose prompts do not block.
+    # Custom actions are plain functions, so they are still called directly.
+    async def static_actions_async(self, player: Player):
+        actions, options_list = self.menu_options()
+        with self.interface.tracer.span("input.choice"):
+            option = await self.interface.get_multiple_choice_response_async(options_list)
+        if option == 0:
+            self.interface.narrate("\n[ Navigate ] You look around for areas to explore.")
+            with self.interface.tracer.span("navigate", area = self.name):
+                area = await self.navigate_async()
+            if bool(area) != False:
+                if area.enter_area() == True:
+                    return area
+        elif option == 1:
+            self.inspect()
+        elif option == 2:
+            await player.inventory_actions_async()
+        else:
+            action = actions[option - 3]
+            with self.interface.tracer.span("action", action = action.get_name(), area = self.name):
+                action.run_action()
+        return self
+
+    # Runs the dynamic scenario until it is cleared, then converts the area into its static aftermath.
+    # Player input and model evaluations are awaited, so other turns can progress on the same event loop.
+    # A scenario restored from a snapshot resumes from its saved turn.
+    # With streaming, each outcome is narrated as it is generated, and the rest of the results are applied once complete.
+    # Prompts carry the turn history of the scenario, kept within the prompt budget of the area.
+    # Turns that the world's FastPathResolver can decide are answered locally, and only the rest are evaluated.
+    async def dynamic_actions_async(self, player: Player):
+        from .backends import BackendError
+        if self.scenario_progress == None:
+            self.scenario_progress = ScenarioProgress(current_scenario = self.desc, history = TurnHistory(self.history_turns))
+        progress = self.scenario_progress
+        scenario_over = False
+        game_over = False
+        narrated = False # Whether the current scenario has already been narrated while streaming.
+        prompt = self.get_compiled_prompt()
+        tracer = self.interface.tracer
+        # Loops until the scenario ends or the game ends.
+        while scenario_over == False and game_over == False:
+            with tracer.span("turn", area = self.name, turn = progress.turn + 1):
+                # Output current information, prompt model with new information.
+                if not narrated:
+                    self.interface.narrate(f"[ Description ] {progress.current_scenario}")
+                with tracer.span("turn.input"):
+                    response = await self.interface.get_free_response_async("The player is now allowed to make a move. Attempt an action.")
+                # Trivial or invalid turns are decided locally, without advancing the scenario unless the result ends it.
+                if self.world != None and self.world.resolver.enabled:
+                    with tracer.span("turn.resolve") as span:
+                        results = self.world.resolver.resolve(self, player, response)
+                        span.set("local", results != None)
+                    if results != None:
+                        result = self.interface.output_schema.decode(results, player.inventory.names(), player.player_state)
+                        self.interface.narrate(f"[ Description ] {result.text_output}")
+                        narrated = True
+                        scenario_over = result.scenario_over
+                        game_over = result.game_over
+                        if scenario_over or game_over:
+                            progress.current_scenario = result.text_output
+                        self.apply_player_state(player, result)
+                        continue
+                with tracer.span("turn.prompt") as span:
+                    if self.scene_entities != None:
+                        user_prompts = prompt.fan_out_prompts(progress.current_scenario, response, player, progress.history, progress.turn + 1, self.scene_entities)
+                    else:
+                        user_prompt = prompt.user_prompt(progress.current_scenario, response, player, progress.history, progress.turn + 1)
+                    span.set("tokens", prompt.prompt_tokens["total"])
+                try:
+                    result = None
+                    with tracer.span("turn.evaluate", streaming = self.use_streaming, calls = len(self.scene_entities) + 1 if self.scene_entities != None else 1):
+                        if self.scene_entities != None:
+                            result = await self.fan_out_async(user_prompts, prompt.system_prompt, player)
+                            narrated = self.use_streaming
+                        elif self.use_streaming:
+                            self.interface.narrate_partial("[ Description ] ")
+                            results = await self.interface.evaluate_actions_stream_async(user_prompt, prompt.system_prompt, self.interface.narrate_partial, self.use_response_cache)
+                            self.interface.narrate("")
+                            narrated = True
+                        else:
+                            results = await self.interface.evaluate_actions_async(user_prompt, prompt.system_prompt, self.use_response_cache)
+                            narrated = False
+                    if result == None:
+                        result = self.interface.output_schema.decode(results, player.inventory.names(), player.player_state)
+                except (BackendError, OutputError):
+                    # The evaluation failed for good, so the turn is not taken and the player may try again.
+                    if self.use_streaming:
+                        self.interface.narrate("")
+                    self.interface.narrate("[ Error ] The world does not respond. Try again.")
+                    narrated = False
+                    continue
+
+                with tracer.span("turn.apply"):
+                    # Process Results
+                    progress.turn += 1
+                    progress.previous_scenario = progress.current_scenario
+                    progress.current_scenario = result.text_output
+                    progress.history.add(progress.turn, response, result.text_output, prompt.prompt_tokens["total"])
+                    scenario_over = result.scenario_over
+                    game_over = result.game_over
+                    if len(result.repaired) > 0:
+                        tracer.count("output_repairs", len(result.repaired))
+                    self.apply_player_state(player, result)
+
+                with tracer.span("turn.narrate"):
+                    self.interface.narrate(f"[ DEBUG ] Player's State: {player.player_state_json(include_inventory = False)}")
+                    self.interface.narrate(f"[ DEBUG ] Player's Inventory: {player.inventory_json()}")
+                    self.interface.narrate(f"[ DEBUG ] Prompt Tokens: {prompt.prompt_tokens['total']}")
+
+                # Saves the turn, so that a crash does not lose the scenario in progress.
+                if self.world != None and not (scenario_over or game_over):
+                    with tracer.span("turn.checkpoint"):
+                        self.touched()
+                        self.world.checkpoint()
+
+        current_scenario = progress.current_scenario
+        self.scenario_progress = None
+        self.touched()
+
+        # Narrate the conclusion of the scenario.
+        if not narrated:
+            self.interface.narrate(f"[ Description ] {current_scenario}")
+
+        # Check for game over state.
+        if game_over == True:
+            self.interface.narrate("[ Game Over ] The player has died.")
+            self.interface.end_game("game_over")
+        # Scenario is over. Trigger static options.
+        self.area_type = Area_Type.STATIC
+        
+        # Updates area with aftermath details.
+        self.name = self.aftermath_name
+        self.renamed()
+        self.desc = self.aftermath_desc
+        self.details = self.aftermath_details
+
+        # Prints the aftermath.
+        self.interface.narrate(f"\n[ Pass ] The scenario has been cleared.")
+        self.interface.narrate(f"\nNow Watching {self.name}")
+        self.interface.narrate(f"[ Description ] {self.desc}")
+
+    # Used exclusively for dynamic areas. Evaluates the calls of a turn split by set_fan_out at once, and returns their merged ActionResult.
+    # With streaming, the player's call is narrated as it is generated, and the reactions once every call is complete.
+    # The player's call decides the items used, the player's state and whether the scenario is over. The game is over if any call says so.
+    async def fan_out_async(self, user_prompts, system_prompt, player: Player):
+        import asyncio
+        interface = self.interface
+        if self.use_streaming:
+            interface.narrate_partial("[ Description ] ")
+            resolution = interface.evaluate_actions_stream_async(user_prompts[0], system_prompt, interface.narrate_partial, self.use_response_cache)
+        else:
+            resolution = interface.evaluate_actions_async(user_prompts[0], system_prompt, self.use_response_cache)
+        reactions = [interface.evaluate_actions_async(user_prompt, system_prompt, self.use_response_cache) for user_prompt in user_prompts[1:]]
+        # Every call is awaited before a failure is raised, so none is left running once the turn is abandoned.
+        outputs = await asyncio.gather(resolution, *reactions, return_exceptions = True)
+        for output in outputs:
+            if isinstance(output, BaseException):
+                raise output
+        results = [interface.output_schema.decode(output, player.inventory.names(), player.player_state) for output in outputs]
+        result = results[0]
+        texts = [reaction.text_output for reaction in results[1:] if reaction.text_output != ""]
+        if self.use_streaming:
+            interface.narrate(" " + " ".join(texts) if len(texts) > 0 else "")
+        result.text_output = " ".join([result.text_output] + texts)
+        result.game_over = any(part.game_over for part in results)
+        return result
+
+    # Used exclusively for dynamic areas. Advances the scenario by one turn while the player is elsewhere, such as for a WorldTicker.
+    # The outcome only changes the scenario: the player's state and inventory are left as they are, and the scenario does not end.
+    # Returns False if the outcome was discarded, as the player entered the area or its progress changed while it was evaluated.
+    async def tick_async(self, player: Player):
+        started = self.scenario_progress
+        progress = started if started != None else ScenarioProgress(current_scenario = self.desc, history = TurnHistory(self.history_turns))
+        turn = progress.turn
+        prompt = self.get_compiled_prompt()
+        user_prompt = prompt.user_prompt(progress.current_scenario, OFFSCREEN_ACTION, player, progress.history, turn + 1)
+        prompt_tokens = prompt.prompt_tokens["total"]
+        results = await self.interface.evaluate_actions_async(user_prompt, prompt.system_prompt, self.use_response_cache)
+        result = self.interface.output_schema.decode(results, player.inventory.names(), player.player_state)
+        if (self.scenario_progress is not started or progress.turn != turn or Area_Type(self.area_type) != Area_Type.DYNAMIC
+                or (self.world != None and self.world.current_area is self)):
+            return False
+        progress.turn += 1
+        progress.previous_scenario = progress.current_scenario
+        progress.current_scenario = result.text_output
+        progress.history.add(progress.turn, OFFSCREEN_ACTION, result.text_output, prompt_tokens)
+        self.scenario_progress = progress
+        self.touched()
+        return True
+
+    # Applies the player state changes of a decoded result.
+    def apply_player_state(self, player: Player, result: ActionResult):
+        # Process Player Inventory Changes
+        # Only account for removing items, not adding items.
+        for name in result.consumed:
+            player.inventory.remove(name)
+
+        # Process Player State Changes
+        if result.physical_state != None:
+            player.update_player_state("physical_state", result.physical_state)
+        if result.mental_state != None:
+            player.update_player_state("mental_state", result.mental_state)
+
+    # Prompts the player to navigate to an area.
+    # Returns the area that the player traversed to, False if there are no paths to traverse or if traversal is blocked.
+    def navigate(self):
+        self.ensure_hydrated()
+        if len(self.paths) > 0:
+            if self.area_cleared == True:
+                paths, options_list = self.path_options()
+                option = self.interface.get_multiple_choice_response(options_list)
+                # Triggers the "stay" action.
+                if option == 0:
+                    return False
+                return paths[option - 1]
+            else:
+                self.interface.narrate("\n[ Block ] This area has not been cleared. You cannot leave.")
+                return False
+        self.interface.narrate("\n[ Block ] Dead end. You cannot leave.")
+        return False
+
+    # Async version of navigate.
+    async def navigate_async(self):
+        self.ensure_hydrated()
+        if len(self.paths) > 0:
+            if self.area_cleared == True:
+                paths, options_list = self.path_options()
+                option = await self.interface.get_multiple_choice_response_async(options_list)
+                if option == 0:
+                    return False
+                return paths[option - 1]
+            else:
+                self.interface.narrate("\n[ Block ] This area has not been cleared. You cannot leave.")
+                return False
+        self.interface.narrate("\n[ Block ] Dead end. You cannot leave.")
+        return False
+    
+    # Shows more details about the area.
+    def inspect(self):
+        if self.details != "":
+            self.interface.narrate(f"\n[ Inspect ] {self.details}")
+        else:
+            self.interface.narrate("\n[ Inspect ] There isn't anything notable to inspect.")
+    
+    # Returns whether entry was successful or not.
+    def enter_area(self):
+        self.ensure_hydrated()
+        if self.can_enter() == True:
+            self.interface.narrate(f"\nEntering {self.name}")
+            if Area_Type(self.area_type) != Area_Type.DYNAMIC:
+                self.interface.narrate(f"[ Description ] {self.desc}")
+            return True
+        self.interface.narrate(f"\n[ Block ] You are unable to enter \"{self.name}\".")
+        return False
+
+class WorldMap:
+    """
+    The World Map is responsible for storing all areas, and traversing through areas.
+    Contains a reference to the player, as this is the actual interface for playing the game.
+    """
+    def __init__(self, interface: Interface, player: Player):
+        self.areas = [] # Stores a list of all areas within the current world map. The index of an area is its id.
+        self.area_names = {} # Index of areas by name, including the aftermath names of dynamic areas.
+        self.reachability = {} # Cached breadth-first search trees, keyed by their source area.
+        self.accessibility = {} # Cached trees of accessible_from, keyed by their source area, with the entry checks they depend on.
+        self.path_epoch = 0 # Incremented whenever a path of an area of this world is created or removed, so that cached routes can be invalidated.
+        self.name_epoch = 0 # Incremented whenever an area of this world is renamed, so that cached navigation menus can be invalidated.
+        self.reachability_epoch = 0 # Path epoch that the cached trees were built at.
+        self.starting_area = False
+        self.current_area = False
+        self.interface = interface
+        self.player = player
+        self.catalog = ItemCatalog() # Shared item definitions of this world.
+        self.state = GameState() # World state flags, such as learned spells. Values must be JSON-compatible to be saved.
+        self.flags = self.state.values # Values of the state, for reading. Changes must be made through the state to be noticed.
+        self.dirty_areas = set() # Ids of areas changed since the world was built, included in snapshots.
+        self.journal = None # Optional SnapshotJournal, written at every checkpoint.
+        self.prefetcher = Prefetcher(self) # Speculatively prepares the dynamic areas next to the player.
+        self.resolver = FastPathResolver() # Decides trivial or invalid dynamic turns without the evaluation model.
+        self.ticker = WorldTicker(self) # Advances the dynamic areas that the player is not in, when enabled.
+        # The player shares the world's interface, so that inventory menus use the same I/O as the areas.
+        player.set_interface(interface)
+
+    # Enables or disables speculative prefetching of the dynamic areas next to the player.
+    def set_prefetch(self, enabled: bool):
+        self.prefetcher.enabled = enabled
+
+    # Enables or disables deciding trivial or invalid dynamic turns locally.
+    def set_fast_path(self, enabled: bool):
+        self.resolver.enabled = enabled
+
+    # Enables or disables advancing the dynamic areas that the player is not in, with at most concurrency turns under way at once.
+    # Only areas given a tick budget are advanced. See Area.set_tick_budget and WorldTicker.
+    def set_world_ticks(self, enabled: bool, concurrency = 2):
+        self.ticker.enabled = enabled
+        self.ticker.concurrency = concurrency
+
+    # Gets the current area. Returns False if no current area exists.
+    def get_current_area(self):
+        return self.current_area
+
+    # Adds an area to the world map.
+    # The first area added becomes the starting area.
+    def add_area(self, new_area: Area):
+        if len(self.areas) == 0:
+            self.starting_area = new_area
+        self.store_area(new_area)
+        new_area.world = self
+        self.index_area(new_area)
+        # Its paths and name may have changed before it was added, while no world was told.
+        new_area.paths_changed()
+        new_area.renamed()
+        if new_area.tick_budget > 0:
+            self.ticker.watch(new_area)
+        # Adds the imported interface with OpenAI access into the area.
+        new_area.set_interface(self.interface)
+    
+    # Assigns the next area id to an area, and stores it under that id.
+    def store_area(self, area: Area):
+        area.area_id = len(self.areas)
+        self.areas.append(area)
+
+    # Adds the names of an area to the name index.
+    # Dynamic areas are indexed under both their scenario name and their aftermath name.
+    def index_area(self, area: Area):
+        self.area_names[area.name] = area
+        if Area_Type(area.area_type) == Area_Type.DYNAMIC:
+            self.area_names[area.aftermath_name] = area
+
+    # Rebuilds the name index, such as after areas have been renamed.
+    def reindex(self):
+        self.area_names = {}
+        for area in self.areas:
+            self.index_area(area)
+
+    # Returns the area with the given id or name. Areas are returned as-is.
+    # Returns False if no such area exists within the world map.
+    def get_area(self, key):
+        if isinstance(key, Area):
+            return key
+        if isinstance(key, int):
+            if 0 <= key < len(self.areas):
+                return self.areas[key]
+            return False
+        area = self.area_names.get(key)
+        if area == None or (area.name != key and getattr(area, "aftermath_name", None) != key):
+            # The index is stale, as an area has been renamed since it was indexed.
+            self.reindex()
+            area = self.area_names.get(key)
+        return area if area != None else False
+
+    # Returns the breadth-first search tree from an area, as a dictionary mapping each reachable area to its predecessor.
+    # Trees are cached until any path in the world changes.
+    def reachable_from(self, source: Area):
+        self.check_reachability_epoch()
+        tree = self.reachability.get(source)
+        if tree == None:
+            tree = {source: None}
+            frontier = [source]
+            while len(frontier) > 0:
+                next_frontier = []
+                for area in frontier:
+                    area.ensure_hydrated()
+                    for neighbour in area.paths:
+                        if neighbour not in tree:
+                            tree[neighbour] = area
+                            next_frontier.append(neighbour)
+                frontier = next_frontier
+            self.reachability[source] = tree
+        return tree
+
+    # Forgets the cached trees if any path has changed since they were built.
+    def check_reachability_epoch(self):
+        if self.reachability_epoch != self.path_epoch:
+            self.reachability = {}
+            self.accessibility = {}
+            self.reachability_epoch = self.path_epoch
+
+    # Like reachable_from, but areas whose entry criteria is a StatePrecondition that does not hold are not entered.
+    # Other entry criteria cannot be checked without their side effects, and are assumed to pass.
+    # Trees are cached until any path changes, or any state key read by the entry checks met along the way changes.
+    def accessible_from(self, source: Area):
+        self.check_reachability_epoch()
+        cached = self.accessibility.get(source)
+        if cached != None and all(check.stamp() == stamp for check, stamp in cached[1]):
+            return cached[0]
+        tree = {source: None}
+        checks = []
+        frontier = [source]
+        while len(frontier) > 0:
+            next_frontier = []
+            for area in frontier:
+                area.ensure_hydrated()
+                for neighbour in area.paths:
+                    if neighbour in tree:
+                        continue
+                    neighbour.ensure_hydrated()
+                    if isinstance(neighbour.can_enter, StatePrecondition):
+                        checks.append((neighbour.can_enter, neighbour.can_enter.stamp()))
+                        if neighbour.can_enter() != True:
+                            continue
+                    tree[neighbour] = area
+                    next_frontier.append(neighbour)
+            frontier = next_frontier
+        self.accessibility[source] = (tree, checks)
+        return tree
+
+    # Returns the shortest list of areas leading from the source to the target, excluding the source.
+    # Returns False if the target cannot be reached. Entry criteria are not checked, unless gated is True. See accessible_from.
+    def find_route(self, source, target, gated = False):
+        source = self.get_area(source)
+        target = self.get_area(target)
+        if source == False or target == False:
+            return False
+        tree = self.accessible_from(source) if gated else self.reachable_from(source)
+        if target not in tree:
+            return False
+        route = []
+        area = target
+        while area is not source:
+            route.append(area)
+            area = tree[area]
+        route.reverse()
+        return route
+
+    # Moves the player along the shortest route towards the target area, entering each area along the way.
+    # Routes avoid areas whose entry is known to be blocked by the world state. See accessible_from.
+    # Travel stops early if an area along the route has not been cleared, blocks entry, or is a dynamic scenario.
+    # Returns True if the target was reached, else returns False.
+    def travel_to(self, target):
+        if self.current_area == False:
+            return False
+        route = self.find_route(self.current_area, target, gated = True)
+        if route == False:
+            self.interface.narrate("\n[ Block ] There is no known route to that area.")
+            return False
+        for area in route:
+            if self.current_area.area_cleared != True:
+                self.interface.narrate("\n[ Block ] This area has not been cleared. You cannot leave.")
+                return False
+            if area.enter_area() != True:
+                return False
+            self.current_area = area
+            self.prefetcher.update(area)
+            if Area_Type(area.area_type) == Area_Type.DYNAMIC:
+                return area is route[-1]
+        return True
+
+    # Resets the current area to the starting area, and returns the starting area. Returns False if no starting area exists.
+    def start(self):
+        self.current_area = self.starting_area
+        if self.starting_area != False:
+            self.starting_area.enter_area()
+            self.prefetcher.update(self.starting_area)
+            self.ticker.update()
+        return self.starting_area
+    
+    # Triggers the actions of the current area. Automatically updates if it results in traversing to a new area.
+    # While background ticks are enabled, the act is run on the interface's event loop, so that ticks advance during static menus too.
+    def act(self):
+        if self.ticker.enabled:
+            self.interface.run_sync(self.act_async())
+            return
+        if self.current_area != False:
+            with self.interface.tracer.span("act", area = self.current_area.name):
+                self.current_area.touched()
+                self.current_area = self.current_area.area_actions(self.player)
+                self.prefetcher.update(self.current_area)
+                self.ticker.update()
+                self.checkpoint()
+
+    # Async version of act. Dynamic scenarios are awaited instead of stalling the process.
+    async def act_async(self):
+        if self.current_area != False:
+            with self.interface.tracer.span("act", area = self.current_area.name):
+                self.current_area.touched()
+                self.current_area = await self.current_area.area_actions_async(self.player)
+                self.prefetcher.update(self.current_area)
+                self.ticker.update()
+                self.checkpoint()
+
+    # Returns the mutable state of the world in a compact, JSON-compatible form.
+    # Only areas changed since the world was built are included, along with the player state and world flags.
+    def snapshot(self):
+        player_state = {}
+        for key in self.player.player_state:
+            if key != "inventory":
+                player_state[key] = self.player.player_state[key]
+        areas = {}
+        for area_id in sorted(self.dirty_areas):
+            if area_id != None:
+                areas[str(area_id)] = self.areas[area_id].capture_state()
+        return {
+            "current": self.current_area.area_id if self.current_area != False else None,
+            "flags": self.state.capture_state(),
+            "player": {"s": player_state, "i": [[item.get_name(), count] for item, count in self.player.inventory.items()]},
+            "areas": areas
+        }
+
+    # Restores a snapshot onto this world, which should be freshly built by the same code as the saved world.
+    # The session resumes where it was saved, including a dynamic scenario in progress.
+    # Items are restored from the player's inventory or the world catalog. Unknown items are skipped.
+    def restore(self, snapshot):
+        for area_id, state in snapshot["areas"].items():
+            area = self.get_area(int(area_id))
+            area.ensure_hydrated()
+            area.restore_state(state, self)
+            self.dirty_areas.add(int(area_id))
+        self.state.restore_state(snapshot["flags"])
+
+        items = {}
+        for item in self.player.inventory:
+            items[item.get_name()] = item
+        for item, count in self.player.inventory.items():
+            self.player.inventory.remove(item, count)
+        for name, count in snapshot["player"]["i"]:
+            item = items.get(name) or self.catalog.create(name)
+            if item != None:
+                item.set_interface(self.interface)
+                self.player.inventory.add(item, count)
+        for key in snapshot["player"]["s"]:
+            self.player.update_player_state(key, snapshot["player"]["s"][key])
+
+        self.current_area = self.get_area(snapshot["current"]) if snapshot["current"] != None else False
+        self.reindex()
+        self.prefetcher.update(self.current_area)
+        self.ticker.update()
+
+    # Returns whether an area is a dynamic scenario. See BundleWorldMap, which answers without hydrating the area.
+    def is_dynamic(self, area: Area):
+        area.ensure_hydrated()
+        return Area_Type(area.area_type) == Area_Type.DYNAMIC
+
+    # Hydrates a stub area. Areas of a regular world map are always hydrated; see BundleWorldMap.
+    def hydrate_area(self, area: Area):
+        area.hydrated = True
+
+    # Writes the current state to the journal, if one is attached.
+    def checkpoint(self):
+        if self.journal != None:
+            self.journal.record(self.snapshot())
\ No newline at end of file